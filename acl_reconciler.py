@@ -0,0 +1,118 @@
+PRINCIPAL_FIELDS = ("user_name", "group_name", "service_principal_name")
+# Permissions API principal field -> principal_resolver kind
+PRINCIPAL_KINDS = {"user_name": "user", "group_name": "group", "service_principal_name": "service_principal"}
+
+
+# === INDEXING ===
+# Grants are indexed once as {principal: {privilege, ...}}. Unity Catalog
+# principals are bare names; permissions API principals are (field, name)
+# pairs such as ("group_name", "data-engineers"). Inherited grants are ignored
+# because they cannot be changed on this object.
+def index_grants(permissions):
+    if isinstance(permissions, dict):
+        entries = permissions.get("privilege_assignments") or permissions.get("access_control_list") or []
+    else:
+        entries = permissions or []
+    index = {}
+    for entry in entries:
+        if "principal" in entry:
+            principal = entry["principal"]
+            privileges = set()
+            for privilege in entry.get("privileges", entry.get("permissions", [])):
+                if isinstance(privilege, str):
+                    privileges.add(privilege)
+                elif not privilege.get("inherited_from_name"):
+                    privileges.add(privilege["privilege"])
+        else:
+            field = next((f for f in PRINCIPAL_FIELDS if entry.get(f)), None)
+            if field is None:
+                continue
+            principal = (field, entry[field])
+            if "all_permissions" in entry:
+                privileges = {p["permission_level"] for p in entry["all_permissions"] if not p.get("inherited")}
+            else:
+                privileges = {entry["permission_level"]}
+        if privileges:
+            index.setdefault(principal, set()).update(privileges)
+    return index
+
+
+# === PLANNING ===
+# A plan is {principal: (privileges_to_add, privileges_to_remove)} holding only
+# principals that actually change.
+def plan_changes(current, changes):
+    # Explicit deltas in the Unity Catalog shape: [{"principal", "add": [...], "remove": [...]}]
+    plan = {}
+    for change in changes:
+        principal = change["principal"]
+        have = current.get(principal, set())
+        add, remove = plan.get(principal, (set(), set()))
+        add |= set(change.get("add", [])) - have
+        remove |= set(change.get("remove", [])) & have
+        plan[principal] = (add, remove)
+    return {p: (add, remove) for p, (add, remove) in plan.items() if add or remove}
+
+
+def plan_desired(current, desired, prune=False):
+    # Every principal in desired ends up with exactly its listed privileges;
+    # prune=True also strips principals desired does not mention
+    plan = {}
+    for principal, privileges in desired.items():
+        have = current.get(principal, set())
+        add, remove = privileges - have, have - privileges
+        if add or remove:
+            plan[principal] = (add, remove)
+    if prune:
+        for principal, have in current.items():
+            if principal not in desired and have:
+                plan[principal] = (set(), set(have))
+    return plan
+
+
+def plan_additions(current, desired):
+    # Grant whatever is missing and leave everything else alone
+    plan = {}
+    for principal, privileges in desired.items():
+        add = privileges - current.get(principal, set())
+        if add:
+            plan[principal] = (add, set())
+    return plan
+
+
+# === REQUESTS ===
+def uc_patch(plan):
+    # One PATCH body for a Unity Catalog securable
+    changes = []
+    for principal in sorted(plan):
+        add, remove = plan[principal]
+        change = {"principal": principal}
+        if add:
+            change["add"] = sorted(add)
+        if remove:
+            change["remove"] = sorted(remove)
+        changes.append(change)
+    return {"changes": changes}
+
+
+def acl_request(plan, desired_acl):
+    # The permissions API can only add through PATCH, so any removal becomes a
+    # PUT of the full desired ACL. Returns (method, payload) or (None, None).
+    if not plan:
+        return None, None
+    if any(remove for _, remove in plan.values()):
+        return "PUT", {"access_control_list": desired_acl}
+    additions = []
+    for (field, name), (add, _) in sorted(plan.items()):
+        additions.extend({field: name, "permission_level": level} for level in sorted(add))
+    return "PATCH", {"access_control_list": additions}
+
+
+def describe(plan):
+    # Human readable "+/-" lines, used by plan/dry-run output
+    lines = []
+    for principal in sorted(plan, key=str):
+        add, remove = plan[principal]
+        label = f"{principal[0]}={principal[1]}" if isinstance(principal, tuple) else principal
+        lines.extend(f"+ {label} {privilege}" for privilege in sorted(add))
+        lines.extend(f"- {label} {privilege}" for privilege in sorted(remove))
+    return lines
@@ -0,0 +1,224 @@
+"""Throughput/latency benchmark for the provisioning flows, run against mock_databricks.
+
+Each flow provisions --objects objects (half of them already present, so both the
+create and the update paths run) into a fake workspace seeded with each --sizes
+dataset size, through provision_engine exactly as a real run would. The listing
+flow instead walks every group and user through the paged SCIM listings with the
+mock capping pages (at --page-size, or 50), and fails if anything is missed. Reported per
+run: requests the mock served, wall time, p50/p99 per-object step latency and
+peak traced memory (client and in-process mock together).
+
+Usage: python benchmark.py [--flows groups,jobs,volumes,listing] [--sizes 10,1000,100000]
+                           [--objects 50] [--latency 0.005] [--error-rate 0.02]
+                           [--output results.jsonl]
+"""
+import argparse
+import contextlib
+import io
+import json
+import subprocess
+import time
+import tracemalloc
+
+import create_groups
+import create_job
+import create_job_2
+import create_volume
+import principal_resolver
+import provision_engine
+from fanout import configure_workspace
+from mock_databricks import MockDatabricks
+
+FLOWS = ("groups", "jobs", "volumes", "listing")
+DEFAULT_SIZES = "10,1000"
+DEFAULT_OBJECTS = 50
+MEMBERS_PER_GROUP = 10
+LISTING_PAGE_CAP = 50   # items per page the mock returns in the listing flow, below what is requested
+CATALOG, SCHEMA = "main", "default"
+
+
+# === MANIFESTS ===
+# Existing objects reuse the names mock_databricks.seed() generates
+def groups_manifest(objects, size):
+    groups = []
+    for i in range(objects):
+        name = f"group-{i + 1}" if i % 2 == 0 and i + 1 < size else f"bench-group-{i}"
+        groups.append({
+            "name": name,
+            "members": {"users": [f"user{(i + j) % size}@example.com" for j in range(min(MEMBERS_PER_GROUP, size))]},
+            "managers": ["group-0"],
+            "workspace_access": True,
+        })
+    return {"groups": groups}
+
+
+def jobs_manifest(objects, size):
+    jobs = []
+    for i in range(objects):
+        name = f"job-{i}" if i % 2 == 0 and i < size else f"bench-job-{i}"
+        jobs.append({
+            "config": {
+                "name": name,
+                "max_concurrent_runs": 1,
+                "tasks": [{"task_key": f"task-{i}", "notebook_task": {"notebook_path": f"/Jobs/{name}"},
+                           "timeout_seconds": 3600}],
+            },
+            "owner": "user0@example.com",
+            "group": "group-0",
+        })
+    return {"jobs": jobs}
+
+
+def volumes_manifest(objects, size):
+    volumes = []
+    for i in range(objects):
+        name = f"volume_{i}" if i % 2 == 0 and i < size else f"bench_volume_{i}"
+        volumes.append({
+            "config": {"name": name, "catalog_name": CATALOG, "schema_name": SCHEMA,
+                       "volume_type": "MANAGED", "comment": "benchmark"},
+            "grants": [{"principal": "group-0", "add": ["READ_VOLUME"]}],
+        })
+    return {"volumes": volumes}
+
+
+MANIFESTS = {"groups": groups_manifest, "jobs": jobs_manifest, "volumes": volumes_manifest}
+
+
+def seed(mock, flow, size):
+    # Every flow needs user0/group-0 for its grants; the flow's own object type gets the full size
+    mock.seed(users=max(size, MEMBERS_PER_GROUP) if flow in ("groups", "listing") else 1,
+              groups=size if flow in ("groups", "listing") else 1,
+              jobs=size if flow == "jobs" else 0,
+              volumes=size if flow == "volumes" else 0,
+              catalog=CATALOG, schema=SCHEMA)
+
+
+# === RUNNING ===
+def reset_caches():
+    # Each run starts cold, as a fresh process would
+    create_job.job_index.clear()
+    create_job_2.job_index.clear()
+    create_volume.volume_catalog.clear()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def run_listing(size):
+    # Outcomes in provision_engine's shape for full listings that must see all size items
+    outcomes = {}
+    for key, list_all in (
+        ("iter_groups", lambda: create_groups.iter_groups(attributes="id,displayName", read_ahead=True)),
+        ("iter_users", lambda: create_groups.iter_users(attributes="id,userName")),
+        ("prime_all", lambda: range(principal_resolver.PrincipalResolver(create_groups.databricks_api)
+                                    .prime_all("group"))),
+    ):
+        start = time.perf_counter()
+        listed = sum(1 for _ in list_all())
+        outcomes[key] = {"status": "ok" if listed == size else "failed", "seconds": time.perf_counter() - start,
+                         "error": None if listed == size else f"{key} listed {listed} of {size}"}
+    return outcomes
+
+
+def run_flow(flow, size, objects, mock_options, limits=None):
+    if flow == "listing" and not mock_options.get("page_size"):
+        mock_options = {**mock_options, "page_size": LISTING_PAGE_CAP}
+    with MockDatabricks(**mock_options) as mock:
+        seed(mock, flow, size)
+        configure_workspace(mock.url, "benchmark-token")
+        reset_caches()
+        manifest = MANIFESTS[flow](objects, size) if flow in MANIFESTS else None
+        mock.stats.reset()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        # The scripts narrate every call; keep the benchmark output to the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            outcomes = run_listing(size) if flow == "listing" else provision_engine.provision(manifest, limits)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        stats = mock.stats.snapshot()
+    latencies = [o["seconds"] for o in outcomes.values() if o["status"] == "ok"]
+    failed = [key for key, o in outcomes.items() if o["status"] not in provision_engine.SUCCEEDED]
+    return {
+        "flow": flow,
+        "size": size,
+        "objects": objects,
+        "steps": len(outcomes),
+        "failed": len(failed),
+        "requests": stats["total"],
+        "throttled": stats["throttled"],
+        "connections": stats["connections"],
+        "seconds": round(elapsed, 4),
+        "p50": round(percentile(latencies, 0.5), 4),
+        "p99": round(percentile(latencies, 0.99), 4),
+        "peak_mb": round(peak / 1024 / 1024, 2),
+        "by_route": stats["by_route"],
+        "first_failure": outcomes[failed[0]]["error"] if failed else None,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results):
+    print(f"\n{'FLOW':<8} {'SIZE':>7} {'OBJ':>5} {'REQS':>6} {'429':>5} {'CONNS':>5} {'WALL s':>8} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'PEAK MB':>8}")
+    for r in results:
+        print(f"{r['flow']:<8} {r['size']:>7} {r['objects']:>5} {r['requests']:>6} {r['throttled']:>5} "
+              f"{r['connections']:>5} {r['seconds']:>8.2f} {r['p50'] * 1000:>8.1f} {r['p99'] * 1000:>8.1f} "
+              f"{r['peak_mb']:>8.2f}")
+        if r["failed"]:
+            print(f"   ❌ {r['failed']} steps did not succeed, first: {r['first_failure']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the provisioning flows against a mock workspace")
+    parser.add_argument("--flows", default=",".join(FLOWS), help="Comma separated: groups, jobs, volumes, listing")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma separated seeded dataset sizes")
+    parser.add_argument("--objects", type=int, default=DEFAULT_OBJECTS, help="Objects provisioned per run")
+    parser.add_argument("--latency", type=float, default=0.005, help="Seconds added to every mock response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, up to this many seconds")
+    parser.add_argument("--page-size", type=int, help="Cap on the page size the mock returns")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=0, help="Retry-After seconds sent with each 429")
+    parser.add_argument("--limit", action="append", metavar="ENDPOINT=N",
+                        help="Max concurrent calls for scim, jobs, volumes or permissions")
+    parser.add_argument("--output", help="Append one JSON line per run to this file")
+    args = parser.parse_args()
+
+    flows = [flow.strip() for flow in args.flows.split(",") if flow.strip()]
+    unknown = set(flows) - set(FLOWS)
+    if unknown:
+        raise Exception(f"Unknown flows: {', '.join(sorted(unknown))}")
+    mock_options = {"latency": args.latency, "jitter": args.jitter, "page_size": args.page_size,
+                    "error_rate": args.error_rate, "retry_after": args.retry_after}
+
+    revision = git_revision()
+    results = []
+    for flow in flows:
+        for size in (int(s) for s in args.sizes.split(",")):
+            result = run_flow(flow, size, args.objects, mock_options, provision_engine.parse_limits(args.limit))
+            print(f"⏱️ {flow} @ {size}: {result['requests']} requests in {result['seconds']:.2f}s")
+            results.append(result)
+            if args.output:
+                with open(args.output, "a") as f:
+                    f.write(json.dumps({"revision": revision, "timestamp": time.time(),
+                                        "mock": mock_options, **result}) + "\n")
+    print_report(results)
+    return 0 if not any(r["failed"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,141 @@
+"""Connection handshakes and latency for a burst of concurrent calls, per transport setup.
+
+Runs --calls SCIM group lookups on --concurrency threads against mock_databricks
+over HTTPS, once per mode:
+
+    per-request   a new client (and connection) for every call, no TLS session reuse
+    pooled        one shared keep-alive pool, full TLS handshake for every connection
+    resumed       shared pool, new connections resume the host's last TLS session
+    warm          shared pool, warm_up() opens every connection before the burst
+    http2         httpx over HTTP/2 (skipped unless httpx[http2] is installed; the
+                  mock only speaks HTTP/1.1, so this measures httpx's fallback)
+
+Reported per mode: TLS handshakes the mock accepted (and how many resumed a
+session), wall time, p50/p99 call latency and, for warm, the warm-up time.
+
+Usage: python connection_benchmark.py [--calls 500] [--concurrency 100] [--latency 0.005]
+                                      [--modes per-request,pooled,resumed,warm,http2]
+                                      [--output results.jsonl]
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import databricks_client
+from benchmark import git_revision, percentile
+from mock_databricks import MockDatabricks
+
+MODES = ("per-request", "pooled", "resumed", "warm", "http2")
+DEFAULT_CALLS = 500
+DEFAULT_CONCURRENCY = 100
+GROUPS = 100
+
+
+def client_options(mode, concurrency, ca_certs):
+    options = {"ca_certs": ca_certs, "pool_size": concurrency, "tls_session_reuse": mode != "pooled",
+               "max_retries": 0}
+    if mode == "per-request":
+        options.update(pool_size=1, tls_session_reuse=False)
+    if mode == "http2":
+        options["transport"] = "http2"
+    return options
+
+
+def run_mode(mock, mode, calls, concurrency):
+    options = client_options(mode, concurrency, mock.ca_certs)
+    shared = None if mode == "per-request" else databricks_client.DatabricksClient(mock.url, "benchmark-token",
+                                                                                   **options)
+    warm_seconds = 0.0
+    if mode == "warm":
+        start = time.perf_counter()
+        shared.warm_up(concurrency)
+        warm_seconds = time.perf_counter() - start
+    mock.stats.reset()
+
+    def call(i):
+        client = shared or databricks_client.DatabricksClient(mock.url, "benchmark-token", **options)
+        start = time.perf_counter()
+        try:
+            client.api("GET", "preview/scim/v2/Groups",
+                       params={"filter": f'displayName eq "group-{i % GROUPS}"', "attributes": "id"})
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, str(e)
+        finally:
+            if shared is None:
+                client.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(call, range(calls)))
+    elapsed = time.perf_counter() - start
+    stats = mock.stats.snapshot()
+    if shared is not None:
+        shared.close()
+
+    latencies = [seconds for seconds, _ in results]
+    errors = [error for _, error in results if error]
+    return {
+        "mode": mode,
+        "calls": calls,
+        "concurrency": concurrency,
+        "handshakes": stats["connections"],
+        "resumed": stats["tls_resumed"],
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "seconds": round(elapsed, 4),
+        "p50": round(percentile(latencies, 0.5), 4),
+        "p99": round(percentile(latencies, 0.99), 4),
+        "warm_seconds": round(warm_seconds, 4),
+    }
+
+
+def print_report(results):
+    print(f"\n{'MODE':<12} {'CALLS':>6} {'CONC':>5} {'HANDSHAKES':>10} {'RESUMED':>8} {'WALL s':>8} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'WARM s':>7}")
+    for r in results:
+        print(f"{r['mode']:<12} {r['calls']:>6} {r['concurrency']:>5} {r['handshakes']:>10} {r['resumed']:>8} "
+              f"{r['seconds']:>8.2f} {r['p50'] * 1000:>8.1f} {r['p99'] * 1000:>8.1f} {r['warm_seconds']:>7.2f}")
+        if r["errors"]:
+            print(f"   ❌ {r['errors']} calls failed, first: {r['first_error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare connection setups for a burst of concurrent calls")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"Comma separated: {', '.join(MODES)}")
+    parser.add_argument("--calls", type=int, default=DEFAULT_CALLS)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--latency", type=float, default=0.005, help="Seconds added to every mock response")
+    parser.add_argument("--output", help="Append one JSON line per mode to this file")
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        raise Exception(f"Unknown modes: {', '.join(sorted(unknown))}")
+    if "http2" in modes:
+        try:
+            import httpx  # noqa: F401
+        except ImportError:
+            print("⚠️ httpx is not installed, skipping the http2 mode")
+            modes.remove("http2")
+
+    revision = git_revision()
+    results = []
+    with MockDatabricks(latency=args.latency, tls=True) as mock:
+        mock.seed(groups=GROUPS)
+        for mode in modes:
+            result = run_mode(mock, mode, args.calls, args.concurrency)
+            print(f"⏱️ {mode}: {result['handshakes']} handshakes, {result['seconds']:.2f}s")
+            results.append(result)
+            if args.output:
+                with open(args.output, "a") as f:
+                    f.write(json.dumps({"revision": revision, "timestamp": time.time(), "latency": args.latency,
+                                        **result}) + "\n")
+    print_report(results)
+    return 0 if not any(r["errors"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,5 +1,11 @@
-import requests
 import json
+from concurrent.futures import ThreadPoolExecutor
+
+from acl_reconciler import acl_request, index_grants, plan_additions
+from databricks_client import get_client
+from instrumentation import session
+from membership_graph import MembershipGraph
+from principal_resolver import resolver_for, save_all
 
 # --- Config ---
 DATABRICKS_INSTANCE = "https://<your-databricks-instance>"  # e.g. https://dbc-1234.cloud.databricks.com
@@ -7,72 +13,153 @@ TOKEN = "<your-databricks-pat>"
 GROUP_NAME = "data-engineers"              # Target group to create or validate
 GROUP_MANAGER_USER_NAME = "manager@example.com"  # User email for manager
 GROUP_MANAGER_GROUP_NAME = "engineering-admins"  # Another group with group manager privilege
+MEMBER_CHUNK_SIZE = 50  # Names per SCIM filter query and members per PatchOp request
+
+# Shared keep-alive pool with retry/backoff on 429 and 5xx
+def client():
+    return get_client(DATABRICKS_INSTANCE, TOKEN)
+
+def databricks_api(method, endpoint, data=None, version="2.0"):
+    return client().api(method, endpoint, data, version=version)
 
-HEADERS = {
-    "Authorization": f"Bearer {TOKEN}",
-    "Content-Type": "application/json"
-}
+def principals():
+    # Cached name -> id lookups for this workspace, shared with the other scripts
+    return resolver_for(DATABRICKS_INSTANCE, databricks_api)
 
 # --- Step 0: List all groups ---
-def list_all_groups():
-    groups = []
-    start_index = 1
-    count = 100
-    while True:
-        response = requests.get(
-            f"{DATABRICKS_INSTANCE}/api/2.0/preview/scim/v2/Groups?startIndex={start_index}&count={count}",
-            headers=HEADERS
-        )
-        if response.status_code != 200:
-            raise Exception(f"Failed to fetch groups: {response.status_code} - {response.text}")
-
-        data = response.json()
-        resources = data.get("Resources", [])
-        groups.extend(resources)
-
-        if len(resources) < count:
-            break
-        start_index += count
-
-    return groups
+GROUP_PAGE_SIZE = 100
+
+def _fetch_page(resource, start_index, count, attributes, excluded_attributes):
+    params = {"startIndex": start_index, "count": count}
+    if attributes:
+        params["attributes"] = attributes
+    if excluded_attributes:
+        params["excludedAttributes"] = excluded_attributes
+    response = client().request("GET", f"preview/scim/v2/{resource}", params=params)
+    if response.status != 200:
+        raise Exception(f"Failed to fetch {resource.lower()}: {response.status} - {response.data.decode()}")
+    data = json.loads(response.data.decode())
+    return data.get("Resources", []), data.get("totalResults")
+
+def iter_groups(attributes=None, excluded_attributes=None, page_size=GROUP_PAGE_SIZE, read_ahead=False, totals=None):
+    # Yields groups page by page. attributes / excludedAttributes are SCIM projections,
+    # e.g. excluded_attributes="members" to skip member arrays on large workspaces.
+    # read_ahead=True fetches the next page while the caller works on the current one.
+    # totals, a dict, gets totals["Groups"] = the server's latest totalResults.
+    return _iter_resources("Groups", attributes, excluded_attributes, page_size, read_ahead, totals)
+
+def iter_users(attributes=None, excluded_attributes=None, page_size=GROUP_PAGE_SIZE, read_ahead=False, totals=None):
+    # Same paging as iter_groups, over Users
+    return _iter_resources("Users", attributes, excluded_attributes, page_size, read_ahead, totals)
+
+def _iter_resources(resource, attributes, excluded_attributes, page_size, read_ahead, totals=None):
+    def pages():
+        start_index = 1
+        while True:
+            resources, total = _fetch_page(resource, start_index, page_size, attributes, excluded_attributes)
+            start_index += len(resources)
+            if totals is not None and total is not None:
+                totals[resource] = total
+            # Servers may cap a page below page_size, so only totalResults (or,
+            # without it, an empty page) says the listing is over
+            last = not resources or (total is not None and start_index > total)
+            yield resources, last
+            if last:
+                return
+
+    if not read_ahead:
+        for resources, _ in pages():
+            yield from resources
+        return
+
+    pool = ThreadPoolExecutor(max_workers=1)
+    page_iter = pages()
+    try:
+        future = pool.submit(next, page_iter)
+        while True:
+            resources, last = future.result()
+            if not last:
+                future = pool.submit(next, page_iter)
+            yield from resources
+            if last:
+                return
+    finally:
+        # Callers may stop early; don't wait on a page nobody will read
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def list_all_groups(attributes=None, excluded_attributes=None):
+    return list(iter_groups(attributes, excluded_attributes))
+
+# Nested membership of every group from one listing with member arrays, kept
+# current with the PatchOps below; see membership_graph.py
+membership = MembershipGraph(lambda: iter_groups(attributes="id,displayName,members", read_ahead=True))
+
+def prime_groups():
+    # Primes the group lookups from one listing of ids and names. Only a listing
+    # that reached totalResults may answer misses without a query.
+    totals = {}
+    resolver = principals()
+    count = resolver.prime("group", iter_groups(attributes="id,displayName", read_ahead=True, totals=totals))
+    if "Groups" not in totals or count >= totals["Groups"]:
+        resolver.prime("group", [], complete=True)
+    return count
 
 # --- Step 1: Check if group exists ---
 def find_group(group_name):
-    response = requests.get(
-        f"{DATABRICKS_INSTANCE}/api/2.0/preview/scim/v2/Groups?filter=displayName eq \"{group_name}\"",
-        headers=HEADERS
-    )
-    if response.status_code != 200:
-        raise Exception(f"Failed to check group: {response.status_code} - {response.text}")
-    resources = response.json().get("Resources", [])
-    return resources[0] if resources else None
+    group_id = principals().resolve("group", group_name)
+    return {"id": group_id, "displayName": group_name} if group_id else None
 
 # --- Step 2: Create group ---
-def create_group(group_name):
+def create_group(group_name, member_ids=()):
+    # Initial members go in the create call itself instead of a follow-up PatchOp
     payload = {"displayName": group_name}
-    response = requests.post(
-        f"{DATABRICKS_INSTANCE}/api/2.0/preview/scim/v2/Groups",
-        headers=HEADERS,
-        data=json.dumps(payload)
-    )
-    if response.status_code == 201:
-        return response.json()
+    if member_ids:
+        payload["members"] = [{"value": member_id} for member_id in member_ids]
+    response = client().request("POST", "preview/scim/v2/Groups", payload)
+    if response.status == 201:
+        group = json.loads(response.data.decode())
+        principals().put("group", group_name, group["id"])
+        if membership.loaded:
+            membership.add_group({**group, "members": payload.get("members", [])})
+        return group
     else:
-        raise Exception(f"Failed to create group: {response.status_code} - {response.text}")
+        raise Exception(f"Failed to create group: {response.status} - {response.data.decode()}")
 
 # --- Step 3: Get user ID ---
 def get_user_id(user_name):
-    response = requests.get(
-        f"{DATABRICKS_INSTANCE}/api/2.0/preview/scim/v2/Users?filter=userName eq \"{user_name}\"",
-        headers=HEADERS
-    )
-    if response.status_code != 200:
-        raise Exception(f"Failed to fetch user: {response.status_code} - {response.text}")
-
-    resources = response.json().get("Resources", [])
-    if not resources:
+    user_id = principals().resolve("user", user_name)
+    if user_id is None:
         raise Exception(f"User '{user_name}' not found in workspace")
-    return resources[0]["id"]
+    return user_id
+
+# --- Step 3b: Create and (de)activate users ---
+def create_user(user_name, display_name=None):
+    payload = {
+        "schemas": ["urn:ietf:params:scim:schemas:core:2.0:User"],
+        "userName": user_name,
+        "displayName": display_name or user_name
+    }
+    response = client().request("POST", "preview/scim/v2/Users", payload)
+    if response.status == 201:
+        user = json.loads(response.data.decode())
+        principals().put("user", user_name, user["id"])
+        return user
+    elif response.status == 409:
+        # Created since we last looked; a cached "not found" would hide it
+        principals().invalidate("user", user_name)
+        return {"id": get_user_id(user_name), "userName": user_name}
+    else:
+        raise Exception(f"Failed to create user: {response.status} - {response.data.decode()}")
+
+def set_user_active(user_id, active):
+    payload = {
+        "schemas": ["urn:ietf:params:scim:api:messages:2.0:PatchOp"],
+        "Operations": [{"op": "replace", "path": "active", "value": active}]
+    }
+    response = client().request("PATCH", f"preview/scim/v2/Users/{user_id}", payload)
+    if response.status not in (200, 204):
+        raise Exception(f"Failed to {'activate' if active else 'deactivate'} user {user_id}: "
+                        f"{response.status} - {response.data.decode()}")
 
 # --- Step 4: Add member (user or group) to group ---
 def add_member_to_group(group_id, member_id):
@@ -82,89 +169,227 @@ def add_member_to_group(group_id, member_id):
             {"op": "add", "path": "members", "value": [{"value": member_id}]}
         ]
     }
-    response = requests.patch(
-        f"{DATABRICKS_INSTANCE}/api/2.0/preview/scim/v2/Groups/{group_id}",
-        headers=HEADERS,
-        data=json.dumps(payload)
-    )
-    if response.status_code == 200:
+    response = client().request("PATCH", f"preview/scim/v2/Groups/{group_id}", payload)
+    if response.status == 200:
+        membership.apply_patch(group_id, payload)
         print(f"✅ Added member {member_id} to group {group_id}")
-    elif response.status_code == 409:
+    elif response.status == 409:
+        membership.apply_patch(group_id, payload)
         print(f"⚠️ Member {member_id} already in group {group_id}")
     else:
-        raise Exception(f"Failed to add member: {response.status_code} - {response.text}")
+        raise Exception(f"Failed to add member: {response.status} - {response.data.decode()}")
+
+# --- Step 4b: Bulk membership changes ---
+def _chunks(items, size):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def get_user_ids(user_names, chunk_size=MEMBER_CHUNK_SIZE):
+    # userName -> id for every user that exists; missing users are left out
+    found = principals().resolve_many("user", user_names, chunk_size)
+    return {name: user_id for name, user_id in found.items() if user_id is not None}
+
+def find_group_ids(group_names, chunk_size=MEMBER_CHUNK_SIZE):
+    # displayName -> id for every group that exists; missing groups are left out
+    found = principals().resolve_many("group", group_names, chunk_size)
+    return {name: group_id for name, group_id in found.items() if group_id is not None}
+
+def get_group_member_ids(group_id):
+    group = databricks_api("GET", f"preview/scim/v2/Groups/{group_id}?attributes=members")
+    return {member["value"] for member in group.get("members", [])}
+
+def _patch_members(group_id, add_ids, remove_ids, outcomes):
+    operations = []
+    if add_ids:
+        operations.append({"op": "add", "path": "members", "value": [{"value": m} for m in add_ids]})
+    for member_id in remove_ids:
+        operations.append({"op": "remove", "path": f'members[value eq "{member_id}"]'})
+    payload = {
+        "schemas": ["urn:ietf:params:scim:api:messages:2.0:PatchOp"],
+        "Operations": operations
+    }
+    response = client().request("PATCH", f"preview/scim/v2/Groups/{group_id}", payload)
+    if response.status in (200, 204):
+        membership.apply_patch(group_id, payload)
+        outcomes.update({m: "added" for m in add_ids})
+        outcomes.update({m: "removed" for m in remove_ids})
+    elif response.status == 409 and len(add_ids) + len(remove_ids) > 1:
+        # Someone else added a member since we read the group; split to find out who
+        for half_add, half_remove in ((add_ids[:len(add_ids) // 2], remove_ids[:len(remove_ids) // 2]),
+                                      (add_ids[len(add_ids) // 2:], remove_ids[len(remove_ids) // 2:])):
+            if half_add or half_remove:
+                _patch_members(group_id, half_add, half_remove, outcomes)
+    elif response.status == 409:
+        outcomes.update({m: "already_member" for m in add_ids})
+        outcomes.update({m: "not_member" for m in remove_ids})
+    else:
+        error = f"failed: {response.status} - {response.data.decode()}"
+        outcomes.update({m: error for m in list(add_ids) + list(remove_ids)})
+
+def patch_group_members(group_id, add_ids=(), remove_ids=()):
+    # One PatchOp adding and removing members by id, for callers that already know
+    # the group's membership (so no GET first); same outcomes as update_group_members
+    outcomes = {}
+    _patch_members(group_id, list(add_ids), list(remove_ids), outcomes)
+    return outcomes
+
+def update_group_members(group_id, add_ids=(), remove_ids=(), chunk_size=MEMBER_CHUNK_SIZE):
+    # Returns member id -> added / already_member / removed / not_member / failed: ...
+    current = get_group_member_ids(group_id)
+    outcomes = {}
+    to_add, to_remove = [], []
+    for member_id in dict.fromkeys(add_ids):
+        if member_id in current:
+            outcomes[member_id] = "already_member"
+        else:
+            to_add.append(member_id)
+    for member_id in dict.fromkeys(remove_ids):
+        if member_id not in current:
+            outcomes[member_id] = "not_member"
+        else:
+            to_remove.append(member_id)
+    for add_chunk in _chunks(to_add, chunk_size):
+        _patch_members(group_id, add_chunk, [], outcomes)
+    for remove_chunk in _chunks(to_remove, chunk_size):
+        _patch_members(group_id, [], remove_chunk, outcomes)
+    return outcomes
+
+def add_members_to_group_bulk(group_id, user_names=(), group_names=(), remove_user_names=(),
+                              remove_group_names=(), chunk_size=MEMBER_CHUNK_SIZE):
+    # Resolves names in chunked filter queries and sends one PatchOp per chunk of members.
+    # Returns member name -> outcome, with "not_found" for names that do not resolve.
+    user_ids = get_user_ids(list(user_names) + list(remove_user_names), chunk_size)
+    group_ids = find_group_ids(list(group_names) + list(remove_group_names), chunk_size)
+    outcomes = {}
+    add_ids, remove_ids, names_by_id = [], [], {}
+    for names, ids, target in ((user_names, user_ids, add_ids), (group_names, group_ids, add_ids),
+                               (remove_user_names, user_ids, remove_ids), (remove_group_names, group_ids, remove_ids)):
+        for name in names:
+            if name in ids:
+                target.append(ids[name])
+                names_by_id[ids[name]] = name
+            else:
+                outcomes[name] = "not_found"
+    for member_id, outcome in update_group_members(group_id, add_ids, remove_ids, chunk_size).items():
+        outcomes[names_by_id[member_id]] = outcome
+
+    counts = {}
+    for outcome in outcomes.values():
+        key = "failed" if outcome.startswith("failed") else outcome
+        counts[key] = counts.get(key, 0) + 1
+    summary = ", ".join(f"{count} {key}" for key, count in sorted(counts.items()))
+    print(f"✅ Membership of group {group_id} reconciled ({summary})")
+    return outcomes
+
+# --- Step 4c: Effective membership ---
+def get_effective_groups(user_name):
+    # displayName of every group the user is in, directly or through nested groups
+    return sorted(membership.name(group_id) for group_id in membership.groups_of(get_user_id(user_name)))
+
+def get_group_managers(group_id):
+    # Principals granted CAN_MANAGE on the group, plus the ids of everyone who
+    # holds it through membership of a granted group
+    return membership.managers(databricks_api("GET", f"permissions/groups/{group_id}"))
 
 # --- Step 5: Set permissions for manager group on the created group ---
+def _grant(endpoint, desired_acl):
+    # Sends only the grants the object is missing; None when there is nothing to send
+    current = databricks_api("GET", endpoint)
+    plan = plan_additions(index_grants(current), index_grants(desired_acl))
+    method, payload = acl_request(plan, desired_acl)
+    if method is None:
+        return None
+    return client().request(method, endpoint, payload)
+
 def set_group_permissions(target_group_id, manager_group_name):
+    set_group_managers(target_group_id, [manager_group_name])
+
+def set_group_managers(target_group_id, manager_group_names):
+    # Every manager group in one read and at most one write
     permission_payload = {
         "access_control_list": [
-            {
-                "group_name": manager_group_name,
-                "permission_level": "CAN_MANAGE"
-            }
+            {"group_name": name, "permission_level": "CAN_MANAGE"} for name in manager_group_names
         ]
     }
-    response = requests.patch(
-        f"{DATABRICKS_INSTANCE}/api/2.0/permissions/groups/{target_group_id}",
-        headers=HEADERS,
-        data=json.dumps(permission_payload)
-    )
-    if response.status_code == 200:
-        print(f"✅ Set CAN_MANAGE permission for '{manager_group_name}' on group {target_group_id}")
+    names = ", ".join(f"'{name}'" for name in manager_group_names)
+    response = _grant(f"permissions/groups/{target_group_id}", permission_payload["access_control_list"])
+    if response is None:
+        print(f"⚠️ {names} already have CAN_MANAGE on group {target_group_id}")
+    elif response.status == 200:
+        print(f"✅ Set CAN_MANAGE permission for {names} on group {target_group_id}")
     else:
-        raise Exception(f"Failed to set permissions: {response.status_code} - {response.text}")
+        raise Exception(f"Failed to set permissions: {response.status} - {response.data.decode()}")
 
 # --- Step 6: Add group to workspace with CAN_USE permission ---
 def add_group_to_workspace(group_name):
+    add_groups_to_workspace([group_name])
+
+def add_groups_to_workspace(group_names):
+    # The workspace ACL is one object: grant every group in a single read and write
     permission_payload = {
         "access_control_list": [
-            {
-                "group_name": group_name,
-                "permission_level": "CAN_USE"
-            }
+            {"group_name": name, "permission_level": "CAN_USE"} for name in group_names
         ]
     }
-    response = requests.patch(
-        f"{DATABRICKS_INSTANCE}/api/2.0/permissions/workspace",
-        headers=HEADERS,
-        data=json.dumps(permission_payload)
-    )
-    if response.status_code == 200:
-        print(f"✅ Added group '{group_name}' to workspace with CAN_USE permission")
+    names = ", ".join(f"'{name}'" for name in group_names)
+    response = _grant("permissions/workspace", permission_payload["access_control_list"])
+    if response is None:
+        print(f"⚠️ Group {names} already has CAN_USE on the workspace" if len(group_names) == 1
+              else f"⚠️ Groups {names} already have CAN_USE on the workspace")
+    elif response.status == 200:
+        print(f"✅ Added group {names} to workspace with CAN_USE permission" if len(group_names) == 1
+              else f"✅ Added {len(group_names)} groups to workspace with CAN_USE permission")
     else:
-        raise Exception(f"Failed to add group to workspace: {response.status_code} - {response.text}")
+        raise Exception(f"Failed to add group to workspace: {response.status} - {response.data.decode()}")
 
 # --- Main Logic ---
-try:
-    # 1. List all groups
-    all_groups = list_all_groups()
-    print(f"📋 Found {len(all_groups)} groups in workspace.")
-
-    # 2. Check or create the target group
-    group = find_group(GROUP_NAME)
-    if group:
-        print(f"⚠️ Group '{GROUP_NAME}' already exists (ID: {group['id']})")
-    else:
-        group = create_group(GROUP_NAME)
-        print(f"✅ Group '{GROUP_NAME}' created (ID: {group['id']})")
+def main():
+    # Per-call timings for the run; see instrumentation.py for trace/metrics files
+    with session():
+        try:
+            # 1. List all groups (ids and names only) and prime the lookups below from it
+            group_count = prime_groups()
+            print(f"📋 Found {group_count} groups in workspace.")
+
+            # 2. Check or create the target group
+            group = find_group(GROUP_NAME)
+            if group:
+                print(f"⚠️ Group '{GROUP_NAME}' already exists (ID: {group['id']})")
+            else:
+                group = create_group(GROUP_NAME)
+                print(f"✅ Group '{GROUP_NAME}' created (ID: {group['id']})")
 
-    group_id = group["id"]
+            group_id = group["id"]
 
-    # 3. Add manager user to the group
-    user_id = get_user_id(GROUP_MANAGER_USER_NAME)
-    add_member_to_group(group_id, user_id)
+            # 3-4. Add manager user and manager group in one membership patch
+            outcomes = add_members_to_group_bulk(
+                group_id,
+                user_names=[GROUP_MANAGER_USER_NAME],
+                group_names=[GROUP_MANAGER_GROUP_NAME]
+            )
+            if outcomes[GROUP_MANAGER_USER_NAME] == "not_found":
+                raise Exception(f"User '{GROUP_MANAGER_USER_NAME}' not found in workspace")
+            if outcomes[GROUP_MANAGER_GROUP_NAME] == "not_found":
+                raise Exception(f"Manager group '{GROUP_MANAGER_GROUP_NAME}' not found.")
+            for name, outcome in outcomes.items():
+                if outcome == "already_member":
+                    print(f"⚠️ Member {name} already in group {group_id}")
+                elif outcome.startswith("failed"):
+                    raise Exception(f"Failed to add member {name}: {outcome}")
 
-    # 4. Add manager group to the group
-    manager_group = find_group(GROUP_MANAGER_GROUP_NAME)
-    if not manager_group:
-        raise Exception(f"Manager group '{GROUP_MANAGER_GROUP_NAME}' not found.")
-    add_member_to_group(group_id, manager_group["id"])
+            # 5. Set CAN_MANAGE permission for the manager group
+            set_group_permissions(group_id, GROUP_MANAGER_GROUP_NAME)
 
-    # 5. Set CAN_MANAGE permission for the manager group
-    set_group_permissions(group_id, GROUP_MANAGER_GROUP_NAME)
+            # 6. Add created group to workspace
+            add_group_to_workspace(GROUP_NAME)
+            return 0
 
-    # 6. Add created group to workspace
-    add_group_to_workspace(GROUP_NAME)
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            return 1
+        finally:
+            save_all()
 
-except Exception as e:
-    print(f"❌ Error: {e}")
+if __name__ == "__main__":
+    main()
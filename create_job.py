@@ -1,78 +1,83 @@
-import urllib3
 import json
-from urllib.parse import urlencode
 
-# Disable InsecureRequestWarning
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from databricks_client import get_client
+from acl_reconciler import PRINCIPAL_KINDS, acl_request, index_grants, plan_desired
+from job_diff import diff_settings, fetch_job, fetch_job_acl, format_plan
+from job_index import JobIndex, settings_from_config
+from principal_resolver import resolver_for
 
 # Databricks workspace URL and personal access token
 workspace_url = "https://your-databricks-workspace.cloud.databricks.com"
 token = "your-personal-access-token"
 
-# Create a connection pool
-http = urllib3.PoolManager()
-
-# Headers for the API requests
-headers = {
-    "Authorization": f"Bearer {token}",
-    "Content-Type": "application/json",
-}
-
-# Job configuration
+# Job configuration, in the Jobs 2.1 shape that jobs/get returns so it can be
+# compared field by field (a 2.0 single-task config is converted by settings_from_config)
 job_config = {
     "name": "My Databricks Job",
-    "existing_cluster_id": "your-cluster-id",
-    "notebook_task": {
-        "notebook_path": "/path/to/your/notebook",
-    },
-    "run_as_owner": True,
-    "settings": {
-        "job_description": "This is a sample job description",
-        "parameters": [
-            {"name": "param1", "value": "value1", "metadata": {"text": "Parameter 1 description"}},
-            {"name": "param2", "value": "value2", "metadata": {"text": "Parameter 2 description"}},
-            {"name": "param3", "value": "value3", "metadata": {"text": "Parameter 3 description"}},
-        ]
-    }
+    "description": "This is a sample job description",
+    "tasks": [
+        {
+            "task_key": "main",
+            "existing_cluster_id": "your-cluster-id",
+            "notebook_task": {
+                "notebook_path": "/path/to/your/notebook",
+            },
+        }
+    ],
+    "parameters": [
+        {"name": "param1", "default": "value1"},
+        {"name": "param2", "default": "value2"},
+        {"name": "param3", "default": "value3"},
+    ]
 }
 
+# Shared keep-alive pool with retry/backoff on 429 and 5xx
+def client():
+    return get_client(workspace_url, token)
+
+def databricks_api(method, endpoint, data=None, version="2.1"):
+    return client().api(method, endpoint, data, version=version)
+
+# Built on the first lookup, then kept current from our own creates/updates
+job_index = JobIndex(databricks_api)
+
+def principals():
+    return resolver_for(workspace_url, databricks_api)
+
 def get_job_id_by_name(job_name):
-    list_jobs_url = f"{workspace_url}/api/2.1/jobs/list"
-    response = http.request("GET", list_jobs_url, headers=headers)
-    if response.status == 200:
-        jobs = json.loads(response.data.decode('utf-8'))['jobs']
-        for job in jobs:
-            if job['settings']['name'] == job_name:
-                return job['job_id']
-    return None
+    return job_index.job_id_by_name(job_name)
 
-def create_or_update_job(job_config):
-    job_id = get_job_id_by_name(job_config['name'])
+def create_or_update_job(job_config, dry_run=False, job_id=None, match_name=True):
+    # dry_run prints the planned change and returns the existing job id (None if new).
+    # job_id updates that job; otherwise the job is matched by name, or with
+    # match_name=False always created (job names are not unique)
+    if job_id is None and match_name:
+        job_id = get_job_id_by_name(job_config['name'])
+    settings = settings_from_config(job_config)
     
     if job_id:
-        # Update existing job
-        update_job_url = f"{workspace_url}/api/2.1/jobs/update"
-        job_config['job_id'] = job_id
-        response = http.request(
-            "POST",
-            update_job_url,
-            body=json.dumps(job_config),
-            headers=headers
-        )
+        # Update existing job, sending only the fields that differ from jobs/get
+        diff = diff_settings(fetch_job(databricks_api, job_id), settings)
+        if not diff:
+            print(f"Job is up to date. Job ID: {job_id}")
+            return job_id
+        if dry_run:
+            print(format_plan(f"job '{job_config['name']}' ({job_id})", diff))
+            return job_id
+        response = client().request("POST", "jobs/update", diff.payload(job_id), version="2.1")
         action = "updated"
     else:
+        if dry_run:
+            print(f"+ job '{job_config['name']}' (new)")
+            return None
         # Create new job
-        create_job_url = f"{workspace_url}/api/2.1/jobs/create"
-        response = http.request(
-            "POST",
-            create_job_url,
-            body=json.dumps(job_config),
-            headers=headers
-        )
+        response = client().request("POST", "jobs/create", settings, version="2.1")
         action = "created"
 
     if response.status == 200:
-        job_id = json.loads(response.data.decode('utf-8')).get('job_id')
+        # jobs/update answers with an empty body, so keep the id we looked up
+        job_id = json.loads(response.data.decode('utf-8')).get('job_id', job_id)
+        job_index.upsert(job_id, settings)
         print(f"Job {action} successfully. Job ID: {job_id}")
         return job_id
     else:
@@ -80,8 +85,20 @@ def create_or_update_job(job_config):
         print(f"Response: {response.data.decode('utf-8')}")
         return None
 
-def set_job_permissions(job_id, owner, group_name):
-    permissions_url = f"{workspace_url}/api/2.0/permissions/jobs/{job_id}"
+def set_job_permissions(job_id, owner, group_name, dry_run=False, extra_acl=()):
+    # extra_acl: further access_control_list entries the job should carry
+    # Unknown principals would only make the PUT fail; lookups are cached across jobs
+    if principals().resolve("user", owner) is None:
+        print(f"Failed to set permissions. User '{owner}' not found.")
+        return False
+    if principals().resolve("group", group_name) is None:
+        print(f"Failed to set permissions. Group '{group_name}' not found.")
+        return False
+    for entry in extra_acl:
+        field, kind = next((f, k) for f, k in PRINCIPAL_KINDS.items() if entry.get(f))
+        if principals().resolve(kind, entry[field]) is None:
+            print(f"Failed to set permissions. {kind.replace('_', ' ').capitalize()} '{entry[field]}' not found.")
+            return False
     
     # Define the desired permissions
     desired_permissions = {
@@ -97,13 +114,26 @@ def set_job_permissions(job_id, owner, group_name):
         ]
     }
     
+    # The job should end up with exactly these grants: skip the write when it
+    # already does, and only fall back to a full PUT when something must go
+    desired_acl = desired_permissions["access_control_list"] + list(extra_acl)
+    current_acl = fetch_job_acl(databricks_api, job_id) if job_id else []
+    plan = plan_desired(index_grants(current_acl), index_grants(desired_acl), prune=True)
+    method, payload = acl_request(plan, desired_acl)
+    if method is None:
+        print(f"Permissions already up to date for job {job_id}.")
+        return True
+    if dry_run:
+        print(format_plan(f"permissions on job {job_id or '(new)'}", acl_plan=plan))
+        return True
+
     # Set the permissions
-    response = http.request(
-        "PUT",
-        permissions_url,
-        body=json.dumps(desired_permissions),
-        headers=headers
-    )
+    response = client().request(method, f"permissions/jobs/{job_id}", payload)
 
     if response.status == 200:
-        print(f"Permissions set successfully
+        print(f"Permissions set successfully for job {job_id}.")
+        return True
+    else:
+        print(f"Failed to set permissions. Status code: {response.status}")
+        print(f"Response: {response.data.decode('utf-8')}")
+        return False
@@ -1,5 +1,12 @@
 import json
-import urllib3
+
+from databricks_client import get_client
+from instrumentation import session
+from acl_reconciler import acl_request, index_grants, plan_additions
+from job_diff import diff_settings, fetch_job, fetch_job_acl, format_plan
+from job_index import JobIndex
+from job_template import JobTemplate
+from principal_resolver import resolver_for, save_all
 
 # === CONFIGURATION ===
 DATABRICKS_HOST = "https://<your-databricks-instance>"  # e.g. https://adb-12345678.0.azuredatabricks.net
@@ -14,128 +21,103 @@ INPUT_PARAMETERS = [
     {"name": "env", "default": "dev", "type": "text"},
     {"name": "date", "default": "2025-08-04", "type": "text"}
 ]
+DRY_RUN = False  # Print the planned job and permission changes instead of applying them
 
 # === HTTP CLIENT ===
-http = urllib3.PoolManager()
+# Shared keep-alive pool with retry/backoff on 429 and 5xx, see databricks_client.py
+def databricks_api(method, endpoint, data=None, version="2.2", body=None):
+    return get_client(DATABRICKS_HOST, TOKEN).api(method, endpoint, data, version=version, body=body)
 
-def databricks_api(method, endpoint, data=None, version="2.2"):
-    url = f"{DATABRICKS_HOST}/api/{version}/{endpoint}"
-    headers = {
-        "Authorization": f"Bearer {TOKEN}",
-        "Content-Type": "application/json"
-    }
-    encoded_data = json.dumps(data).encode("utf-8") if data else None
-    response = http.request(method, url, body=encoded_data, headers=headers)
-    if response.status not in [200, 201]:
-        raise Exception(f"API call failed: {response.status} {response.data.decode()}")
-    return json.loads(response.data.decode()) if response.data else {}
+def principals():
+    return resolver_for(DATABRICKS_HOST, databricks_api)
 
 # === 1. GET SERVICE PRINCIPAL ID ===
 def get_service_principal_id(sp_name):
-    resp = databricks_api("GET", f"preview/scim/v2/ServicePrincipals?filter=displayName eq \"{sp_name}\"", version="2.0")
-    resources = resp.get("Resources", [])
-    if not resources:
+    sp_id = principals().resolve("service_principal", sp_name)
+    if sp_id is None:
         raise Exception(f"Service Principal '{sp_name}' not found.")
-    return resources[0]["id"]
+    return sp_id
 
 # === 2. GET GROUP ID ===
 def get_group_id(group_name):
-    resp = databricks_api("GET", f"preview/scim/v2/Groups?filter=displayName eq \"{group_name}\"", version="2.0")
-    resources = resp.get("Resources", [])
-    if not resources:
+    group_id = principals().resolve("group", group_name)
+    if group_id is None:
         raise Exception(f"Group '{group_name}' not found.")
-    return resources[0]["id"]
+    return group_id
 
 # === 3. FIND EXISTING JOB BY NOTEBOOK PATH ===
+job_index = JobIndex(databricks_api, version="2.2")
+
 def find_job_by_notebook(notebook_path):
-    resp = databricks_api("GET", "jobs/list")
-    for job in resp.get("jobs", []):
-        for task in job.get("settings", {}).get("tasks", []):
-            if task.get("notebook_task", {}).get("notebook_path") == notebook_path:
-                return job["job_id"]
-    return None
-
-# === 4. CREATE JOB ===
-def create_job():
-    job_data = {
-        "name": JOB_NAME,
-        "description": JOB_DESCRIPTION,
-        "run_as": {
-            "service_principal_name": SERVICE_PRINCIPAL_NAME
-        },
-        "tasks": [
-            {
-                "task_key": "notebook_task_1",
-                "notebook_task": {
-                    "notebook_path": NOTEBOOK_PATH,
-                    "base_parameters": {p["name"]: p["default"] for p in INPUT_PARAMETERS}
-                },
-                "job_cluster_key": "default_cluster"
-            }
-        ],
-        "job_clusters": [
-            {
-                "job_cluster_key": "default_cluster",
-                "new_cluster": {
-                    "spark_version": "13.3.x-scala2.12",
-                    "node_type_id": "i3.xlarge",
-                    "num_workers": 2
-                }
-            }
-        ],
-        "parameters": [
-            {
-                "name": p["name"],
-                "default": p["default"],
-                "type": "text"
-            } for p in INPUT_PARAMETERS
-        ]
-    }
-    return databricks_api("POST", "jobs/create", job_data)
-
-# === 5. UPDATE EXISTING JOB ===
-def update_job(job_id):
-    job_data = {
-        "job_id": job_id,
-        "new_settings": {
-            "name": JOB_NAME,
-            "description": JOB_DESCRIPTION,
-            "run_as": {
-                "service_principal_name": SERVICE_PRINCIPAL_NAME
+    return job_index.job_id_by_notebook(notebook_path)
+
+# === 4. JOB TEMPLATE ===
+# Compiled once; create and update render it with the configured values
+JOB_TEMPLATE = JobTemplate({
+    "name": "{{job_name}}",
+    "description": "{{description}}",
+    "run_as": {
+        "service_principal_name": "{{service_principal}}"
+    },
+    "tasks": [
+        {
+            "task_key": "notebook_task_1",
+            "notebook_task": {
+                "notebook_path": "{{notebook_path}}",
+                "base_parameters": "{{base_parameters}}"
             },
-            "tasks": [
-                {
-                    "task_key": "notebook_task_1",
-                    "notebook_task": {
-                        "notebook_path": NOTEBOOK_PATH,
-                        "base_parameters": {p["name"]: p["default"] for p in INPUT_PARAMETERS}
-                    },
-                    "job_cluster_key": "default_cluster"
-                }
-            ],
-            "job_clusters": [
-                {
-                    "job_cluster_key": "default_cluster",
-                    "new_cluster": {
-                        "spark_version": "13.3.x-scala2.12",
-                        "node_type_id": "i3.xlarge",
-                        "num_workers": 2
-                    }
-                }
-            ],
-            "parameters": [
-                {
-                    "name": p["name"],
-                    "default": p["default"],
-                    "type": "text"
-                } for p in INPUT_PARAMETERS
-            ]
+            "job_cluster_key": "default_cluster"
+        }
+    ],
+    "job_clusters": [
+        {
+            "job_cluster_key": "default_cluster",
+            "new_cluster": {
+                "spark_version": "13.3.x-scala2.12",
+                "node_type_id": "i3.xlarge",
+                "num_workers": 2
+            }
         }
+    ],
+    "parameters": "{{parameters}}"
+})
+
+def job_params(**overrides):
+    params = {
+        "job_name": JOB_NAME,
+        "description": JOB_DESCRIPTION,
+        "service_principal": SERVICE_PRINCIPAL_NAME,
+        "notebook_path": NOTEBOOK_PATH,
+        "base_parameters": {p["name"]: p["default"] for p in INPUT_PARAMETERS},
+        "parameters": [{"name": p["name"], "default": p["default"], "type": "text"} for p in INPUT_PARAMETERS],
     }
-    return databricks_api("POST", "jobs/update", job_data)
+    params.update(overrides)
+    return params
+
+# === 5. CREATE JOB ===
+def create_job(params=None):
+    payload = JOB_TEMPLATE.render_json(params or job_params())
+    job = databricks_api("POST", "jobs/create", body=payload.encode("utf-8"))
+    job_index.upsert(job["job_id"], json.loads(payload))
+    return job
 
-# === 6. ASSIGN JOB PERMISSIONS ===
-def set_job_permissions(job_id):
+# === 6. UPDATE EXISTING JOB ===
+def update_job(job_id, dry_run=False, params=None):
+    new_settings = JOB_TEMPLATE.render(params or job_params())
+    # Only send what differs from the job's current settings
+    diff = diff_settings(fetch_job(databricks_api, job_id, version="2.2"), new_settings)
+    if not diff:
+        print(f"Job {job_id} is up to date.")
+        return {}
+    if dry_run:
+        print(format_plan(f"job '{new_settings['name']}' ({job_id})", diff))
+        return {}
+    resp = databricks_api("POST", "jobs/update", diff.payload(job_id))
+    job_index.upsert(job_id, new_settings)
+    return resp
+
+# === 7. ASSIGN JOB PERMISSIONS ===
+def set_job_permissions(job_id, dry_run=False):
     permissions_data = {
         "access_control_list": [
             {
@@ -148,25 +130,43 @@ def set_job_permissions(job_id):
             }
         ]
     }
+    # PATCH only adds grants, so send just the ones that are missing
+    plan = plan_additions(index_grants(fetch_job_acl(databricks_api, job_id)),
+                          index_grants(permissions_data["access_control_list"]))
+    method, payload = acl_request(plan, permissions_data["access_control_list"])
+    if method is None:
+        print(f"Permissions already up to date for job {job_id}.")
+        return
+    if dry_run:
+        print(format_plan(f"permissions on job {job_id}", acl_plan=plan))
+        return
     # Permissions API is still v2.0
-    databricks_api("PATCH", f"permissions/jobs/{job_id}", permissions_data, version="2.0")
+    databricks_api(method, f"permissions/jobs/{job_id}", payload, version="2.0")
 
 # === MAIN EXECUTION ===
+def main():
+    with session():
+        sp_id = get_service_principal_id(SERVICE_PRINCIPAL_NAME)
+        group_id = get_group_id(GROUP_NAME)
+
+        existing_job_id = find_job_by_notebook(NOTEBOOK_PATH)
+
+        if existing_job_id:
+            print(f"Job already exists (ID: {existing_job_id}), updating it...")
+            update_job(existing_job_id, dry_run=DRY_RUN)
+            job_id = existing_job_id
+        elif DRY_RUN:
+            print(f"+ job '{JOB_NAME}' (new), with permissions for '{GROUP_NAME}' and '{SERVICE_PRINCIPAL_NAME}'")
+            return
+        else:
+            print("Job does not exist, creating a new one...")
+            job = create_job()
+            job_id = job["job_id"]
+
+        set_job_permissions(job_id, dry_run=DRY_RUN)
+        print(f"Job configured with ID: {job_id}")
+        print(f"Permissions updated for group '{GROUP_NAME}' and service principal '{SERVICE_PRINCIPAL_NAME}'.")
+        save_all()
+
 if __name__ == "__main__":
-    sp_id = get_service_principal_id(SERVICE_PRINCIPAL_NAME)
-    group_id = get_group_id(GROUP_NAME)
-
-    existing_job_id = find_job_by_notebook(NOTEBOOK_PATH)
-
-    if existing_job_id:
-        print(f"Job already exists (ID: {existing_job_id}), updating it...")
-        update_job(existing_job_id)
-        job_id = existing_job_id
-    else:
-        print("Job does not exist, creating a new one...")
-        job = create_job()
-        job_id = job["job_id"]
-
-    set_job_permissions(job_id)
-    print(f"Job configured with ID: {job_id}")
-    print(f"Permissions updated for group '{GROUP_NAME}' and service principal '{SERVICE_PRINCIPAL_NAME}'.")
+    main()
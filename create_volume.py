@@ -1,25 +1,17 @@
-import urllib3
 import json
-import certifi
 
-# Disable InsecureRequestWarning
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from acl_reconciler import index_grants, plan_changes, uc_patch
+from databricks_client import get_client
+from instrumentation import session
+from principal_resolver import resolver_for
+from volume_catalog import VolumeCatalog
 
 # Databricks workspace URL and personal access token
 workspace_url = "https://your-databricks-workspace.cloud.databricks.com"
 token = "your-personal-access-token"
 
-# API endpoints
-volumes_endpoint = f"{workspace_url}/api/2.0/volumes"
-
-# Headers for the API request
-headers = {
-    "Authorization": f"Bearer {token}",
-    "Content-Type": "application/json"
-}
-
-# Create a PoolManager instance
-http = urllib3.PoolManager(cert_reqs='CERT_REQUIRED', ca_certs=certifi.where())
+# API endpoints (relative to {workspace_url}/api/2.0)
+volumes_endpoint = "volumes"
 
 # Volume configuration
 volume_config = {
@@ -31,102 +23,94 @@ volume_config = {
     "comment": "Volume created via REST API"
 }
 
+# Shared keep-alive pool with retry/backoff on 429 and 5xx
+def client():
+    return get_client(workspace_url, token)
+
+def databricks_api(method, endpoint, data=None, version="2.0"):
+    return client().api(method, endpoint, data, version=version)
+
+def principals():
+    return resolver_for(workspace_url, databricks_api)
+
+# Paginated, per-schema cached volume lookups; see volume_catalog.py
+volume_catalog = VolumeCatalog(
+    lambda method, endpoint, data=None, params=None: client().request(method, endpoint, data, params=params),
+    endpoint=volumes_endpoint
+)
+
 def get_volume_id(catalog, schema, name):
-    response = http.request(
-        'GET',
-        f"{volumes_endpoint}?catalog_name={catalog}&schema_name={schema}",
-        headers=headers
-    )
-    if response.status == 200:
-        volumes = json.loads(response.data.decode('utf-8'))['volumes']
-        for volume in volumes:
-            if volume['name'] == name:
-                return volume['volume_id']
-    return None
+    return volume_catalog.volume_id(catalog, schema, name)
 
-def create_or_update_volume():
+def create_or_update_volume(volume_config=volume_config):
     volume_id = get_volume_id(volume_config['catalog_name'], volume_config['schema_name'], volume_config['name'])
     
     if volume_id:
         print(f"Volume '{volume_config['name']}' already exists. Updating...")
         update_endpoint = f"{volumes_endpoint}/{volume_id}"
-        response = http.request(
-            'PATCH',
-            update_endpoint,
-            body=json.dumps(volume_config).encode('utf-8'),
-            headers=headers
-        )
+        response = client().request('PATCH', update_endpoint, volume_config)
     else:
         print(f"Creating new volume '{volume_config['name']}'...")
-        response = http.request(
-            'POST',
-            volumes_endpoint,
-            body=json.dumps(volume_config).encode('utf-8'),
-            headers=headers
-        )
+        response = client().request('POST', volumes_endpoint, volume_config)
 
     if response.status in [200, 201]:
-        volume_id = json.loads(response.data.decode('utf-8'))["volume_id"]
+        volume = {**volume_config, **json.loads(response.data.decode('utf-8'))}
+        volume_id = volume["volume_id"]
+        # Keep the cached schema listing current instead of listing it again
+        volume_catalog.record(volume)
         print(f"Volume operation successful. Volume ID: {volume_id}")
         return volume_id
     else:
+        # We no longer know what the schema holds; list it again next time
+        volume_catalog.invalidate(volume_config['catalog_name'], volume_config['schema_name'])
         print(f"Failed to create/update volume. Status code: {response.status}")
         print(f"Error message: {response.data.decode('utf-8')}")
         return None
 
 def get_current_permissions(volume_id):
     permissions_endpoint = f"{volumes_endpoint}/{volume_id}/permissions"
-    response = http.request('GET', permissions_endpoint, headers=headers)
+    response = client().request('GET', permissions_endpoint)
     if response.status == 200:
         return json.loads(response.data.decode('utf-8'))
     return None
 
-def update_permissions(volume_id):
+# Default grants applied to the volume
+permission_changes = [
+    {
+        "principal": "xyz",
+        "add": ["READ", "WRITE"]
+    },
+    {
+        "principal": "group A",
+        "add": ["READ"]
+    }
+]
+
+def update_permissions(volume_id, changes=permission_changes):
     permissions_config = {
-        "changes": [
-            {
-                "principal": "xyz",
-                "add": ["READ", "WRITE"]
-            },
-            {
-                "principal": "group A",
-                "add": ["READ"]
-            }
-        ]
+        "changes": [dict(change) for change in changes]
     }
 
+    # Grants take bare principal names; check them (cached) before touching the volume
+    unknown = [c['principal'] for c in permissions_config['changes'] if principals().find_any(c['principal'])[0] is None]
+    if unknown:
+        print(f"Unknown principals, not updating permissions: {', '.join(unknown)}")
+        return False
+
     current_permissions = get_current_permissions(volume_id)
     if current_permissions is None:
         print(f"Failed to retrieve current permissions for volume ID: {volume_id}")
         return False
 
-    changes_needed = False
-    for change in permissions_config['changes']:
-        principal = change['principal']
-        required_permissions = set(change['add'])
-        
-        if principal in current_permissions['access_control_list']:
-            existing_permissions = set(current_permissions['access_control_list'][principal]['permissions'])
-            missing_permissions = required_permissions - existing_permissions
-            if missing_permissions:
-                change['add'] = list(missing_permissions)
-                changes_needed = True
-            else:
-                permissions_config['changes'].remove(change)
-        else:
-            changes_needed = True
-
-    if not changes_needed:
+    # Index what the volume already has once, then send only the missing adds and
+    # the removals that would actually change something, for every principal at once
+    plan = plan_changes(index_grants(current_permissions), permissions_config['changes'])
+    if not plan:
         print("No permission changes needed. All required permissions are already set.")
         return True
 
     permissions_endpoint = f"{volumes_endpoint}/{volume_id}/permissions"
-    response = http.request(
-        'PATCH',
-        permissions_endpoint,
-        body=json.dumps(permissions_config).encode('utf-8'),
-        headers=headers
-    )
+    response = client().request('PATCH', permissions_endpoint, uc_patch(plan))
 
     if response.status == 200:
         print("Permissions updated successfully.")
@@ -138,9 +122,11 @@ def update_permissions(volume_id):
 
 # Main execution
 def main():
-    volume_id = create_or_update_volume()
-    if volume_id:
-        update_permissions(volume_id)
+    with session():
+        volume_id = create_or_update_volume()
+        if not volume_id:
+            return 1
+        return 0 if update_permissions(volume_id) else 1
 
 if __name__ == "__main__":
     main()
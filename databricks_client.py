@@ -0,0 +1,392 @@
+import json
+import random
+import threading
+import time
+from urllib.parse import urlencode
+
+import instrumentation
+
+# urllib3, ssl and certifi are imported when the first client is built, so
+# importing the scripts (or starting the CLI) stays cheap
+
+# === DEFAULTS ===
+# Shared by every client unless overridden with configure()
+OPTIONS = {
+    "pool_size": 16,         # keep-alive connections kept per host; size to your concurrency
+    "max_retries": 6,
+    "backoff_base": 0.5,     # seconds; doubles per attempt with full jitter
+    "backoff_max": 30.0,
+    "rate_limit": None,      # requests per second per workspace, None to disable
+    "burst": None,           # token bucket size, defaults to one second of rate_limit
+    "connect_timeout": 10.0,
+    "read_timeout": 60.0,
+    "transport": "urllib3",  # or "http2": every call multiplexed on one connection (needs httpx[http2])
+    "warm_connections": 0,   # connections opened as soon as the client is created
+    "tls_session_reuse": True,  # resume the host's last TLS session instead of a full handshake
+    "ca_certs": None,        # CA bundle file, defaults to certifi's
+}
+
+# 429 is always safe to retry; server errors only when repeating the call is harmless
+RETRY_ALWAYS = {429}
+RETRY_IDEMPOTENT = {500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "PATCH", "OPTIONS"}
+
+
+# === RATE LIMITER ===
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# === CONNECTION TRACKING ===
+# Counts real connects (TCP, plus TLS for https) on the calling thread, so each
+# call can report whether it rode an existing keep-alive connection, and how
+# many of its TLS handshakes resumed an earlier session
+_local = threading.local()
+
+def _count_connect(tls_socket=None):
+    _local.connects = getattr(_local, "connects", 0) + 1
+    if tls_socket is not None and tls_socket.session_reused:
+        _local.resumed = getattr(_local, "resumed", 0) + 1
+
+class _CountConnects:
+    def connect(self):
+        super().connect()
+        _count_connect(self.sock if hasattr(self.sock, "session_reused") else None)
+
+_pool_classes = None
+
+def pool_classes():
+    # scheme -> urllib3 pool class whose connections count their connects
+    global _pool_classes
+    if _pool_classes is None:
+        import urllib3
+
+        class _HTTPConnection(_CountConnects, urllib3.connection.HTTPConnection):
+            pass
+
+        class _HTTPSConnection(_CountConnects, urllib3.connection.HTTPSConnection):
+            pass
+
+        class _HTTPConnectionPool(urllib3.HTTPConnectionPool):
+            ConnectionCls = _HTTPConnection
+
+        class _HTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+            ConnectionCls = _HTTPSConnection
+
+        _pool_classes = {"http": _HTTPConnectionPool, "https": _HTTPSConnectionPool}
+    return _pool_classes
+
+
+# === TLS ===
+_context_class = None
+
+def tls_context(options):
+    # Verifying client context. With tls_session_reuse every new connection to a
+    # host offers the session of the previous one, so reconnects and all but the
+    # first warm-up connection skip the full handshake.
+    global _context_class
+    import ssl
+
+    if _context_class is None:
+        import weakref
+
+        class ResumingContext(ssl.SSLContext):
+            def wrap_socket(self, sock, *args, server_hostname=None, session=None, **kwargs):
+                if self.reuse_sessions and session is None:
+                    # TLS 1.3 tickets arrive after the handshake, so take the
+                    # session from the previous socket as late as possible
+                    previous = self.last_socket.get(server_hostname)
+                    previous = previous() if previous is not None else None
+                    if previous is not None and previous.session is not None:
+                        self.sessions[server_hostname] = previous.session
+                    session = self.sessions.get(server_hostname)
+                tls_socket = super().wrap_socket(sock, *args, server_hostname=server_hostname, session=session,
+                                                 **kwargs)
+                if self.reuse_sessions:
+                    self.last_socket[server_hostname] = weakref.ref(tls_socket)
+                return tls_socket
+        _context_class = ResumingContext
+
+    if options["ca_certs"]:
+        ca_certs = options["ca_certs"]
+    else:
+        import certifi
+        ca_certs = certifi.where()
+    context = _context_class(ssl.PROTOCOL_TLS_CLIENT)
+    context.load_verify_locations(ca_certs)
+    context.reuse_sessions = options["tls_session_reuse"]
+    context.sessions = {}
+    context.last_socket = {}
+    return context
+
+
+# === TRANSPORTS ===
+# A transport sends one HTTP request and returns a response with status, data,
+# headers and tell() (bytes received). errors are the exceptions it raises for
+# failed calls, unsent_errors those that mean the request never left.
+class Urllib3Transport:
+    def __init__(self, options):
+        import urllib3
+
+        self.errors = (urllib3.exceptions.HTTPError,)
+        self.unsent_errors = (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ConnectTimeoutError)
+        self.http = urllib3.PoolManager(
+            maxsize=options["pool_size"],
+            block=True,  # wait for a free keep-alive connection instead of opening throwaway ones
+            ssl_context=tls_context(options),
+            retries=False,
+            timeout=urllib3.Timeout(connect=options["connect_timeout"], read=options["read_timeout"]),
+        )
+        self.http.pool_classes_by_scheme = pool_classes()
+
+    def request(self, method, url, body, headers):
+        return self.http.request(method, url, body=body, headers=headers)
+
+    def warm_up(self, url, count):
+        # Opens up to count keep-alive connections and leaves them in the pool.
+        # Each sends a HEAD / so that it is known to work and has read its TLS
+        # session tickets; the first handshake is a full one, the rest resume it.
+        from concurrent.futures import ThreadPoolExecutor
+
+        pool = self.http.connection_from_url(url)
+        connections = [pool._get_conn() for _ in range(min(count, pool.pool.maxsize))]
+        opened = 0
+        try:
+            if connections and _try_open(connections[0]) is None:
+                opened += 1
+                with ThreadPoolExecutor(max_workers=min(32, max(1, len(connections) - 1))) as executor:
+                    opened += sum(error is None for error in executor.map(_try_open, connections[1:]))
+        finally:
+            for connection in connections:
+                pool._put_conn(connection)
+        return opened
+
+    def close(self):
+        self.http.clear()
+
+
+def _try_open(connection):
+    try:
+        connection.request("HEAD", "/")
+        connection.getresponse().read()
+    except Exception as e:
+        connection.close()
+        return e
+    return None
+
+
+class Http2Response:
+    def __init__(self, response):
+        self.status = response.status_code
+        self.data = response.content
+        self.headers = response.headers
+        self.http_version = response.http_version
+
+    def tell(self):
+        return len(self.data)
+
+
+class Http2Transport:
+    # httpx with HTTP/2: concurrent calls share one connection per host as
+    # separate streams (servers without HTTP/2 fall back to HTTP/1.1 keep-alive)
+    def __init__(self, options):
+        try:
+            import httpx
+        except ImportError:
+            raise Exception("The http2 transport needs httpx with HTTP/2 support: pip install 'httpx[http2]'")
+        self.errors = (httpx.TransportError,)
+        self.unsent_errors = (httpx.ConnectError, httpx.ConnectTimeout)
+        self.http = httpx.Client(
+            http2=True,
+            verify=tls_context(options),
+            timeout=httpx.Timeout(options["read_timeout"], connect=options["connect_timeout"]),
+            limits=httpx.Limits(max_connections=options["pool_size"],
+                                max_keepalive_connections=options["pool_size"]),
+        )
+
+    def request(self, method, url, body, headers):
+        request = self.http.build_request(method, url, content=body, headers=headers,
+                                          extensions={"trace": _trace_connects})
+        return Http2Response(self.http.send(request))
+
+    def warm_up(self, url, count):
+        # One connection carries every stream; opening it is all there is to warm
+        try:
+            self.request("HEAD", url, None, {})
+        except self.errors:
+            return 0
+        return 1
+
+    def close(self):
+        self.http.close()
+
+
+def _trace_connects(event, info):
+    # httpcore trace hook; runs on the calling thread
+    if event == "connection.connect_tcp.complete":
+        _local.connects = getattr(_local, "connects", 0) + 1
+    elif event == "connection.start_tls.complete":
+        tls_socket = info["return_value"].get_extra_info("ssl_object")
+        if tls_socket is not None and tls_socket.session_reused:
+            _local.resumed = getattr(_local, "resumed", 0) + 1
+
+
+TRANSPORTS = {"urllib3": Urllib3Transport, "http2": Http2Transport}
+
+
+# === CLIENT ===
+class DatabricksClient:
+    def __init__(self, host, token, **options):
+        self.host = host.rstrip("/")
+        self.options = {**OPTIONS, **options}
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        }
+        transport = TRANSPORTS.get(self.options["transport"])
+        if transport is None:
+            raise Exception(f"Unknown transport '{self.options['transport']}', use one of: {', '.join(TRANSPORTS)}")
+        self.transport = transport(self.options)
+        rate_limit = self.options["rate_limit"]
+        self.limiter = TokenBucket(rate_limit, self.options["burst"]) if rate_limit else None
+
+    def url(self, endpoint, version="2.0", params=None):
+        url = f"{self.host}/api/{version}/{endpoint}"
+        if params:
+            url += ("&" if "?" in endpoint else "?") + urlencode(params)
+        return url
+
+    def request(self, method, endpoint, data=None, version="2.0", params=None, body=None, headers=None):
+        # Returns the urllib3 response for any status; only gives up on retryable
+        # failures once max_retries is spent.
+        if body is None and data is not None:
+            body = json.dumps(data).encode("utf-8")
+        url = self.url(endpoint, version, params)
+        request_headers = {**self.headers, **(headers or {})}
+        attempt = 0
+        response = error = None
+        started_at, started = time.time(), time.perf_counter()
+        _local.connects = _local.resumed = 0
+        try:
+            while True:
+                if self.limiter:
+                    self.limiter.acquire()
+                try:
+                    response = self.transport.request(method, url, body, request_headers)
+                except self.transport.errors as e:
+                    # A failed connect never reached the server, so even a POST can be resent
+                    never_sent = isinstance(e, self.transport.unsent_errors)
+                    if not (never_sent or method in IDEMPOTENT_METHODS) or attempt >= self.options["max_retries"]:
+                        raise Exception(f"API call failed: {method} {endpoint}: {e}")
+                    time.sleep(self.backoff(attempt))
+                    attempt += 1
+                    continue
+                retryable = response.status in RETRY_ALWAYS or (
+                    response.status in RETRY_IDEMPOTENT and method in IDEMPOTENT_METHODS)
+                if not retryable or attempt >= self.options["max_retries"]:
+                    return response
+                time.sleep(max(self.backoff(attempt), retry_after(response)))
+                attempt += 1
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if instrumentation.active():
+                instrumentation.emit({
+                    "time": started_at,
+                    "host": self.host,
+                    "method": method,
+                    "endpoint": instrumentation.endpoint_template(endpoint),
+                    "path": f"{version}/{endpoint.split('?', 1)[0]}",
+                    "status": None if error or response is None else response.status,
+                    "error": str(error) if error else None,
+                    "bytes_out": len(body) if body else 0,
+                    "bytes_in": response.tell() if response is not None and not error else 0,
+                    "seconds": time.perf_counter() - started,
+                    "retries": attempt,
+                    "connections_opened": _local.connects,
+                    "connections_resumed": _local.resumed,
+                    "reused": _local.connects == 0,
+                })
+
+    def api(self, method, endpoint, data=None, version="2.0", params=None, body=None):
+        # body: an already encoded JSON payload, sent as is instead of data
+        response = self.request(method, endpoint, data, version=version, params=params, body=body)
+        if response.status not in (200, 201):
+            raise Exception(f"API call failed: {response.status} {response.data.decode()}")
+        return json.loads(response.data.decode()) if response.data else {}
+
+    def warm_up(self, count=None):
+        # Opens connections ahead of a burst of calls; returns how many opened
+        return self.transport.warm_up(self.host, count or self.options["warm_connections"] or self.options["pool_size"])
+
+    def backoff(self, attempt):
+        # Exponential backoff with full jitter
+        ceiling = min(self.options["backoff_max"], self.options["backoff_base"] * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def close(self):
+        self.transport.close()
+
+
+def retry_after(response):
+    value = response.headers.get("Retry-After")
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# === SHARED CLIENTS ===
+# One client (and so one connection pool and rate limiter) per workspace and token
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(host, token):
+    key = (host.rstrip("/"), token)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = DatabricksClient(host, token)
+            if client.options["warm_connections"]:
+                client.warm_up()
+        return client
+
+def configure(**options):
+    # Change defaults (pool_size, rate_limit, ...); clients are rebuilt on next use
+    unknown = set(options) - set(OPTIONS)
+    if unknown:
+        raise Exception(f"Unknown client options: {', '.join(sorted(unknown))}")
+    OPTIONS.update(options)
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+def databricks_api(host, token, method, endpoint, data=None, version="2.0"):
+    return get_client(host, token).api(method, endpoint, data, version=version)
@@ -0,0 +1,180 @@
+"""One command line for every provisioning script.
+
+    dbprov groups --group data-engineers --manager-group engineering-admins
+    dbprov jobs --name "Nightly report" --notebook /Repos/Analytics/Report --param env=prod
+    dbprov volumes --name raw --catalog main --schema landing --grant analysts=READ_VOLUME
+    dbprov provision manifest.yaml --state state.db
+    dbprov fanout workspaces.json manifest.yaml
+    dbprov runs 101 102 --param env=prod
+    dbprov transfer export jobs.ndjson.gz
+    dbprov files upload ./reference /Volumes/main/landing/raw
+    dbprov permissions snapshot --schema main.landing
+    dbprov sync idp-export.jsonl --dry-run
+
+The workspace comes from --host/--token or DATABRICKS_HOST/DATABRICKS_TOKEN.
+Flags not given keep the script's own defaults. provision, fanout, runs,
+transfer, files, permissions, sync and benchmark take their usual arguments
+after the command name.
+
+Nothing but argparse is imported up front: a script (and urllib3 with it) is
+only loaded for the command that runs, and the connection pool is created on
+the first API call.
+"""
+import argparse
+import os
+import sys
+
+HOST_ENV = "DATABRICKS_HOST"
+TOKEN_ENV = "DATABRICKS_TOKEN"
+
+# command -> (module whose main() takes the remaining arguments, help)
+PASSTHROUGH = {
+    "provision": ("provision_engine", "Provision groups, jobs and volumes from a manifest"),
+    "fanout": ("fanout", "Provision a manifest across many workspaces"),
+    "runs": ("job_runs", "Trigger job runs and wait for them to finish"),
+    "transfer": ("job_transfer", "Export or import job settings snapshots"),
+    "files": ("volume_files", "Upload or download files in a volume"),
+    "permissions": ("permissions_index", "Snapshot job, group and volume ACLs and query them by principal"),
+    "sync": ("directory_sync", "Mirror users, groups and membership from an identity provider export"),
+    "benchmark": ("benchmark", "Benchmark the provisioning flows against a mock workspace"),
+}
+
+
+# === WORKSPACE ===
+def workspace(args):
+    host = args.host or os.environ.get(HOST_ENV)
+    token = args.token or os.environ.get(TOKEN_ENV)
+    if not host or not token:
+        raise Exception(f"No workspace configured: pass --host/--token or set {HOST_ENV}/{TOKEN_ENV}")
+    return host, token
+
+
+def key_values(values, label):
+    pairs = []
+    for value in values or []:
+        key, sep, setting = value.partition("=")
+        if not sep:
+            raise Exception(f"Expected {label}, got '{value}'")
+        pairs.append((key.strip(), setting.strip()))
+    return pairs
+
+
+# === COMMANDS ===
+def run_groups(args):
+    import create_groups
+
+    create_groups.DATABRICKS_INSTANCE, create_groups.TOKEN = workspace(args)
+    if args.group:
+        create_groups.GROUP_NAME = args.group
+    if args.manager_user:
+        create_groups.GROUP_MANAGER_USER_NAME = args.manager_user
+    if args.manager_group:
+        create_groups.GROUP_MANAGER_GROUP_NAME = args.manager_group
+    return create_groups.main()
+
+
+def run_jobs(args):
+    import create_job_2
+
+    create_job_2.DATABRICKS_HOST, create_job_2.TOKEN = workspace(args)
+    for flag, name in (("name", "JOB_NAME"), ("notebook", "NOTEBOOK_PATH"), ("description", "JOB_DESCRIPTION"),
+                       ("service_principal", "SERVICE_PRINCIPAL_NAME"), ("group", "GROUP_NAME")):
+        if getattr(args, flag):
+            setattr(create_job_2, name, getattr(args, flag))
+    if args.param:
+        create_job_2.INPUT_PARAMETERS = [{"name": name, "default": default, "type": "text"}
+                                         for name, default in key_values(args.param, "NAME=DEFAULT")]
+    create_job_2.DRY_RUN = args.dry_run
+    create_job_2.main()
+    return 0
+
+
+def run_volumes(args):
+    import create_volume
+
+    create_volume.workspace_url, create_volume.token = workspace(args)
+    # main() uses these objects as argument defaults, so they are changed in place
+    for flag, field in (("name", "name"), ("catalog", "catalog_name"), ("schema", "schema_name"),
+                        ("type", "volume_type"), ("storage_location", "storage_location"), ("comment", "comment")):
+        if getattr(args, flag):
+            create_volume.volume_config[field] = getattr(args, flag)
+    if args.type == "MANAGED":
+        create_volume.volume_config.pop("storage_location", None)
+    if args.grant:
+        create_volume.permission_changes[:] = [
+            {"principal": principal, "add": [p.strip() for p in privileges.split(",") if p.strip()]}
+            for principal, privileges in key_values(args.grant, "PRINCIPAL=PRIVILEGE[,PRIVILEGE]")
+        ]
+    return create_volume.main()
+
+
+def run_passthrough(args):
+    import importlib
+
+    module_name, _ = PASSTHROUGH[args.command]
+    if args.command not in ("fanout", "benchmark") and (args.host or os.environ.get(HOST_ENV)):
+        from fanout import configure_workspace
+
+        configure_workspace(*workspace(args))
+    module = importlib.import_module(module_name)
+    sys.argv = [f"dbprov {args.command}"] + args.arguments
+    return module.main() or 0
+
+
+# === ENTRY POINT ===
+def build_parser():
+    parser = argparse.ArgumentParser(prog="dbprov", description="Provision Databricks groups, jobs and volumes")
+    parser.add_argument("--host", help=f"Workspace URL (default: ${HOST_ENV})")
+    parser.add_argument("--token", help=f"Personal access token (default: ${TOKEN_ENV})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    groups = commands.add_parser("groups", help="Create a group, add its managers and grant workspace access")
+    groups.add_argument("--group", help="Group to create or validate")
+    groups.add_argument("--manager-user", help="User added to the group")
+    groups.add_argument("--manager-group", help="Group added to the group and given CAN_MANAGE on it")
+    groups.set_defaults(run=run_groups)
+
+    jobs = commands.add_parser("jobs", help="Create or update a notebook job run as a service principal")
+    jobs.add_argument("--name")
+    jobs.add_argument("--notebook", help="Notebook path; also how an existing job is found")
+    jobs.add_argument("--description")
+    jobs.add_argument("--service-principal", help="Service principal the job runs as and is owned by")
+    jobs.add_argument("--group", help="Group given CAN_MANAGE_RUN")
+    jobs.add_argument("--param", action="append", metavar="NAME=DEFAULT", help="Job parameter, repeatable")
+    jobs.add_argument("--dry-run", action="store_true", help="Print the planned changes without applying them")
+    jobs.set_defaults(run=run_jobs)
+
+    volumes = commands.add_parser("volumes", help="Create or update a volume and its grants")
+    volumes.add_argument("--name")
+    volumes.add_argument("--catalog")
+    volumes.add_argument("--schema")
+    volumes.add_argument("--type", choices=["MANAGED", "EXTERNAL"])
+    volumes.add_argument("--storage-location", help="Cloud path of an EXTERNAL volume")
+    volumes.add_argument("--comment")
+    volumes.add_argument("--grant", action="append", metavar="PRINCIPAL=PRIVILEGE[,PRIVILEGE]",
+                         help="Privileges added for a principal, repeatable")
+    volumes.set_defaults(run=run_volumes)
+
+    for name, (_, help_text) in PASSTHROUGH.items():
+        # Everything after the command name, --help included, goes to the script's own parser
+        command = commands.add_parser(name, help=help_text, add_help=False)
+        command.set_defaults(run=run_passthrough)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.run is run_passthrough:
+        args.arguments = extra
+    elif extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    try:
+        return args.run(args)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
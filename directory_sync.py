@@ -0,0 +1,435 @@
+"""Mirror users, groups and group membership from an identity provider export.
+
+    python directory_sync.py export.jsonl --dry-run
+    python directory_sync.py export.csv --concurrency 16 --plan plan.jsonl
+
+The export is JSON lines or CSV with one user or group per record:
+
+    {"type": "user", "userName": "ana@example.com", "displayName": "Ana", "active": true, "groups": ["analysts"]}
+    {"type": "group", "displayName": "analysts", "groups": ["data-readers"]}
+
+    type,userName,displayName,active,groups
+    user,ana@example.com,Ana,true,analysts;finance
+    group,,analysts,,data-readers
+
+"groups" are the groups the record is a direct member of. A group named only in
+"groups" is synced as if it had a record of its own.
+
+The export and the workspace's SCIM Users and Groups listings are each sorted
+on disk in runs of --run-size records and merged in one pass. That pass finds:
+
+- users and groups to create
+- users to deactivate: missing from the export, or "active": false
+- users to reactivate
+- members to add to or remove from groups
+
+Memory stays bounded by the run size, not by the size of the directory. Only
+groups that appear in the export have members removed, and the workspace's
+other groups are left alone. --keep-unlisted leaves users that are missing
+from the export active.
+
+The changes are applied on --concurrency workers. Groups are created first,
+then users. After that, users are (de)activated and membership PatchOps are
+sent, --chunk-size members per request. --dry-run stops after counting.
+The workspace is whatever create_groups.py is configured for.
+"""
+import argparse
+import csv
+import heapq
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from operator import itemgetter
+
+import create_groups
+import databricks_client
+from instrumentation import session
+from principal_resolver import CACHE_FILE, persist_to, save_all
+
+DEFAULT_RUN_SIZE = 50000      # records sorted in memory before a run is spilled to disk
+DEFAULT_CONCURRENCY = 8
+OPERATIONS = ("create_group", "create_user", "deactivate", "reactivate", "add_member", "remove_member")
+
+
+def name_key(name):
+    # SCIM matches userName and displayName case-insensitively
+    return name.strip().lower()
+
+
+# === EXTERNAL SORT ===
+# Records are buffered as (key, record) and every run_size of them is sorted
+# and written to a temporary JSON lines file. Iterating merges the runs.
+class ExternalSorter:
+    def __init__(self, key, run_size=DEFAULT_RUN_SIZE, directory=None):
+        self.key = key
+        self.run_size = run_size
+        self.directory = directory
+        self.runs = []
+        self._buffer = []
+
+    def add(self, record):
+        self._buffer.append((self.key(record), record))
+        if len(self._buffer) >= self.run_size:
+            self._spill()
+
+    def _spill(self):
+        self._buffer.sort(key=itemgetter(0))
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", dir=self.directory, delete=False) as f:
+            for key, record in self._buffer:
+                f.write(json.dumps([key, record]) + "\n")
+        self.runs.append(f.name)
+        self._buffer = []
+
+    def _read(self, path):
+        with open(path) as f:
+            for line in f:
+                key, record = json.loads(line)
+                yield tuple(key) if isinstance(key, list) else key, record
+
+    def __iter__(self):
+        self._buffer.sort(key=itemgetter(0))
+        return heapq.merge(*(self._read(path) for path in self.runs), iter(self._buffer), key=itemgetter(0))
+
+    def close(self):
+        for path in self.runs:
+            os.remove(path)
+        self.runs = []
+        self._buffer = []
+
+
+def merge_join(left, right):
+    # (key, left record or None, right record or None) over two key-sorted
+    # (key, record) streams; repeated keys on one side keep the last record
+    left, right = dedupe(left), dedupe(right)
+    l_item, r_item = next(left, None), next(right, None)
+    while l_item or r_item:
+        if r_item is None or (l_item and l_item[0] < r_item[0]):
+            yield l_item[0], l_item[1], None
+            l_item = next(left, None)
+        elif l_item is None or r_item[0] < l_item[0]:
+            yield r_item[0], None, r_item[1]
+            r_item = next(right, None)
+        else:
+            yield l_item[0], l_item[1], r_item[1]
+            l_item, r_item = next(left, None), next(right, None)
+
+
+def dedupe(items):
+    previous = None
+    for item in items:
+        if previous and previous[0] != item[0]:
+            yield previous
+        # A group named in someone's "groups" gives way to its own record
+        if not (previous and previous[0] == item[0] and item[1].get("implicit")):
+            previous = item
+    if previous:
+        yield previous
+
+
+# === READING ===
+def read_export(path):
+    # Yields records as dicts with type, userName/displayName, active and groups
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                row["groups"] = [g for g in (row.get("groups") or "").split(";") if g.strip()]
+                active = (row.get("active") or "").strip().lower()
+                row["active"] = active not in ("false", "0", "no")
+                yield row
+    else:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def load_export(path, entities, edges):
+    # Feeds export entities ((kind, key) sorted) and membership edges
+    # ((kind, key, group key) sorted) into the sorters; returns the exported group keys
+    groups = set()
+
+    def declare(name, implicit):
+        if name_key(name) not in groups or not implicit:
+            groups.add(name_key(name))
+            entities.add({"kind": "group", "name": name.strip(), "active": True, "implicit": implicit})
+
+    for count, record in enumerate(read_export(path), 1):
+        kind = (record.get("type") or "user").strip().lower()
+        if kind == "group":
+            name = record.get("displayName") or ""
+            if not name.strip():
+                raise Exception(f"Record {count} of {path}: group without displayName")
+            declare(name, False)
+        elif kind == "user":
+            name = record.get("userName") or ""
+            if not name.strip():
+                raise Exception(f"Record {count} of {path}: user without userName")
+            entities.add({"kind": "user", "name": name.strip(), "display_name": record.get("displayName") or None,
+                          "active": record.get("active", True) is not False})
+        else:
+            raise Exception(f"Record {count} of {path}: unknown type '{kind}'")
+        for group in record.get("groups") or []:
+            declare(group, True)
+            edges.add({"kind": kind, "member": name_key(name), "group": name_key(group)})
+    return groups
+
+
+def check_listing(listed, totals):
+    # Anything missing from the listings would be planned as a create, and its
+    # users as deactivations, so a listing that did not reach totalResults stops
+    # the sync before planning
+    for resource, count in listed.items():
+        total = totals.get(resource)
+        if total is not None and count != total:
+            raise Exception(f"Listed {count} SCIM {resource} but the workspace reports {total}; "
+                            f"not planning creates or deactivations from a partial listing, run the sync again")
+
+
+def load_workspace(entities, edges, run_size, directory):
+    # Feeds the SCIM listings into the same sorted shapes as the export. Group
+    # members are listed by id, so edges are first sorted by member id and joined
+    # against the users and groups sorted by id to learn each member's name.
+    # Returns group key -> group id.
+    by_id = ExternalSorter(itemgetter("id"), run_size, directory)
+    member_edges = ExternalSorter(itemgetter("member_id"), run_size, directory)
+    group_ids = {}
+    totals = {}
+    listed = {"Users": 0, "Groups": 0}
+    try:
+        for user in create_groups.iter_users(attributes="id,userName,active", read_ahead=True, totals=totals):
+            record = {"kind": "user", "name": user["userName"], "id": user["id"], "active": user.get("active", True)}
+            entities.add(record)
+            by_id.add(record)
+            listed["Users"] += 1
+        for group in create_groups.iter_groups(attributes="id,displayName,members", read_ahead=True, totals=totals):
+            record = {"kind": "group", "name": group["displayName"], "id": group["id"], "active": True}
+            entities.add(record)
+            by_id.add(record)
+            group_ids[name_key(group["displayName"])] = group["id"]
+            for member in group.get("members", []):
+                member_edges.add({"member_id": member["value"], "group": name_key(group["displayName"])})
+            listed["Groups"] += 1
+        check_listing(listed, totals)
+
+        edge_iter = iter(member_edges)
+        edge = next(edge_iter, None)
+        for member_id, member in by_id:
+            while edge and edge[0] < member_id:
+                edge = next(edge_iter, None)  # a service principal or another member we do not sync
+            while edge and edge[0] == member_id:
+                edges.add({"kind": member["kind"], "member": name_key(member["name"]), "group": edge[1]["group"],
+                           "member_id": member_id})
+                edge = next(edge_iter, None)
+    finally:
+        by_id.close()
+        member_edges.close()
+    return group_ids
+
+
+# === PLANNING ===
+def entity_key(record):
+    return record["kind"], name_key(record["name"])
+
+
+def edge_key(record):
+    return record["kind"], record["member"], record["group"]
+
+
+def plan(wanted, current, wanted_edges, current_edges, managed_groups, plan_file, keep_unlisted=False):
+    # One pass over the four sorted streams. Writes one JSON line per change to
+    # plan_file and returns the count per operation.
+    counts = dict.fromkeys(OPERATIONS, 0)
+    counts["unchanged"] = 0
+
+    def emit(op, **fields):
+        counts[op] += 1
+        plan_file.write(json.dumps({"op": op, **fields}) + "\n")
+
+    edge_iter = merge_join(wanted_edges, current_edges)
+    edge = next(edge_iter, None)
+    for key, want, have in merge_join(wanted, current):
+        if want and not have:
+            if want["kind"] == "group":
+                emit("create_group", name=want["name"])
+            elif want["active"]:
+                emit("create_user", name=want["name"], display_name=want.get("display_name"))
+        elif want and have:
+            if want["kind"] == "user" and want["active"] != have["active"]:
+                emit("reactivate" if want["active"] else "deactivate", name=have["name"], id=have["id"])
+            else:
+                counts["unchanged"] += 1
+        elif have["kind"] == "user" and have["active"] and not keep_unlisted:
+            emit("deactivate", name=have["name"], id=have["id"])
+
+        # Membership edges sort by their member, so this member's edges come next
+        while edge and edge[0][:2] < key:
+            edge = next(edge_iter, None)
+        while edge and edge[0][:2] == key:
+            _, add, remove = edge
+            if add and not remove:
+                if not want or want["active"]:
+                    emit("add_member", kind=add["kind"], member=key[1], member_id=have["id"] if have else None,
+                         group=add["group"])
+            elif remove and not add and remove["group"] in managed_groups:
+                emit("remove_member", kind=remove["kind"], member=key[1], member_id=remove["member_id"],
+                     group=remove["group"])
+            edge = next(edge_iter, None)
+    return counts
+
+
+# === APPLYING ===
+def run_bounded(pool, tasks, limit, on_done):
+    # Runs (fn, args) tasks with at most limit in flight; on_done(args, result, error)
+    pending = {}
+
+    def collect(futures):
+        for future in futures:
+            args = pending.pop(future)
+            try:
+                on_done(args, future.result(), None)
+            except Exception as e:
+                on_done(args, None, e)
+
+    for fn, args in tasks:
+        pending[pool.submit(fn, *args)] = args
+        if len(pending) >= limit:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    collect(list(pending))
+
+
+def read_plan(path, ops):
+    with open(path) as f:
+        for line in f:
+            change = json.loads(line)
+            if change["op"] in ops:
+                yield change
+
+
+def apply(plan_path, group_ids, concurrency=DEFAULT_CONCURRENCY, chunk_size=create_groups.MEMBER_CHUNK_SIZE):
+    # Returns (applied, failed) counts per operation
+    applied = dict.fromkeys(OPERATIONS, 0)
+    failed = dict.fromkeys(OPERATIONS, 0)
+    created = {}  # (kind, key) -> id of everything created by this run
+
+    def report(op, label, error):
+        if error:
+            failed[op] += 1
+            print(f"❌ {op.replace('_', ' ')} {label}: {error}")
+        else:
+            applied[op] += 1
+
+    def create_group(name):
+        group = create_groups.create_group(name)
+        group_ids[name_key(name)] = created[("group", name_key(name))] = group["id"]
+
+    def create_user(name, display_name):
+        created[("user", name_key(name))] = create_groups.create_user(name, display_name)["id"]
+
+    def set_active(op, name, user_id):
+        create_groups.set_user_active(user_id, op == "reactivate")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # Groups before users, and both before any membership that refers to them
+        run_bounded(pool, ((create_group, (c["name"],)) for c in read_plan(plan_path, {"create_group"})),
+                    concurrency * 2, lambda args, _, error: report("create_group", args[0], error))
+        run_bounded(pool, ((create_user, (c["name"], c.get("display_name")))
+                           for c in read_plan(plan_path, {"create_user"})),
+                    concurrency * 2, lambda args, _, error: report("create_user", args[0], error))
+        run_bounded(pool, ((set_active, (c["op"], c["name"], c["id"]))
+                           for c in read_plan(plan_path, {"deactivate", "reactivate"})),
+                    concurrency * 2, lambda args, _, error: report(args[0], args[1], error))
+
+        # Membership: per-group batches go out as soon as they are full
+        pending = {}  # group id -> ([ids to add], [ids to remove])
+
+        def batches():
+            for change in read_plan(plan_path, {"add_member", "remove_member"}):
+                member_id = change["member_id"] or created.get((change["kind"], change["member"]))
+                group_id = group_ids.get(change["group"])
+                if member_id is None or group_id is None:
+                    # Its create failed above
+                    report(change["op"], f"{change['member']} ({change['group']})", "not created")
+                    continue
+                batch = pending.setdefault(group_id, ([], []))
+                batch[0 if change["op"] == "add_member" else 1].append(member_id)
+                if len(batch[0]) + len(batch[1]) >= chunk_size:
+                    yield create_groups.patch_group_members, (group_id, *pending.pop(group_id))
+            for group_id, (add_ids, remove_ids) in list(pending.items()):
+                yield create_groups.patch_group_members, (group_id, add_ids, remove_ids)
+
+        def membership_done(args, outcomes, error):
+            group_id, add_ids, remove_ids = args
+            for op, ids in (("add_member", add_ids), ("remove_member", remove_ids)):
+                for member_id in ids:
+                    outcome = f"failed: {error}" if error else outcomes.get(member_id, "")
+                    report(op, f"{member_id} in group {group_id}", outcome if outcome.startswith("failed") else None)
+
+        run_bounded(pool, batches(), concurrency * 2, membership_done)
+    return applied, failed
+
+
+def print_counts(title, counts):
+    print(f"📋 {title}: " + ", ".join(f"{counts[op]} {op.replace('_', ' ')}" for op in counts))
+
+
+# === MAIN ===
+def main():
+    parser = argparse.ArgumentParser(description="Sync users, groups and membership from a directory export")
+    parser.add_argument("export", help="CSV or JSON lines export")
+    parser.add_argument("--dry-run", action="store_true", help="Count the changes without applying them")
+    parser.add_argument("--plan", help="Keep the planned changes, one JSON line each, in this file")
+    parser.add_argument("--keep-unlisted", action="store_true", help="Do not deactivate users missing from the export")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--chunk-size", type=int, default=create_groups.MEMBER_CHUNK_SIZE,
+                        help="Members per membership PatchOp")
+    parser.add_argument("--run-size", type=int, default=DEFAULT_RUN_SIZE, help="Records sorted in memory at a time")
+    parser.add_argument("--principal-cache", nargs="?", const=CACHE_FILE, metavar="FILE",
+                        help="Keep resolved principal ids in this file so the next run starts warm")
+    args = parser.parse_args()
+
+    if args.principal_cache:
+        persist_to(args.principal_cache)
+    workdir = tempfile.mkdtemp(prefix="directory-sync-")
+    sorters = [ExternalSorter(entity_key, args.run_size, workdir), ExternalSorter(entity_key, args.run_size, workdir),
+               ExternalSorter(edge_key, args.run_size, workdir), ExternalSorter(edge_key, args.run_size, workdir)]
+    wanted, current, wanted_edges, current_edges = sorters
+    plan_path = args.plan or os.path.join(workdir, "plan.jsonl")
+    with session():
+        try:
+            start = time.perf_counter()
+            managed_groups = load_export(args.export, wanted, wanted_edges)
+            group_ids = load_workspace(current, current_edges, args.run_size, workdir)
+            with open(plan_path, "w") as plan_file:
+                counts = plan(wanted, current, wanted_edges, current_edges, managed_groups, plan_file,
+                              args.keep_unlisted)
+            for sorter in sorters:
+                sorter.close()
+            print_counts(f"Planned in {time.perf_counter() - start:.1f}s", counts)
+            if args.dry_run:
+                return 0
+
+            databricks_client.configure(pool_size=args.concurrency)
+            applied, failed = apply(plan_path, group_ids, args.concurrency, args.chunk_size)
+            print_counts("Applied", applied)
+            if any(failed.values()):
+                print_counts("Failed", {op: count for op, count in failed.items() if count})
+                return 1
+            print(f"✅ Directory synced in {time.perf_counter() - start:.1f}s")
+            return 0
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            return 1
+        finally:
+            for sorter in sorters:
+                sorter.close()
+            if not args.plan and os.path.exists(plan_path):
+                os.remove(plan_path)
+            os.rmdir(workdir)
+            save_all()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,183 @@
+"""Run one provisioning manifest against many workspaces at once.
+
+Workspaces file:
+
+    [
+      {"name": "prod-eu", "host": "https://adb-1.azuredatabricks.net", "token_env": "PROD_EU_TOKEN"},
+      {"name": "dev", "host": "https://dbc-2.cloud.databricks.com", "token": "dapi..."}
+    ]
+
+Every workspace runs in its own process (module-level config and caches are
+never shared between workspaces); --parallel caps how many run at once and
+the usual per-endpoint --limit caps apply inside each workspace.
+
+Usage: python fanout.py workspaces.json manifest.json [--parallel 8] [--report report.json]
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+DEFAULT_PARALLEL = 8
+LOG_DIR = "fanout-logs"
+
+
+def configure_workspace(host, token):
+    # The scripts read their endpoint and token from module globals at call time
+    import create_groups
+    import create_job
+    import create_job_2
+    import create_volume
+
+    create_groups.DATABRICKS_INSTANCE, create_groups.TOKEN = host, token
+    create_job.workspace_url, create_job.token = host, token
+    create_job_2.DATABRICKS_HOST, create_job_2.TOKEN = host, token
+    create_volume.workspace_url, create_volume.token = host, token
+
+
+def workspace_token(workspace):
+    if workspace.get("token"):
+        return workspace["token"]
+    token = os.environ.get(workspace.get("token_env", ""))
+    if not token:
+        raise Exception(f"No token for workspace '{workspace['name']}' (set token or token_env)")
+    return token
+
+
+def run_workspace(workspace, manifest, limits, rate_limit, log_dir, trace=False, state=None, principal_cache=None):
+    # Runs in a fresh worker process; returns a plain dict for the report
+    from instrumentation import session
+
+    start = time.perf_counter()
+    result = {"workspace": workspace["name"], "host": workspace["host"], "status": "ok",
+              "steps": {}, "error": None, "seconds": 0.0}
+    log_path = os.path.join(log_dir, f"{workspace['name']}.log")
+    trace_path = os.path.join(log_dir, f"{workspace['name']}.calls.jsonl") if trace else None
+    with open(log_path, "w") as log, contextlib.redirect_stdout(log):
+        try:
+            configure_workspace(workspace["host"], workspace_token(workspace))
+            import provision_engine
+
+            if principal_cache:
+                provision_engine.persist_to(principal_cache)
+
+            # The per-endpoint call summary ends up at the bottom of the workspace log
+            with session(trace_path):
+                outcomes = provision_engine.provision(manifest, limits, rate_limit, state=state)
+            provision_engine.print_report(outcomes, time.perf_counter() - start)
+            for outcome in outcomes.values():
+                result["steps"][outcome["status"]] = result["steps"].get(outcome["status"], 0) + 1
+            if any(outcome["status"] not in provision_engine.SUCCEEDED for outcome in outcomes.values()):
+                result["status"] = "failed"
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            result["status"] = "error"
+            result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - start
+    result["log"] = log_path
+    return result
+
+
+def process_pool(workers):
+    # A pool whose workers each run a single workspace. max_tasks_per_child only
+    # exists from Python 3.11; before that every task gets a one-off process pool.
+    context = multiprocessing.get_context("spawn")
+    if sys.version_info >= (3, 11):
+        return ProcessPoolExecutor(max_workers=workers, mp_context=context, max_tasks_per_child=1)
+    return SingleUseProcessPool(workers, context)
+
+
+class SingleUseProcessPool:
+    def __init__(self, workers, context):
+        self.context = context
+        self.threads = ThreadPoolExecutor(max_workers=workers)
+
+    def _run(self, fn, *args):
+        with ProcessPoolExecutor(max_workers=1, mp_context=self.context) as pool:
+            return pool.submit(fn, *args).result()
+
+    def submit(self, fn, *args):
+        return self.threads.submit(self._run, fn, *args)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.threads.shutdown()
+
+
+def fan_out(workspaces, manifest, parallel=DEFAULT_PARALLEL, limits=None, rate_limit=None, log_dir=LOG_DIR,
+            trace=False, state=None, principal_cache=None):
+    os.makedirs(log_dir, exist_ok=True)
+    results = []
+    # spawn + one task per child: every workspace starts from clean module state
+    with process_pool(min(parallel, len(workspaces)) or 1) as pool:
+        futures = {
+            pool.submit(run_workspace, workspace, manifest, limits, rate_limit, log_dir, trace, state,
+                        principal_cache): workspace
+            for workspace in workspaces
+        }
+        for future in as_completed(futures):
+            workspace = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. killed); report it like any other failure
+                result = {"workspace": workspace["name"], "host": workspace["host"], "status": "error",
+                          "steps": {}, "error": str(e), "seconds": 0.0}
+            icon = "✅" if result["status"] == "ok" else "❌"
+            print(f"{icon} {result['workspace']}: {result['status']} in {result['seconds']:.1f}s")
+            results.append(result)
+    return sorted(results, key=lambda r: r["workspace"])
+
+
+def print_report(results, elapsed):
+    print(f"\n{'WORKSPACE':<24} {'STATUS':<8} {'SECONDS':>8}  STEPS")
+    for result in results:
+        steps = ", ".join(f"{count} {status}" for status, count in sorted(result["steps"].items()))
+        print(f"{result['workspace']:<24} {result['status']:<8} {result['seconds']:>8.1f}  {steps or result['error'] or ''}")
+    latencies = sorted(result["seconds"] for result in results)
+    ok = sum(1 for result in results if result["status"] == "ok")
+    if latencies:
+        print(f"📋 {ok}/{len(results)} workspaces succeeded in {elapsed:.1f}s "
+              f"(median {latencies[len(latencies) // 2]:.1f}s, slowest {latencies[-1]:.1f}s)")
+
+
+def main():
+    import provision_engine
+
+    parser = argparse.ArgumentParser(description="Provision a manifest across many workspaces")
+    parser.add_argument("workspaces")
+    parser.add_argument("manifest")
+    parser.add_argument("--parallel", type=int, default=DEFAULT_PARALLEL, help="Workspaces provisioned at once")
+    parser.add_argument("--limit", action="append", metavar="ENDPOINT=N",
+                        help="Max concurrent calls per workspace for scim, jobs, volumes or permissions")
+    parser.add_argument("--rate-limit", type=float, help="Max requests per second per workspace")
+    parser.add_argument("--log-dir", default=LOG_DIR)
+    parser.add_argument("--report", help="Write the per-workspace results as JSON")
+    parser.add_argument("--trace", action="store_true",
+                        help="Also write each workspace's API calls to <log-dir>/<name>.calls.jsonl")
+    parser.add_argument("--state", help="SQLite state file shared by all workspaces; reruns skip applied steps")
+    parser.add_argument("--principal-cache", nargs="?", const=provision_engine.CACHE_FILE, metavar="FILE",
+                        help="Principal id cache shared by all workspaces, so the next run starts warm")
+    args = parser.parse_args()
+
+    with open(args.workspaces) as f:
+        workspaces = json.load(f)
+    manifest = provision_engine.load_manifest(args.manifest)
+    start = time.perf_counter()
+    results = fan_out(workspaces, manifest, args.parallel, provision_engine.parse_limits(args.limit),
+                      args.rate_limit, args.log_dir, args.trace, args.state, args.principal_cache)
+    print_report(results, time.perf_counter() - start)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0 if all(result["status"] == "ok" for result in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,211 @@
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+# Environment variables picked up by session() when no paths are passed
+TRACE_ENV = "DATABRICKS_TRACE"      # JSON-lines file, one line per call
+METRICS_ENV = "DATABRICKS_METRICS"  # Prometheus text-format file written at the end of the run
+
+# Histogram buckets (seconds) for the Prometheus dump
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SUMMARY_TOP = 5
+
+ID_SEGMENT = re.compile(r"\d+|[0-9a-fA-F-]{16,}|.*\..*")
+
+
+# === CALL RECORDS ===
+# DatabricksClient.request() hands every finished call to emit() as a plain dict:
+#   time, host, method, endpoint (ids replaced by {id}), path, status, error,
+#   bytes_out, bytes_in, seconds (including retries), retries,
+#   connections_opened, connections_resumed (TLS handshakes that resumed a session),
+#   reused (True when no new connection had to be opened)
+def endpoint_template(endpoint):
+    # Group calls by route: jobs/get, permissions/jobs/{id}, preview/scim/v2/Groups/{id}, ...
+    path = endpoint.split("?", 1)[0].strip("/")
+    return "/".join("{id}" if ID_SEGMENT.fullmatch(segment) else segment for segment in path.split("/"))
+
+
+_sinks = []
+_sinks_lock = threading.Lock()
+
+def add_sink(sink):
+    # A sink is anything with record(call); close() is called when its session ends
+    with _sinks_lock:
+        _sinks.append(sink)
+    return sink
+
+def remove_sink(sink):
+    with _sinks_lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+def active():
+    return bool(_sinks)
+
+def emit(call):
+    for sink in list(_sinks):
+        try:
+            sink.record(call)
+        except Exception as e:
+            # Losing a trace line must never fail the API call it describes
+            print(f"⚠️ Instrumentation sink {type(sink).__name__} failed: {e}")
+
+
+# === SINKS ===
+class Recorder:
+    # In-memory per-endpoint aggregates, used for the end-of-run summary
+    def __init__(self):
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, call):
+        key = (call["method"], call["endpoint"])
+        with self._lock:
+            stats = self.endpoints.get(key)
+            if stats is None:
+                stats = self.endpoints[key] = {"calls": 0, "errors": 0, "retries": 0, "seconds": [],
+                                               "bytes_in": 0, "bytes_out": 0, "reused": 0}
+            stats["calls"] += 1
+            stats["errors"] += bool(call["error"]) or call["status"] is None or call["status"] >= 400
+            stats["retries"] += call["retries"]
+            stats["seconds"].append(call["seconds"])
+            stats["bytes_in"] += call["bytes_in"]
+            stats["bytes_out"] += call["bytes_out"]
+            stats["reused"] += call["reused"]
+
+    def close(self):
+        pass
+
+    def rows(self):
+        rows = []
+        with self._lock:
+            for (method, endpoint), stats in self.endpoints.items():
+                seconds = sorted(stats["seconds"])
+                rows.append({
+                    "method": method, "endpoint": endpoint, "calls": stats["calls"], "errors": stats["errors"],
+                    "retries": stats["retries"], "total": sum(seconds),
+                    "p50": seconds[len(seconds) // 2],
+                    "p99": seconds[min(len(seconds) - 1, int(len(seconds) * 0.99))],
+                    "bytes_in": stats["bytes_in"], "bytes_out": stats["bytes_out"], "reused": stats["reused"],
+                })
+        return rows
+
+    def print_summary(self, top=SUMMARY_TOP):
+        rows = self.rows()
+        if not rows:
+            return
+        calls = sum(row["calls"] for row in rows)
+        reused = sum(row["reused"] for row in rows)
+        print(f"\n📊 {calls} API calls, {sum(row['retries'] for row in rows)} retries, "
+              f"{sum(row['errors'] for row in rows)} errors, {reused}/{calls} on reused connections, "
+              f"{sum(row['total'] for row in rows):.1f}s in calls")
+        header = f"   {'CALLS':>6} {'TOTAL s':>8} {'p50 ms':>8} {'p99 ms':>8} {'RETRY':>5}  ENDPOINT"
+        for title, order in (("🐢 Slowest endpoints (total time)", lambda r: r["total"]),
+                             ("🔁 Most frequent endpoints", lambda r: r["calls"])):
+            print(f"{title}:")
+            print(header)
+            for row in sorted(rows, key=order, reverse=True)[:top]:
+                print(f"   {row['calls']:>6} {row['total']:>8.2f} {row['p50'] * 1000:>8.1f} "
+                      f"{row['p99'] * 1000:>8.1f} {row['retries']:>5}  {row['method']} {row['endpoint']}")
+
+
+class JsonLinesSink:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", buffering=1)
+        self._lock = threading.Lock()
+
+    def record(self, call):
+        line = json.dumps(call) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class PrometheusSink:
+    # Aggregates counters and a latency histogram; the text-format file is written on close()
+    def __init__(self, path, prefix="databricks_api"):
+        self.path = path
+        self.prefix = prefix
+        self.requests = {}    # (method, endpoint, status) -> count
+        self.totals = {}      # (method, endpoint) -> {"retries", "bytes_in", "bytes_out", "connections_opened"}
+        self.latency = {}     # (method, endpoint) -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def record(self, call):
+        key = (call["method"], call["endpoint"])
+        status = str(call["status"]) if call["status"] is not None else "error"
+        with self._lock:
+            self.requests[key + (status,)] = self.requests.get(key + (status,), 0) + 1
+            totals = self.totals.setdefault(key, {"retries": 0, "bytes_in": 0, "bytes_out": 0,
+                                                  "connections_opened": 0})
+            for field in totals:
+                totals[field] += call[field]
+            histogram = self.latency.setdefault(key, [0] * len(LATENCY_BUCKETS) + [0.0, 0])
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if call["seconds"] <= bound:
+                    histogram[i] += 1
+            histogram[-2] += call["seconds"]
+            histogram[-1] += 1
+
+    def render(self):
+        p = self.prefix
+        lines = [f"# HELP {p}_requests_total API calls by endpoint and final status.",
+                 f"# TYPE {p}_requests_total counter"]
+        with self._lock:
+            for (method, endpoint, status), count in sorted(self.requests.items()):
+                lines.append(f'{p}_requests_total{{method="{method}",endpoint="{endpoint}",status="{status}"}} {count}')
+            for field, help_text in (("retries", "Retried attempts."), ("bytes_in", "Response bytes."),
+                                     ("bytes_out", "Request bytes."),
+                                     ("connections_opened", "New connections opened.")):
+                lines += [f"# HELP {p}_{field}_total {help_text}", f"# TYPE {p}_{field}_total counter"]
+                for (method, endpoint), totals in sorted(self.totals.items()):
+                    lines.append(f'{p}_{field}_total{{method="{method}",endpoint="{endpoint}"}} {totals[field]}')
+            lines += [f"# HELP {p}_request_seconds Call latency including retries.",
+                      f"# TYPE {p}_request_seconds histogram"]
+            for (method, endpoint), histogram in sorted(self.latency.items()):
+                labels = f'method="{method}",endpoint="{endpoint}"'
+                # Buckets were counted per bound already, so they are cumulative as Prometheus expects
+                for bound, count in zip(LATENCY_BUCKETS, histogram):
+                    lines.append(f'{p}_request_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{p}_request_seconds_bucket{{{labels},le="+Inf"}} {histogram[-1]}')
+                lines.append(f"{p}_request_seconds_sum{{{labels}}} {histogram[-2]:.6f}")
+                lines.append(f"{p}_request_seconds_count{{{labels}}} {histogram[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        tmp_file = f"{self.path}.tmp"
+        with open(tmp_file, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_file, self.path)
+
+
+# === RUN SESSIONS ===
+@contextmanager
+def session(trace=None, metrics=None, summary=True):
+    # Instrument every call made inside the block; trace/metrics default to the
+    # DATABRICKS_TRACE / DATABRICKS_METRICS environment variables
+    trace = trace or os.environ.get(TRACE_ENV)
+    metrics = metrics or os.environ.get(METRICS_ENV)
+    sinks = [add_sink(Recorder())] if summary else []
+    if trace:
+        sinks.append(add_sink(JsonLinesSink(trace)))
+    if metrics:
+        sinks.append(add_sink(PrometheusSink(metrics)))
+    try:
+        yield sinks[0] if summary else None
+    finally:
+        for sink in sinks:
+            remove_sink(sink)
+            sink.close()
+        if summary:
+            sinks[0].print_summary()
+        if trace:
+            print(f"📝 Call trace written to {trace}")
+        if metrics:
+            print(f"📝 Metrics written to {metrics}")
@@ -0,0 +1,129 @@
+import json
+
+from acl_reconciler import describe
+from urllib.parse import urlencode
+
+# Values the Jobs API fills in when a field is omitted; treated as "not set"
+SERVER_DEFAULTS = {
+    "timeout_seconds": 0,
+    "max_retries": 0,
+    "min_retry_interval_millis": 0,
+    "retry_on_timeout": False,
+    "run_if": "ALL_SUCCESS",
+    "max_concurrent_runs": 1,
+    "format": "MULTI_TASK",
+    "source": "WORKSPACE",
+    "disable_auto_optimization": False,
+}
+
+# Arrays jobs/update merges element by element instead of replacing wholesale
+KEYED_ARRAYS = {
+    "tasks": "task_key",
+    "job_clusters": "job_cluster_key",
+}
+
+# Arrays whose order carries no meaning; sorted by this key before comparing
+UNORDERED_ARRAYS = {
+    "parameters": "name",
+    "libraries": None,
+    "depends_on": "task_key",
+}
+
+# === NORMALIZATION ===
+def normalize(value, key=None):
+    if isinstance(value, dict):
+        result = {}
+        for k, v in value.items():
+            v = normalize(v, k)
+            if v is None or v == {} or v == []:
+                continue
+            if k in SERVER_DEFAULTS and v == SERVER_DEFAULTS[k]:
+                continue
+            result[k] = v
+        return result
+    if isinstance(value, list):
+        items = [normalize(v) for v in value]
+        sort_key = UNORDERED_ARRAYS.get(key, KEYED_ARRAYS.get(key))
+        if key in UNORDERED_ARRAYS or key in KEYED_ARRAYS:
+            items.sort(key=lambda item: str(item.get(sort_key)) if sort_key and isinstance(item, dict)
+                       else json.dumps(item, sort_keys=True))
+        return items
+    return value
+
+
+# === SETTINGS DIFF ===
+class JobDiff:
+    def __init__(self):
+        self.new_settings = {}
+        self.fields_to_remove = []
+        self.changes = []  # (op, path, old, new) with op in "+", "-", "~"
+
+    def __bool__(self):
+        return bool(self.new_settings or self.fields_to_remove)
+
+    def payload(self, job_id):
+        payload = {"job_id": job_id, "new_settings": self.new_settings}
+        if self.fields_to_remove:
+            payload["fields_to_remove"] = self.fields_to_remove
+        return payload
+
+
+def diff_settings(current, desired):
+    # Only fields named in desired are managed; anything else on the job is left alone
+    diff = JobDiff()
+    current = normalize(current)
+    for field, desired_value in desired.items():
+        wanted = normalize({field: desired_value}).get(field)
+        existing = current.get(field)
+        if field in KEYED_ARRAYS and isinstance(desired_value, list):
+            _diff_keyed_array(diff, field, existing or [], desired_value)
+        elif wanted != existing:
+            diff.new_settings[field] = desired_value
+            diff.changes.append(("+" if existing is None else "~", field, existing, wanted))
+    return diff
+
+
+def _diff_keyed_array(diff, field, existing, desired):
+    # Send only the tasks / job clusters that changed and remove the ones that went away
+    key = KEYED_ARRAYS[field]
+    current_items = {item.get(key): item for item in existing}
+    changed = []
+    for item in desired:
+        wanted = normalize(item)
+        have = current_items.pop(item.get(key), None)
+        if wanted != have:
+            changed.append(item)
+            diff.changes.append(("+" if have is None else "~", f"{field}/{item.get(key)}", have, wanted))
+    if changed:
+        diff.new_settings[field] = changed
+    for item_key in current_items:
+        diff.fields_to_remove.append(f"{field}/{item_key}")
+        diff.changes.append(("-", f"{field}/{item_key}", current_items[item_key], None))
+
+
+# === CURRENT STATE ===
+def fetch_job(api, job_id, version="2.1"):
+    return api("GET", f"jobs/get?{urlencode({'job_id': job_id})}", version=version).get("settings", {})
+
+
+def fetch_job_acl(api, job_id):
+    return api("GET", f"permissions/jobs/{job_id}", version="2.0").get("access_control_list", [])
+
+
+# === PLAN OUTPUT ===
+def _short(value):
+    text = json.dumps(value, sort_keys=True)
+    return text if len(text) <= 60 else text[:57] + "..."
+
+
+def format_plan(label, diff=None, acl_plan=None):
+    lines = [f"~ {label}"]
+    for op, path, old, new in (diff.changes if diff else []):
+        if op == "~":
+            lines.append(f"    ~ {path}: {_short(old)} -> {_short(new)}")
+        elif op == "+":
+            lines.append(f"    + {path}: {_short(new)}")
+        else:
+            lines.append(f"    - {path}")
+    lines.extend(f"    {line.replace(' ', ' permission ', 1)}" for line in describe(acl_plan or {}))
+    return "\n".join(lines)
@@ -0,0 +1,184 @@
+import threading
+from urllib.parse import urlencode
+
+# Largest page the Jobs API accepts for jobs/list
+PAGE_SIZE = 100
+
+
+# === JOB INDEX ===
+# Walks every page of jobs/list once and keeps name / notebook path / task key
+# lookups in memory. Creates and updates made through this process are folded
+# in with upsert() so later lookups never need another full listing.
+class JobIndex:
+    def __init__(self, api, version="2.1", page_size=PAGE_SIZE):
+        # api has the databricks_api(method, endpoint, data=None, version=...) shape
+        self.api = api
+        self.version = version
+        self.page_size = page_size
+        self.loaded = False
+        self._settings = {}
+        self._by_name = {}
+        self._by_notebook = {}
+        self._by_task_key = {}
+        # Reentrant: refresh() runs under ensure_loaded()'s lock and calls _add().
+        # Every change and lookup holds it, since import and provisioning pools
+        # upsert into and read from the same index.
+        self._lock = threading.RLock()
+
+    # --- Listing ---
+    def iter_pages(self, page_token=None):
+        # (jobs, next_page_token) per page; next_page_token is None on the last page
+        params = {"limit": self.page_size, "expand_tasks": "true"}
+        if page_token:
+            params["page_token"] = page_token
+        while True:
+            resp = self.api("GET", f"jobs/list?{urlencode(params)}", version=self.version)
+            next_token = resp.get("next_page_token") if resp.get("has_more") else None
+            yield resp.get("jobs", []), next_token
+            if not next_token:
+                break
+            params["page_token"] = next_token
+
+    def iter_jobs(self):
+        for jobs, _ in self.iter_pages():
+            yield from jobs
+
+    def refresh(self):
+        with self._lock:
+            self.clear()
+            for job in self.iter_jobs():
+                self._add(job["job_id"], job.get("settings", {}))
+            self.loaded = True
+            return self
+
+    def ensure_loaded(self):
+        # Concurrent first lookups share a single listing
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self.refresh()
+        return self
+
+    def clear(self):
+        with self._lock:
+            self._settings.clear()
+            self._by_name.clear()
+            self._by_notebook.clear()
+            self._by_task_key.clear()
+            self.loaded = False
+
+    # --- Incremental updates ---
+    def upsert(self, job_id, settings, replace=False):
+        # jobs/update merges top-level fields of new_settings, jobs/reset replaces them
+        with self._lock:
+            current = self._settings.get(job_id)
+            if current is not None:
+                self._remove_keys(job_id, current)
+                if not replace:
+                    settings = {**current, **settings}
+            self._add(job_id, settings)
+
+    def remove(self, job_id):
+        with self._lock:
+            current = self._settings.pop(job_id, None)
+            if current is not None:
+                self._remove_keys(job_id, current)
+
+    def refresh_job(self, job_id):
+        # Re-read a single job through jobs/get instead of relisting everything
+        job = self.api("GET", f"jobs/get?{urlencode({'job_id': job_id})}", version=self.version)
+        self.upsert(job_id, job.get("settings", {}), replace=True)
+
+    # --- Lookups ---
+    def job_id_by_name(self, name):
+        return self._first(self._by_name, name)
+
+    def job_id_by_notebook(self, notebook_path):
+        return self._first(self._by_notebook, notebook_path)
+
+    def job_id_by_task_key(self, task_key):
+        return self._first(self._by_task_key, task_key)
+
+    def settings(self, job_id):
+        with self._lock:
+            return self._settings.get(job_id)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._settings)
+
+    def __contains__(self, job_id):
+        with self._lock:
+            return job_id in self._settings
+
+    # --- Internals ---
+    def _first(self, mapping, key):
+        self.ensure_loaded()
+        with self._lock:
+            job_ids = mapping.get(key)
+            return job_ids[0] if job_ids else None
+
+    def _keys(self, settings):
+        notebook_paths, task_keys = set(), set()
+        tasks = list(settings.get("tasks", []))
+        # Single-task (2.0 style) settings keep notebook_task at the top level
+        if "notebook_task" in settings:
+            tasks.append(settings)
+        for task in tasks:
+            notebook_path = task.get("notebook_task", {}).get("notebook_path")
+            if notebook_path:
+                notebook_paths.add(notebook_path)
+            if task.get("task_key"):
+                task_keys.add(task["task_key"])
+        return settings.get("name"), notebook_paths, task_keys
+
+    def _add(self, job_id, settings):
+        # _add and _remove_keys are only called with the lock held
+        self._settings[job_id] = settings
+        name, notebook_paths, task_keys = self._keys(settings)
+        if name is not None:
+            self._by_name.setdefault(name, []).append(job_id)
+        for notebook_path in notebook_paths:
+            self._by_notebook.setdefault(notebook_path, []).append(job_id)
+        for task_key in task_keys:
+            self._by_task_key.setdefault(task_key, []).append(job_id)
+
+    def _remove_keys(self, job_id, settings):
+        name, notebook_paths, task_keys = self._keys(settings)
+        for mapping, keys in (
+            (self._by_name, [name] if name is not None else []),
+            (self._by_notebook, notebook_paths),
+            (self._by_task_key, task_keys),
+        ):
+            for key in keys:
+                job_ids = mapping.get(key, [])
+                if job_id in job_ids:
+                    job_ids.remove(job_id)
+                if not job_ids:
+                    mapping.pop(key, None)
+
+
+# Top-level fields of a single-task (2.0 style) config that belong to its task in 2.1
+LEGACY_TASK_FIELDS = (
+    "notebook_task", "spark_jar_task", "spark_python_task", "spark_submit_task", "python_wheel_task",
+    "pipeline_task", "sql_task", "dbt_task", "run_job_task", "existing_cluster_id", "new_cluster", "libraries",
+)
+LEGACY_TASK_KEY = "main"
+
+
+def settings_from_config(job_config):
+    # Strip request-only fields so the remainder can be indexed as job settings
+    if "new_settings" in job_config:
+        return multi_task(job_config["new_settings"])
+    return multi_task({k: v for k, v in job_config.items() if k != "job_id"})
+
+
+def multi_task(settings):
+    # jobs/get in 2.1 always answers with a tasks array, so a single-task config
+    # is moved into one before it is created or compared
+    if "tasks" in settings or not any(field in settings for field in LEGACY_TASK_FIELDS):
+        return settings
+    task = {"task_key": LEGACY_TASK_KEY}
+    task.update({k: v for k, v in settings.items() if k in LEGACY_TASK_FIELDS})
+    return {**{k: v for k, v in settings.items() if k not in LEGACY_TASK_FIELDS}, "tasks": [task]}
+
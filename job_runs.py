@@ -0,0 +1,224 @@
+"""Trigger job runs and follow them until they finish.
+
+    python job_runs.py 101 102 103 --param env=prod --param date=2025-08-04
+    python job_runs.py 101 --no-wait
+
+Runs are started with jobs/run-now on a bounded pool. Their state is tracked
+for the whole batch through jobs/runs/list rather than one jobs/runs/get per
+run. Each cycle lists the active runs, then the completed ones until every run
+that left the active list is found. Listings start at the trigger time and stop
+after a few pages; runs still not found are fetched with jobs/runs/get. Every
+run-now carries an idempotency token, so a retried trigger does not start the
+job twice. The polling interval starts at
+--min-interval and doubles after every cycle in which no run finished, up to
+--max-interval; it drops back as soon as one does.
+The workspace is whatever create_job.py is configured for.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import create_job
+
+TERMINAL_STATES = {"TERMINATED", "SKIPPED", "INTERNAL_ERROR"}
+RUNS_PAGE_SIZE = 25  # largest page jobs/runs/list accepts
+MAX_LIST_PAGES = 4   # pages per listing before the runs not seen fall back to jobs/runs/get
+CLOCK_SKEW = 300000  # ms the trigger time is moved back, in case our clock is ahead of the workspace's
+DEFAULT_CONCURRENCY = 8
+MIN_INTERVAL = 2.0   # seconds between polls while runs are finishing
+MAX_INTERVAL = 60.0
+BACKOFF = 2.0        # interval multiplier after a cycle in which no run finished
+
+
+def life_cycle_state(run):
+    return (run or {}).get("state", {}).get("life_cycle_state")
+
+def is_terminal(run):
+    return life_cycle_state(run) in TERMINAL_STATES
+
+def succeeded(run):
+    return (run or {}).get("state", {}).get("result_state") == "SUCCESS"
+
+
+# === TRIGGERING ===
+def run_now(job_id, job_parameters=None, idempotency_token=None):
+    # idempotency_token: a retried trigger with the same token returns the same run
+    payload = {"job_id": job_id}
+    if job_parameters:
+        payload["job_parameters"] = job_parameters
+    if idempotency_token:
+        payload["idempotency_token"] = idempotency_token
+    return create_job.databricks_api("POST", "jobs/run-now", payload)["run_id"]
+
+
+def trigger_runs(requests, concurrency=DEFAULT_CONCURRENCY):
+    # requests: (job_id, job_parameters or None) pairs; the same job may appear
+    # with different parameters. Returns (job_id, run_id, error) per request, in order.
+    # Each request gets its own token, which the client's retries resend unchanged.
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [(job_id, pool.submit(run_now, job_id, params, str(uuid.uuid4()))) for job_id, params in requests]
+        results = []
+        for job_id, future in futures:
+            try:
+                results.append((job_id, future.result(), None))
+            except Exception as e:
+                results.append((job_id, None, str(e)))
+    return results
+
+
+# === POLLING ===
+class RunTracker:
+    def __init__(self, run_ids, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, backoff=BACKOFF,
+                 started_after=None):
+        self.runs = {run_id: None for run_id in run_ids}  # run_id -> run as last listed
+        # Epoch ms before the runs were triggered: no older run can be one of ours
+        self.started_after = started_after
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.requests = 0
+
+    def pending(self):
+        return {run_id for run_id, run in self.runs.items() if not is_terminal(run)}
+
+    def done(self):
+        return not self.pending()
+
+    def _list_runs(self, wanted, **filters):
+        # Pages of jobs/runs/list (newest first), stopping once every wanted run was
+        # seen or after MAX_LIST_PAGES; poll() gets whatever is left one by one
+        params = {"limit": RUNS_PAGE_SIZE, **filters}
+        started = [run["start_time"] for run in self.runs.values() if run and run.get("start_time")]
+        if len(started) == len(self.runs):
+            # Nothing older than our oldest run can be one of ours
+            params["start_time_from"] = min(started)
+        elif self.started_after is not None:
+            params["start_time_from"] = self.started_after - CLOCK_SKEW
+        found = {}
+        for _ in range(MAX_LIST_PAGES):
+            self.requests += 1
+            resp = create_job.databricks_api("GET", f"jobs/runs/list?{urlencode(params)}")
+            for run in resp.get("runs", []):
+                if run["run_id"] in wanted:
+                    found[run["run_id"]] = run
+            if len(found) == len(wanted) or not resp.get("has_more"):
+                break
+            params["page_token"] = resp.get("next_page_token")
+        return found
+
+    def poll(self):
+        # One cycle. Returns (run, previous life cycle state) for every run whose state changed.
+        pending = self.pending()
+        found = self._list_runs(pending, active_only="true")
+        missing = pending - set(found)
+        if missing:
+            found.update(self._list_runs(missing, completed_only="true"))
+        for run_id in pending - set(found):
+            # Listed neither way, e.g. a run that has only just been queued or one
+            # past the page cap
+            self.requests += 1
+            found[run_id] = create_job.databricks_api("GET", f"jobs/runs/get?run_id={run_id}")
+
+        changes = []
+        for run_id, run in found.items():
+            previous = self.runs[run_id]
+            if run.get("state") != (previous or {}).get("state"):
+                changes.append((run, life_cycle_state(previous)))
+            self.runs[run_id] = run
+        if any(is_terminal(run) for run, _ in changes):
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        return changes
+
+
+async def watch_runs(run_ids, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, backoff=BACKOFF,
+                     timeout=None, tracker=None, started_after=None):
+    # Async iterator of run state changes: yields (run, previous life cycle state)
+    # until every run has finished. Pass a RunTracker to read its request count after.
+    tracker = tracker or RunTracker(run_ids, min_interval, max_interval, backoff, started_after)
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        for change in await asyncio.to_thread(tracker.poll):
+            yield change
+        if tracker.done():
+            return
+        if deadline and time.monotonic() + tracker.interval > deadline:
+            raise Exception(f"Timed out with {len(tracker.pending())} runs still active")
+        await asyncio.sleep(tracker.interval)
+
+
+def describe(run, previous):
+    state = run.get("state", {})
+    label = f"run {run['run_id']} (job {run.get('job_id')})"
+    if is_terminal(run):
+        icon = "✅" if succeeded(run) else "❌"
+        message = f": {state['state_message']}" if state.get("state_message") else ""
+        return f"{icon} {label}: {state.get('life_cycle_state')} {state.get('result_state', '')}{message}".rstrip()
+    return f"🔄 {label}: {previous or 'new'} -> {state.get('life_cycle_state')}"
+
+
+def wait_for_runs(run_ids, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, timeout=None, verbose=True,
+                  started_after=None):
+    # Blocking form of watch_runs; returns run_id -> final run
+    tracker = RunTracker(run_ids, min_interval, max_interval, started_after=started_after)
+
+    async def follow():
+        async for run, previous in watch_runs(run_ids, timeout=timeout, tracker=tracker):
+            if verbose:
+                print(describe(run, previous), flush=True)
+
+    asyncio.run(follow())
+    return tracker.runs
+
+
+def parse_params(values):
+    params = {}
+    for value in values or []:
+        name, sep, setting = value.partition("=")
+        if not sep:
+            raise Exception(f"Expected NAME=VALUE, got '{value}'")
+        params[name.strip()] = setting
+    return params
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trigger job runs and wait for them to finish")
+    parser.add_argument("job_ids", nargs="+", type=int)
+    parser.add_argument("--param", action="append", metavar="NAME=VALUE", help="Job parameter override for every run")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Parallel run-now calls")
+    parser.add_argument("--no-wait", action="store_true", help="Trigger the runs and exit")
+    parser.add_argument("--min-interval", type=float, default=MIN_INTERVAL, help="Seconds between polls at first")
+    parser.add_argument("--max-interval", type=float, default=MAX_INTERVAL, help="Longest wait between polls")
+    parser.add_argument("--timeout", type=float, help="Give up after this many seconds")
+    args = parser.parse_args()
+
+    params = parse_params(args.param)
+    triggered_at = int(time.time() * 1000)
+    run_ids = []
+    for job_id, run_id, error in trigger_runs([(job_id, params) for job_id in args.job_ids], args.concurrency):
+        if error:
+            print(f"❌ job {job_id}: {error}")
+        else:
+            print(f"▶️ job {job_id}: run {run_id}")
+            run_ids.append(run_id)
+    if args.no_wait or not run_ids:
+        return 0 if len(run_ids) == len(args.job_ids) else 1
+
+    try:
+        runs = wait_for_runs(run_ids, args.min_interval, args.max_interval, args.timeout,
+                             started_after=triggered_at)
+    except Exception as e:
+        print(f"❌ {e}")
+        return 1
+    failed = [run_id for run_id, run in runs.items() if not succeeded(run)]
+    print(f"{'✅' if not failed else '❌'} {len(runs) - len(failed)}/{len(runs)} runs succeeded")
+    return 0 if not failed and len(run_ids) == len(args.job_ids) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
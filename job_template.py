@@ -0,0 +1,110 @@
+import itertools
+import json
+import re
+
+PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+SEPARATORS = (",", ":")
+
+
+# === JOB TEMPLATES ===
+# A job spec with {{name}} placeholders, compiled once into pre-serialized JSON
+# fragments. A string that is exactly "{{name}}" is replaced by the parameter's
+# JSON value (any type: a dict of base_parameters, a list, a number); placeholders
+# inside a longer string are substituted as text. Rendering a variant only encodes
+# its parameters and joins the fragments.
+class JobTemplate:
+    def __init__(self, spec):
+        self.spec = spec
+        self.literals = []  # literals[i] comes before slots[i]; one more literal than slots
+        self.slots = []     # (parameter name, substituted inside a string)
+        self._pending = []
+        self._compile(spec)
+        self.literals.append("".join(self._pending))
+        del self._pending
+        self.parameters = sorted({name for name, _ in self.slots})
+
+    # --- Compiling ---
+    def _literal(self, text):
+        self._pending.append(text)
+
+    def _slot(self, name, in_string):
+        self.literals.append("".join(self._pending))
+        self._pending = []
+        self.slots.append((name, in_string))
+
+    def _compile(self, value):
+        if isinstance(value, dict):
+            self._literal("{")
+            for i, (key, item) in enumerate(value.items()):
+                if i:
+                    self._literal(",")
+                self._compile_string(str(key))
+                self._literal(":")
+                self._compile(item)
+            self._literal("}")
+        elif isinstance(value, (list, tuple)):
+            self._literal("[")
+            for i, item in enumerate(value):
+                if i:
+                    self._literal(",")
+                self._compile(item)
+            self._literal("]")
+        elif isinstance(value, str):
+            whole = PLACEHOLDER.fullmatch(value)
+            if whole:
+                self._slot(whole.group(1), False)
+            else:
+                self._compile_string(value)
+        else:
+            self._literal(json.dumps(value))
+
+    def _compile_string(self, text):
+        self._literal('"')
+        position = 0
+        for match in PLACEHOLDER.finditer(text):
+            self._literal(json.dumps(text[position:match.start()])[1:-1])
+            self._slot(match.group(1), True)
+            position = match.end()
+        self._literal(json.dumps(text[position:])[1:-1] + '"')
+
+    # --- Rendering ---
+    def _encode(self, params, name, in_string, cache=None):
+        try:
+            value = params[name]
+        except KeyError:
+            raise Exception(f"Missing job template parameter '{name}'")
+        key = None
+        # True == 1 == 1.0 as dict keys, so the type is part of the key; containers
+        # (where the same holds for their items) are not memoized at all
+        if cache is not None and isinstance(value, (str, int, float, bool, type(None))):
+            key = (name, in_string, type(value), value)
+            if key in cache:
+                return cache[key]
+        encoded = json.dumps(str(value))[1:-1] if in_string else json.dumps(value, separators=SEPARATORS)
+        if key is not None:
+            cache[key] = encoded
+        return encoded
+
+    def render_json(self, params, _cache=None):
+        parts = [self.literals[0]]
+        for (name, in_string), literal in zip(self.slots, self.literals[1:]):
+            parts.append(self._encode(params, name, in_string, _cache))
+            parts.append(literal)
+        return "".join(parts)
+
+    def render(self, params):
+        # The settings as a dict, e.g. to diff against a job's current settings
+        return json.loads(self.render_json(params))
+
+    def render_many(self, params_list):
+        # Batch rendering: values shared between variants are only encoded once
+        cache = {}
+        return [self.render_json(params, cache) for params in params_list]
+
+
+def expand(base=None, **axes):
+    # Every combination of the axis values on top of the base parameters:
+    #   expand(common, env=["dev", "prod"], team=teams) -> [{**common, "env": ..., "team": ...}, ...]
+    base = base or {}
+    names = list(axes)
+    return [{**base, **dict(zip(names, values))} for values in itertools.product(*axes.values())]
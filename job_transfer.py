@@ -0,0 +1,230 @@
+"""Export every job's settings to a snapshot file and import snapshots back.
+
+Snapshots are newline-delimited JSON, one {"job_id", "settings"} object per line,
+gzip-compressed when the file name ends in .gz. Neither direction holds more than
+one page of jobs (export) or the in-flight window (import) in memory.
+
+    python job_transfer.py export jobs.ndjson.gz
+    python job_transfer.py import jobs.ndjson.gz --concurrency 8
+
+Both commands keep a checkpoint next to the snapshot (<snapshot>.export.checkpoint /
+<snapshot>.import.checkpoint) and pick up from it with --resume after a failure.
+On import, a job whose exported job_id still exists in the workspace updates
+that job; any other job is matched by name, through the same create-or-update
+(diffed update) path create_job.py uses. Job names are not unique: a job that
+shares its name with an earlier one in the snapshot, and whose job_id is not in
+the workspace, is created as a separate job and reported.
+The workspace is whatever create_job.py is configured for.
+"""
+import argparse
+import contextlib
+import gzip
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import create_job
+from job_diff import diff_settings, fetch_job
+from job_index import settings_from_config
+
+DEFAULT_CONCURRENCY = 8
+PROGRESS_EVERY = 2.0  # seconds between progress lines
+
+
+# === CHECKPOINTS ===
+def checkpoint_path(snapshot, command):
+    return f"{snapshot}.{command}.checkpoint"
+
+def read_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def write_checkpoint(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+class Progress:
+    def __init__(self, label, out=None):
+        self.label = label
+        self.out = out or sys.stdout
+        self.count = 0
+        self.failed = 0
+        self.start = self._last = time.perf_counter()
+
+    def add(self, count=1, failed=0):
+        self.count += count
+        self.failed += failed
+        now = time.perf_counter()
+        if now - self._last >= PROGRESS_EVERY:
+            self._last = now
+            self.report()
+
+    def report(self, icon="⏳"):
+        elapsed = time.perf_counter() - self.start
+        rate = self.count / elapsed if elapsed else 0.0
+        failed = f", {self.failed} failed" if self.failed else ""
+        print(f"{icon} {self.label}: {self.count} jobs{failed} ({rate:.0f}/s, {elapsed:.1f}s)", file=self.out, flush=True)
+
+
+# === EXPORT ===
+def export_jobs(snapshot, resume=False):
+    # Every page is written (as its own gzip member when compressing) and flushed
+    # before the checkpoint moves past it, so a resumed export never loses or
+    # duplicates a page
+    checkpoint = checkpoint_path(snapshot, "export")
+    state = read_checkpoint(checkpoint) if resume else None
+    if resume and state is None:
+        print(f"⚠️ No export checkpoint for {snapshot}, starting over")
+    state = state or {"page_token": None, "offset": 0, "exported": 0}
+    # A None page token past offset 0 (checkpoints written before "complete" existed) also means done
+    if state.get("complete") or (state["page_token"] is None and state["offset"]):
+        print(f"✅ Export to {snapshot} already finished ({state['exported']} jobs)")
+        os.remove(checkpoint)
+        return state["exported"]
+    compress = snapshot.endswith(".gz")
+    progress = Progress("exported")
+    progress.count = state["exported"]
+
+    index = create_job.job_index
+    mode = "r+b" if state["offset"] else "wb"
+    with open(snapshot, mode) as f:
+        # Drop anything written after the last checkpoint
+        f.seek(state["offset"])
+        f.truncate()
+        for jobs, next_token in index.iter_pages(state["page_token"]):
+            lines = []
+            for job in jobs:
+                settings = job.get("settings", {})
+                if job.get("has_more"):
+                    # The listing truncated this job's tasks; jobs/get has all of them
+                    settings = fetch_job(create_job.databricks_api, job["job_id"], version=index.version)
+                lines.append(json.dumps({"job_id": job["job_id"], "settings": settings}, separators=(",", ":")))
+            if lines:
+                data = ("\n".join(lines) + "\n").encode("utf-8")
+                f.write(gzip.compress(data) if compress else data)
+                f.flush()
+                os.fsync(f.fileno())
+            state = {"page_token": next_token, "offset": f.tell(), "exported": state["exported"] + len(lines),
+                     "complete": next_token is None}
+            write_checkpoint(checkpoint, state)
+            progress.add(len(lines))
+    os.remove(checkpoint)
+    progress.report("✅")
+    return state["exported"]
+
+
+# === IMPORT ===
+def read_snapshot(snapshot):
+    opener = gzip.open if snapshot.endswith(".gz") else open
+    with opener(snapshot, "rt", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if line.strip():
+                yield line_number, json.loads(line)
+
+
+def import_job(job, match_name=True):
+    # The exported job_id wins when that job is still here (a restore into the same
+    # workspace); otherwise the job is matched by name, or created when match_name=False
+    settings = job["settings"]
+    # The index was listed with full settings: a job it already shows as identical
+    # needs no jobs/get, everything else goes through the usual diffed upsert
+    index = create_job.job_index
+    job_id = job.get("job_id") if job.get("job_id") in index else None
+    if job_id is None and match_name:
+        job_id = index.job_id_by_name(settings.get("name"))
+    if job_id and not diff_settings(index.settings(job_id), settings_from_config(settings)):
+        return job_id
+    job_id = create_job.create_or_update_job(settings, job_id=job_id, match_name=False)
+    if job_id is None:
+        raise Exception(f"Failed to create or update job '{settings.get('name')}'")
+    return job_id
+
+
+def import_jobs(snapshot, concurrency=DEFAULT_CONCURRENCY, resume=False, verbose=False):
+    # Upserts run on a bounded pool; at most 2 x concurrency jobs are read ahead.
+    # The checkpoint records the line up to which every job is done, so a resumed
+    # import repeats at most the in-flight window (updates of unchanged jobs are no-ops,
+    # a same-name job created separately in that window is created again).
+    checkpoint = checkpoint_path(snapshot, "import")
+    state = (read_checkpoint(checkpoint) if resume else None) or {"line": 0, "imported": 0, "failed": 0}
+    state.setdefault("duplicates", 0)
+    out = sys.stdout
+    progress = Progress("imported", out)
+    progress.count, progress.failed = state["imported"], state["failed"]
+    create_job.job_index.ensure_loaded()
+
+    pending = {}      # future -> (line number, job name)
+    finished = set()  # line numbers done past the checkpoint line
+    seen = set()
+
+    def collect(futures):
+        for future in futures:
+            line_number, name = pending.pop(future)
+            try:
+                future.result()
+                progress.add()
+            except Exception as e:
+                progress.add(0, failed=1)
+                print(f"❌ line {line_number}, job '{name}': {e}", file=out, flush=True)
+            finished.add(line_number)
+        # Advance the checkpoint over every contiguous finished line
+        line = state["line"]
+        while line + 1 in finished:
+            line += 1
+            finished.discard(line)
+        state.update(line=line, imported=progress.count, failed=progress.failed)
+        write_checkpoint(checkpoint, state)
+
+    # The create/update path narrates every job; keep it out of the way unless asked
+    with contextlib.ExitStack() as quiet, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        if not verbose:
+            quiet.enter_context(contextlib.redirect_stdout(quiet.enter_context(open(os.devnull, "w"))))
+        for line_number, job in read_snapshot(snapshot):
+            name = job["settings"].get("name")
+            if line_number <= state["line"]:
+                seen.add(name)
+                continue
+            duplicate = name in seen
+            seen.add(name)
+            if duplicate and job.get("job_id") not in create_job.job_index:
+                state["duplicates"] += 1
+                print(f"⚠️ line {line_number}: job '{name}' (exported as {job.get('job_id')}) shares its name "
+                      f"with an earlier job, creating it as a separate job", file=out, flush=True)
+            pending[pool.submit(import_job, job, not duplicate)] = (line_number, name)
+            if len(pending) >= concurrency * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(list(pending))
+    os.remove(checkpoint)
+    progress.report("✅")
+    if state["duplicates"]:
+        print(f"⚠️ {state['duplicates']} jobs shared a name with an earlier job and were created separately",
+              file=out, flush=True)
+    return progress.count, progress.failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import job settings snapshots")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("snapshot", help="Snapshot file; .gz for a gzip-compressed snapshot")
+    parser.add_argument("--resume", action="store_true", help="Continue from the last checkpoint")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Parallel upserts on import")
+    parser.add_argument("--verbose", action="store_true", help="Print every job the import creates or updates")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_jobs(args.snapshot, args.resume)
+        return 0
+    _, failed = import_jobs(args.snapshot, args.concurrency, args.resume, args.verbose)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,121 @@
+import json
+from collections import Counter
+
+from acl_reconciler import PRINCIPAL_KINDS
+
+SECTIONS = ("groups", "jobs", "volumes")
+
+
+# === LOADING ===
+def load_manifest(path):
+    with open(path) as f:
+        text = f.read()
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise Exception("YAML manifests need PyYAML (pip install pyyaml); or use JSON")
+        return yaml.safe_load(text) or {}
+    return json.loads(text)
+
+
+# === MERGING ===
+# The same object may be declared more than once (e.g. a group listed by two
+# teams); every declaration is folded into one so it is written once.
+def _union(*lists):
+    return list(dict.fromkeys(item for items in lists for item in items))
+
+def merge_manifest(manifest):
+    unknown = set(manifest) - set(SECTIONS)
+    if unknown:
+        raise Exception(f"Unknown manifest sections: {', '.join(sorted(unknown))}")
+
+    groups = {}
+    for group in manifest.get("groups", []):
+        merged = groups.setdefault(group["name"], {"name": group["name"], "members": {"users": [], "groups": []},
+                                                   "managers": [], "workspace_access": False})
+        members = group.get("members", {})
+        merged["members"]["users"] = _union(merged["members"]["users"], members.get("users", []))
+        merged["members"]["groups"] = _union(merged["members"]["groups"], members.get("groups", []))
+        merged["managers"] = _union(merged["managers"], group.get("managers", []))
+        merged["workspace_access"] = merged["workspace_access"] or bool(group.get("workspace_access"))
+
+    jobs = {}
+    for job in manifest.get("jobs", []):
+        name = job["config"]["name"]
+        merged = jobs.setdefault(name, {"config": {}, "owner": None, "group": None, "permissions": []})
+        # Later declarations win field by field
+        merged["config"] = {**merged["config"], **job["config"]}
+        merged["owner"] = job.get("owner") or merged["owner"]
+        merged["group"] = job.get("group") or merged["group"]
+        merged["permissions"] += [p for p in job.get("permissions", []) if p not in merged["permissions"]]
+
+    volumes = {}
+    for volume in manifest.get("volumes", []):
+        config = volume["config"]
+        full_name = f"{config['catalog_name']}.{config['schema_name']}.{config['name']}"
+        merged = volumes.setdefault(full_name, {"config": {}, "grants": {}})
+        merged["config"] = {**merged["config"], **config}
+        for grant in volume.get("grants", []):
+            change = merged["grants"].setdefault(grant["principal"], {"add": [], "remove": []})
+            change["add"] = _union(change["add"], grant.get("add", []))
+            change["remove"] = _union(change["remove"], grant.get("remove", []))
+
+    return {
+        "groups": list(groups.values()),
+        "jobs": list(jobs.values()),
+        "volumes": [
+            {"config": volume["config"],
+             "grants": [{"principal": principal, **{k: v for k, v in change.items() if v}}
+                        for principal, change in volume["grants"].items()]}
+            for volume in volumes.values()
+        ],
+    }
+
+
+# === REFERENCES ===
+def principal_references(manifest):
+    # Every principal name the (merged) manifest mentions, by kind. Volume grants
+    # take bare names that may be any kind, so they are collected under "any".
+    references = {"user": set(), "group": set(), "service_principal": set(), "any": set()}
+    for group in manifest["groups"]:
+        references["group"].add(group["name"])
+        references["user"].update(group["members"]["users"])
+        references["group"].update(group["members"]["groups"])
+        references["group"].update(group["managers"])
+    for job in manifest["jobs"]:
+        if job["owner"]:
+            references["user"].add(job["owner"])
+        if job["group"]:
+            references["group"].add(job["group"])
+        for entry in job["permissions"]:
+            for field, kind in PRINCIPAL_KINDS.items():
+                if entry.get(field):
+                    references[kind].add(entry[field])
+    for volume in manifest["volumes"]:
+        references["any"].update(grant["principal"] for grant in volume["grants"])
+    return references
+
+
+def volume_schemas(manifest):
+    # (catalog, schema) -> number of volumes the manifest puts there
+    return Counter((v["config"]["catalog_name"], v["config"]["schema_name"]) for v in manifest["volumes"])
+
+
+# === ORDERING ===
+def stages(steps):
+    # Steps grouped into waves: every step only depends on steps in earlier waves
+    depth = {}
+
+    def level(key):
+        if key not in depth:
+            depth[key] = 1 + max((level(dep) for dep in steps[key].requires), default=-1)
+        return depth[key]
+
+    waves = []
+    for key in steps:
+        index = level(key)
+        while len(waves) <= index:
+            waves.append([])
+        waves[index].append(key)
+    return waves
@@ -0,0 +1,286 @@
+import re
+import threading
+from array import array
+from collections import deque
+
+from acl_reconciler import index_grants
+
+MEMBER_PATH = re.compile(r'members\[value eq "([^"]*)"\]')
+
+
+# === MEMBERSHIP GRAPH ===
+# Every group and its members from one listing, as integer node ids: members[g]
+# holds the nodes directly in group g and parents[n] (the reverse index) the
+# groups n is directly in. Nested membership questions ("which groups is this
+# user effectively in", "who is transitively in X") are graph walks over these
+# arrays instead of SCIM requests. PatchOps sent through this process are folded
+# in with apply_patch() so the graph stays current without another listing.
+class MembershipGraph:
+    def __init__(self, list_groups):
+        # list_groups() yields SCIM groups with their members arrays
+        self.list_groups = list_groups
+        # Reentrant: refresh() runs under ensure_loaded()'s lock and calls add_group().
+        # Every change, walk and ancestor cache rebuild holds it, since the provision
+        # engine's worker threads update and query the same graph.
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        self._ids = []             # node -> SCIM id
+        self._nodes = {}           # SCIM id -> node
+        self._names = {}           # node -> displayName (groups, and members listed with one)
+        self._by_name = {}         # lowercased group displayName -> node
+        self._is_group = bytearray()
+        self._members = []         # node -> array of member nodes
+        self._parents = []         # node -> array of the groups the node is directly in
+        self._ancestors = {}       # node -> frozenset of every group it is transitively in
+        self.loaded = False
+
+    # --- Loading ---
+    def refresh(self):
+        with self._lock:
+            self.clear()
+            for group in self.list_groups():
+                self.add_group(group)
+            self.loaded = True
+            return self
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self.refresh()
+        return self
+
+    def _node(self, scim_id):
+        node = self._nodes.get(scim_id)
+        if node is None:
+            node = self._nodes[scim_id] = len(self._ids)
+            self._ids.append(scim_id)
+            self._is_group.append(0)
+            self._members.append(array("i"))
+            self._parents.append(array("i"))
+        return node
+
+    # --- Incremental updates ---
+    def add_group(self, group):
+        # A listed or newly created group, with whatever members it came with
+        with self._lock:
+            node = self._node(group["id"])
+            self._is_group[node] = 1
+            self._names[node] = group.get("displayName")
+            self._by_name[(group.get("displayName") or "").lower()] = node
+            for member in group.get("members", []):
+                self._link(node, member["value"], member.get("display"))
+            self._ancestors.clear()
+            return node
+
+    def _link(self, group_node, member_id, display=None):
+        member = self._node(member_id)
+        if display and member not in self._names:
+            self._names[member] = display
+        if member not in self._members[group_node]:
+            self._members[group_node].append(member)
+            self._parents[member].append(group_node)
+
+    def add_member(self, group_id, member_id):
+        with self._lock:
+            group = self._node(group_id)
+            self._is_group[group] = 1
+            self._link(group, member_id)
+            self._ancestors.clear()
+
+    def remove_member(self, group_id, member_id):
+        with self._lock:
+            group, member = self._nodes.get(group_id), self._nodes.get(member_id)
+            if group is None or member is None or member not in self._members[group]:
+                return
+            self._members[group].remove(member)
+            self._parents[member].remove(group)
+            self._ancestors.clear()
+
+    def apply_patch(self, group_id, payload):
+        # Mirrors a successful SCIM PatchOp on the group. Before the first load
+        # there is nothing to update: the listing will include the change.
+        with self._lock:
+            if not self.loaded:
+                return
+            for operation in payload.get("Operations", []):
+                op, path, value = operation.get("op", "").lower(), operation.get("path"), operation.get("value")
+                if path is None and isinstance(value, dict):
+                    path, value = "members", value.get("members")
+                    if value is None:
+                        continue
+                if op == "replace" and path == "members":
+                    for member in list(self._members[self._node(group_id)]):
+                        self.remove_member(group_id, self._ids[member])
+                    op = "add"
+                if op == "add" and path == "members":
+                    for member in value or []:
+                        self.add_member(group_id, member["value"])
+                elif op == "remove":
+                    match = MEMBER_PATH.fullmatch(path or "")
+                    if match:
+                        self.remove_member(group_id, match.group(1))
+
+    # --- Lookups ---
+    def group_id(self, name):
+        with self._lock:
+            self.ensure_loaded()
+            node = self._by_name.get(name.lower())
+            return self._ids[node] if node is not None else None
+
+    def name(self, scim_id):
+        with self._lock:
+            self.ensure_loaded()
+            node = self._nodes.get(scim_id)
+            return self._names.get(node) if node is not None else None
+
+    def is_group(self, scim_id):
+        with self._lock:
+            self.ensure_loaded()
+            node = self._nodes.get(scim_id)
+            return node is not None and bool(self._is_group[node])
+
+    def direct_groups(self, member_id):
+        with self._lock:
+            self.ensure_loaded()
+            node = self._nodes.get(member_id)
+            return {self._ids[g] for g in self._parents[node]} if node is not None else set()
+
+    def direct_members(self, group_id):
+        with self._lock:
+            self.ensure_loaded()
+            node = self._nodes.get(group_id)
+            return {self._ids[m] for m in self._members[node]} if node is not None else set()
+
+    # --- Transitive queries ---
+    def _walk(self, start, edges):
+        # Every node reachable from start over edges (start itself only through a cycle)
+        seen = bytearray(len(self._ids))
+        queue = deque(edges[start])
+        reached = []
+        while queue:
+            node = queue.popleft()
+            if not seen[node]:
+                seen[node] = 1
+                reached.append(node)
+                queue.extend(edges[node])
+        return reached
+
+    def _groups_of(self, node):
+        # Ancestor sets are shared by every member of a group, so audits over many
+        # users only walk each group once between updates
+        if self._is_group[node]:
+            ancestors = self._ancestors.get(node)
+            if ancestors is None:
+                ancestors = self._ancestors[node] = frozenset(self._walk(node, self._parents))
+            return ancestors
+        groups = set()
+        for parent in self._parents[node]:
+            groups.add(parent)
+            groups |= self._groups_of(parent)
+        return groups
+
+    def groups_of(self, member_id):
+        # SCIM ids of every group the member is in, directly or through nested groups
+        with self._lock:
+            self.ensure_loaded()
+            node = self._nodes.get(member_id)
+            return {self._ids[g] for g in self._groups_of(node)} if node is not None else set()
+
+    def members_of(self, group_id, groups=False):
+        # SCIM ids of everyone transitively in the group; groups=True keeps the nested groups too
+        with self._lock:
+            self.ensure_loaded()
+            node = self._nodes.get(group_id)
+            if node is None:
+                return set()
+            return {self._ids[m] for m in self._walk(node, self._members) if groups or not self._is_group[m]}
+
+    def is_member(self, member_id, group_id):
+        with self._lock:
+            self.ensure_loaded()
+            member, group = self._nodes.get(member_id), self._nodes.get(group_id)
+            return member is not None and group is not None and group in self._groups_of(member)
+
+    def path(self, member_id, group_id):
+        # Shortest chain of SCIM ids from the member up to the group, or None
+        with self._lock:
+            self.ensure_loaded()
+            member, group = self._nodes.get(member_id), self._nodes.get(group_id)
+            if member is None or group is None:
+                return None
+            previous = {member: None}
+            queue = deque([member])
+            while queue:
+                node = queue.popleft()
+                for parent in self._parents[node]:
+                    if parent in previous:
+                        continue
+                    previous[parent] = node
+                    if parent == group:
+                        chain = []
+                        while parent is not None:
+                            chain.append(self._ids[parent])
+                            parent = previous[parent]
+                        return chain[::-1]
+                    queue.append(parent)
+            return None
+
+    def cycles(self):
+        # Groups nested in themselves: strongly connected components of the
+        # group -> member group edges (Tarjan's algorithm, iteratively)
+        with self._lock:
+            self.ensure_loaded()
+            index, low = {}, {}
+            stack, on_stack = [], set()
+            found = []
+            for root in range(len(self._ids)):
+                if not self._is_group[root] or root in index:
+                    continue
+                work = [(root, 0)]
+                while work:
+                    node, position = work.pop()
+                    if position == 0:
+                        index[node] = low[node] = len(index)
+                        stack.append(node)
+                        on_stack.add(node)
+                    members = self._members[node]
+                    while position < len(members) and not self._is_group[members[position]]:
+                        position += 1
+                    if position < len(members):
+                        child = members[position]
+                        work.append((node, position + 1))
+                        if child not in index:
+                            work.append((child, 0))
+                        elif child in on_stack:
+                            low[node] = min(low[node], index[child])
+                        continue
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        if len(component) > 1 or node in self._members[node]:
+                            found.append([self._ids[m] for m in reversed(component)])
+            return found
+
+    def managers(self, permissions, level="CAN_MANAGE"):
+        # Who holds level on an object, given its permissions API ACL: the
+        # principals granted directly, plus the SCIM ids of everyone transitively
+        # in a granted group
+        direct = [principal for principal, levels in index_grants(permissions).items() if level in levels]
+        effective = set()
+        for field, name in direct:
+            if field == "group_name":
+                group = self.group_id(name)
+                if group is not None:
+                    effective |= self.members_of(group)
+        return direct, effective
@@ -0,0 +1,699 @@
+"""In-process fake of the Databricks REST endpoints the provisioning scripts call.
+
+Covers SCIM Users/Groups/ServicePrincipals, jobs list/get/create/update/reset/delete,
+job runs (run-now, runs/list, runs/get), permissions/*, the volumes endpoints
+(including volume grants) and Files API files/directories (with Range reads), with configurable latency, page size caps, 429
+injection and generated datasets. Runs go PENDING -> RUNNING -> TERMINATED over
+run_duration seconds of wall time. tls=True serves HTTPS with a throwaway
+self-signed certificate (needs the openssl binary); point clients at
+mock.ca_certs to trust it.
+
+    with MockDatabricks(latency=0.02, error_rate=0.05) as mock:
+        mock.seed(users=1000, groups=100, jobs=5000, volumes=200)
+        create_groups.DATABRICKS_INSTANCE = mock.url
+        ...
+        print(mock.stats.total, mock.stats.by_route)
+"""
+import itertools
+import json
+import random
+import os
+import re
+import socket
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+SCIM_PREFIX = "/api/2.0/preview/scim/v2/"
+SCIM_FILTER = re.compile(r'(\w+)\s+eq\s+"((?:[^"\\]|\\.)*)"')
+MEMBER_PATH = re.compile(r'members\[value eq "([^"]*)"\]')
+BYTE_RANGE = re.compile(r"bytes=(\d+)-(\d*)")
+# Attribute each SCIM resource is looked up by; eq filters on it are served from an index
+NAME_ATTRIBUTE = {"Users": "userName", "Groups": "displayName", "ServicePrincipals": "displayName"}
+
+
+class MockError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# === STATS ===
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.total = 0
+            self.throttled = 0
+            self.connections = 0
+            self.resumed = 0
+            self.by_route = Counter()
+
+    def record(self, route, throttled=False):
+        with self._lock:
+            self.total += 1
+            self.throttled += throttled
+            self.by_route[route] += 1
+
+    def connection(self, resumed=False):
+        with self._lock:
+            self.connections += 1
+            self.resumed += resumed
+
+    def snapshot(self):
+        with self._lock:
+            return {"total": self.total, "throttled": self.throttled,
+                    "connections": self.connections, "tls_resumed": self.resumed, "by_route": dict(self.by_route)}
+
+
+# === STATE ===
+class MockDatabricks:
+    def __init__(self, latency=0.0, jitter=0.0, page_size=None, error_rate=0.0, retry_after=0, seed=0,
+                 host="127.0.0.1", port=0, run_duration=1.0, tls=False):
+        # latency/jitter: seconds added to every request; page_size caps count/limit/max_results;
+        # error_rate: share of requests answered with 429 and a Retry-After of retry_after seconds
+        self.latency = latency
+        self.jitter = jitter
+        self.page_size = page_size
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.run_duration = run_duration
+        self.tls = tls
+        self.ca_certs = None
+        self.stats = Stats()
+        self.users = {}
+        self.groups = {}
+        self.service_principals = {}
+        self.names = {resource: {} for resource in NAME_ATTRIBUTE}  # lowercased name -> id
+        self.jobs = {}
+        self.volumes = {}
+        self.runs = {}
+        self.files = {}           # Files API path -> {"data": bytes, "last_modified": ms}
+        self.directories = set()  # directories created explicitly (others exist through their files)
+        self.request = threading.local()  # .headers of the request being handled
+        self.permissions = {}     # path -> {(principal field, name): level}
+        self.grants = {}          # volume id -> {principal: set(privileges)}
+        self._ids = itertools.count(1000)
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._address = (host, port)
+        self._server = None
+        self._thread = None
+
+    # --- Lifecycle ---
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"{'https' if self.tls else 'http'}://{host}:{port}"
+
+    def start(self):
+        mock = self
+
+        class Handler(MockHandler):
+            pass
+        Handler.mock = mock
+        self._server = MockServer(self._address, Handler)
+        if self.tls:
+            self.ca_certs, key_file = self_signed_certificate(self._address[0])
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self.ca_certs, key_file)
+            # Handshakes run in the handler threads (see MockHandler.setup), not in the accept loop
+            self._server.socket = context.wrap_socket(self._server.socket, server_side=True,
+                                                      do_handshake_on_connect=False)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- Datasets ---
+    def next_id(self):
+        return next(self._ids)
+
+    def seed(self, users=0, groups=0, service_principals=0, jobs=0, volumes=0, members_per_group=0,
+             catalog="main", schema="default"):
+        with self._lock:
+            user_ids = []
+            for i in range(users):
+                user = self.add_user(f"user{i}@example.com")
+                user_ids.append(user["id"])
+            for i in range(groups):
+                group = self.add_group(f"group-{i}")
+                for j in range(min(members_per_group, len(user_ids))):
+                    group["members"].append({"value": user_ids[(i + j) % len(user_ids)]})
+            for i in range(service_principals):
+                self.add_service_principal(f"sp-{i}", f"app-{i}")
+            for i in range(jobs):
+                self.add_job({
+                    "name": f"job-{i}",
+                    "tasks": [{"task_key": f"task-{i}", "notebook_task": {"notebook_path": f"/Jobs/job-{i}"}}],
+                })
+            for i in range(volumes):
+                self.add_volume({"name": f"volume_{i}", "catalog_name": catalog, "schema_name": schema,
+                                 "volume_type": "MANAGED"})
+
+    def add_user(self, user_name, active=True):
+        user_id = str(self.next_id())
+        user = {"id": user_id, "userName": user_name, "displayName": user_name, "active": active}
+        self.users[user_id] = user
+        self.names["Users"][user_name.lower()] = user_id
+        return user
+
+    def add_group(self, display_name):
+        group_id = str(self.next_id())
+        group = {"id": group_id, "displayName": display_name, "members": []}
+        self.groups[group_id] = group
+        self.names["Groups"][display_name.lower()] = group_id
+        return group
+
+    def add_service_principal(self, display_name, application_id=None):
+        sp_id = str(self.next_id())
+        sp = {"id": sp_id, "displayName": display_name, "applicationId": application_id, "active": True}
+        self.service_principals[sp_id] = sp
+        self.names["ServicePrincipals"][(display_name or "").lower()] = sp_id
+        return sp
+
+    def add_job(self, settings):
+        job_id = self.next_id()
+        self.jobs[job_id] = {"job_id": job_id, "created_time": int(time.time() * 1000), "settings": settings}
+        return job_id
+
+    def add_run(self, job_id, job_parameters=None, duration=None, result_state="SUCCESS"):
+        run_id = self.next_id()
+        number = sum(1 for run in self.runs.values() if run["job_id"] == job_id) + 1
+        self.runs[run_id] = {"run_id": run_id, "job_id": job_id, "number_in_job": number,
+                             "start_time": int(time.time() * 1000), "job_parameters": job_parameters or {},
+                             "duration": self.run_duration if duration is None else duration,
+                             "result_state": result_state}
+        return run_id
+
+    def add_volume(self, config):
+        volume_id = str(self.next_id())
+        volume = {**config, "volume_id": volume_id, "updated_at": int(time.time() * 1000),
+                  "full_name": f"{config['catalog_name']}.{config['schema_name']}.{config['name']}"}
+        self.volumes[volume_id] = volume
+        return volume
+
+    # --- Request plumbing ---
+    def maybe_throttle(self):
+        if self.latency or self.jitter:
+            time.sleep(self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0))
+        if self.error_rate:
+            with self._lock:
+                return self._random.random() < self.error_rate
+        return False
+
+    def page_limit(self, requested, default):
+        limit = int(requested) if requested else default
+        return min(limit, self.page_size) if self.page_size else limit
+
+    def dispatch(self, method, path, query, body):
+        for label, pattern, methods, handler in ROUTES:
+            match = pattern.fullmatch(path)
+            if match and method in methods:
+                with self._lock:
+                    return label, handler(self, method, query, body, *match.groups())
+        raise MockError(404, f"No route for {method} {path}")
+
+    # --- SCIM ---
+    def scim_collection(self, resource):
+        return {"Users": self.users, "Groups": self.groups, "ServicePrincipals": self.service_principals}[resource]
+
+    def scim_list(self, method, query, body, resource):
+        items = self.scim_collection(resource)
+        if method == "POST":
+            return 201, self.scim_create(resource, body)
+        if "filter" not in query:
+            resources = list(items.values())
+        else:
+            clauses = SCIM_FILTER.findall(query["filter"])
+            if not clauses:
+                raise MockError(400, f"Unsupported filter: {query['filter']}")
+            wanted = {}
+            for attribute, value in clauses:
+                wanted.setdefault(attribute, set()).add(value.replace('\\"', '"').lower())
+            if set(wanted) == {NAME_ATTRIBUTE[resource]}:
+                index = self.names[resource]
+                ids = [index[name] for name in wanted[NAME_ATTRIBUTE[resource]] if name in index]
+                resources = [items[i] for i in ids if i in items]
+            else:
+                resources = [r for r in items.values()
+                             if any(str(r.get(a, "")).lower() in values for a, values in wanted.items())]
+        start_index = max(1, int(query.get("startIndex", 1)))
+        count = self.page_limit(query.get("count"), 100)
+        page = resources[start_index - 1:start_index - 1 + count]
+        return 200, {
+            "schemas": ["urn:ietf:params:scim:api:messages:2.0:ListResponse"],
+            "totalResults": len(resources),
+            "startIndex": start_index,
+            "itemsPerPage": len(page),
+            "Resources": [project(r, query) for r in page],
+        }
+
+    def scim_create(self, resource, body):
+        if resource == "Groups":
+            if body["displayName"].lower() in self.names["Groups"]:
+                raise MockError(409, f"Group {body['displayName']} already exists")
+            group = self.add_group(body["displayName"])
+            group["members"] = [{"value": m["value"]} for m in body.get("members", [])]
+            return group
+        if resource == "Users":
+            if body["userName"].lower() in self.names["Users"]:
+                raise MockError(409, f"User {body['userName']} already exists")
+            user = self.add_user(body["userName"], body.get("active", True))
+            user["displayName"] = body.get("displayName", body["userName"])
+            return user
+        return self.add_service_principal(body.get("displayName"), body.get("applicationId"))
+
+    def scim_item(self, method, query, body, resource, item_id):
+        items = self.scim_collection(resource)
+        if item_id not in items:
+            raise MockError(404, f"{resource} {item_id} not found")
+        item = items[item_id]
+        if method == "GET":
+            return 200, project(item, query)
+        if method == "DELETE":
+            del items[item_id]
+            self.names[resource].pop(str(item.get(NAME_ATTRIBUTE[resource], "")).lower(), None)
+            return 204, None
+        for operation in body.get("Operations", []):
+            op, path = operation["op"].lower(), operation.get("path")
+            if path == "members" and op == "add":
+                present = {m["value"] for m in item.setdefault("members", [])}
+                values = [v["value"] for v in operation["value"]]
+                if any(value in present for value in values) and len(values) == 1:
+                    raise MockError(409, f"Member {values[0]} already in group")
+                item["members"].extend({"value": v} for v in values if v not in present)
+            elif op == "remove" and path and MEMBER_PATH.fullmatch(path):
+                member_id = MEMBER_PATH.fullmatch(path).group(1)
+                item["members"] = [m for m in item.get("members", []) if m["value"] != member_id]
+            elif op in ("replace", "add") and path:
+                item[path] = operation["value"]
+            elif op in ("replace", "add"):
+                item.update(operation["value"])
+            else:
+                raise MockError(400, f"Unsupported PatchOp {operation}")
+        return 200, item
+
+    # --- Jobs ---
+    def jobs_list(self, method, query, body):
+        jobs = self.jobs.values()
+        if query.get("name"):
+            jobs = [j for j in jobs if j["settings"].get("name") == query["name"]]
+        offset = int(query.get("page_token") or query.get("offset") or 0)
+        limit = self.page_limit(query.get("limit"), 20)
+        page = list(itertools.islice(jobs, offset, offset + limit))
+        expand = query.get("expand_tasks") == "true"
+        result = {"jobs": [job if expand else {**job, "settings": {k: v for k, v in job["settings"].items()
+                                                                     if k not in ("tasks", "job_clusters")}}
+                           for job in page],
+                  "has_more": offset + limit < len(jobs)}
+        if result["has_more"]:
+            result["next_page_token"] = str(offset + limit)
+        return 200, result
+
+    def job(self, job_id):
+        job_id = int(job_id)
+        if job_id not in self.jobs:
+            raise MockError(400, f"Job {job_id} does not exist.")
+        return self.jobs[job_id]
+
+    def jobs_get(self, method, query, body):
+        return 200, self.job(query.get("job_id"))
+
+    def jobs_create(self, method, query, body):
+        return 200, {"job_id": self.add_job(dict(body))}
+
+    def jobs_update(self, method, query, body):
+        settings = self.job(body["job_id"])["settings"]
+        for field, value in body.get("new_settings", {}).items():
+            if field in ("tasks", "job_clusters") and isinstance(value, list):
+                key = "task_key" if field == "tasks" else "job_cluster_key"
+                merged = {item[key]: item for item in settings.get(field, [])}
+                merged.update({item[key]: item for item in value})
+                settings[field] = list(merged.values())
+            else:
+                settings[field] = value
+        for field in body.get("fields_to_remove", []):
+            if "/" in field:
+                array, item_key = field.split("/", 1)
+                key = "task_key" if array == "tasks" else "job_cluster_key"
+                settings[array] = [i for i in settings.get(array, []) if i.get(key) != item_key]
+            else:
+                settings.pop(field, None)
+        return 200, {}
+
+    def jobs_reset(self, method, query, body):
+        self.job(body["job_id"])["settings"] = dict(body["new_settings"])
+        return 200, {}
+
+    def jobs_delete(self, method, query, body):
+        self.job(body["job_id"])
+        del self.jobs[int(body["job_id"])]
+        return 200, {}
+
+    # --- Job runs ---
+    def run_view(self, run):
+        elapsed = time.time() - run["start_time"] / 1000
+        view = {k: v for k, v in run.items() if k not in ("duration", "result_state", "idempotency_token")}
+        if elapsed >= run["duration"]:
+            view["state"] = {"life_cycle_state": "TERMINATED", "result_state": run["result_state"]}
+            view["end_time"] = run["start_time"] + int(run["duration"] * 1000)
+        elif elapsed >= run["duration"] / 10:
+            view["state"] = {"life_cycle_state": "RUNNING"}
+        else:
+            view["state"] = {"life_cycle_state": "PENDING"}
+        return view
+
+    def jobs_run_now(self, method, query, body):
+        job_id = self.job(body["job_id"])["job_id"]
+        token = body.get("idempotency_token")
+        for run in self.runs.values():
+            if token and run.get("idempotency_token") == token:
+                return 200, {"run_id": run["run_id"], "number_in_job": run["number_in_job"]}
+        run_id = self.add_run(job_id, body.get("job_parameters") or body.get("notebook_params"))
+        self.runs[run_id]["idempotency_token"] = token
+        return 200, {"run_id": run_id, "number_in_job": self.runs[run_id]["number_in_job"]}
+
+    def runs_list(self, method, query, body):
+        runs = sorted(self.runs.values(), key=lambda r: (r["start_time"], r["run_id"]), reverse=True)
+        if query.get("job_id"):
+            runs = [r for r in runs if r["job_id"] == int(query["job_id"])]
+        if query.get("start_time_from"):
+            runs = [r for r in runs if r["start_time"] >= int(query["start_time_from"])]
+        views = [self.run_view(r) for r in runs]
+        if query.get("active_only") == "true":
+            views = [v for v in views if v["state"]["life_cycle_state"] != "TERMINATED"]
+        elif query.get("completed_only") == "true":
+            views = [v for v in views if v["state"]["life_cycle_state"] == "TERMINATED"]
+        offset = int(query.get("page_token") or query.get("offset") or 0)
+        limit = self.page_limit(min(int(query.get("limit") or 25), 25), 25)
+        result = {"runs": views[offset:offset + limit], "has_more": offset + limit < len(views)}
+        if result["has_more"]:
+            result["next_page_token"] = str(offset + limit)
+        return 200, result
+
+    def runs_get(self, method, query, body):
+        run_id = int(query.get("run_id"))
+        if run_id not in self.runs:
+            raise MockError(400, f"Run {run_id} does not exist.")
+        return 200, self.run_view(self.runs[run_id])
+
+    # --- Files API ---
+    def files_item(self, method, query, body, path):
+        path = unquote(path)
+        if method == "PUT":
+            if path in self.files and query.get("overwrite") != "true":
+                raise MockError(409, f"File {path} already exists")
+            self.files[path] = {"data": bytes(body or b""), "last_modified": int(time.time() * 1000)}
+            return 204, None
+        if path not in self.files:
+            raise MockError(404, f"File {path} does not exist")
+        if method == "DELETE":
+            del self.files[path]
+            return 204, None
+        item = self.files[path]
+        data, headers = item["data"], {"Last-Modified": http_date(item["last_modified"])}
+        if method == "HEAD":
+            return 200, b"", {**headers, "Content-Length": str(len(data))}
+        match = BYTE_RANGE.fullmatch(self.request.headers.get("Range") or "")
+        if not match:
+            return 200, data, headers
+        start = int(match.group(1))
+        end = min(int(match.group(2)) if match.group(2) else len(data) - 1, len(data) - 1)
+        if start >= len(data):
+            raise MockError(416, f"Range not satisfiable for {path}")
+        return 206, data[start:end + 1], {**headers, "Content-Range": f"bytes {start}-{end}/{len(data)}"}
+
+    def directory_list(self, method, query, body, path):
+        path = unquote(path).rstrip("/")
+        if method == "PUT":
+            self.directories.add(path)
+            return 204, None
+        prefix = path + "/"
+        entries = {}
+        for file_path, item in self.files.items():
+            if file_path.startswith(prefix):
+                name, _, rest = file_path[len(prefix):].partition("/")
+                if rest:
+                    entries[name] = {"path": prefix + name + "/", "is_directory": True, "name": name}
+                else:
+                    entries[name] = {"path": file_path, "is_directory": False, "file_size": len(item["data"]),
+                                     "last_modified": item["last_modified"], "name": name}
+        for directory in self.directories:
+            if directory.startswith(prefix):
+                name = directory[len(prefix):].split("/", 1)[0]
+                entries.setdefault(name, {"path": prefix + name + "/", "is_directory": True, "name": name})
+        if not entries and path not in self.directories:
+            raise MockError(404, f"Directory {path} does not exist")
+        contents = [entries[name] for name in sorted(entries)]
+        offset = int(query.get("page_token") or 0)
+        limit = self.page_limit(query.get("page_size"), 1000)
+        result = {"contents": contents[offset:offset + limit]}
+        if offset + limit < len(contents):
+            result["next_page_token"] = str(offset + limit)
+        return 200, result
+
+    # --- Permissions API ---
+    def object_permissions(self, method, query, body, path):
+        acl = self.permissions.setdefault(path, {})
+        if method in ("PUT", "PATCH"):
+            if method == "PUT":
+                acl.clear()
+            for entry in body.get("access_control_list", []):
+                field = next(f for f in ("user_name", "group_name", "service_principal_name") if entry.get(f))
+                acl[(field, entry[field])] = entry["permission_level"]
+        return 200, {
+            "object_id": path,
+            "access_control_list": [
+                {field: name, "all_permissions": [{"permission_level": level, "inherited": False}]}
+                for (field, name), level in acl.items()
+            ],
+        }
+
+    # --- Volumes ---
+    def find_volume(self, key):
+        if key in self.volumes:
+            return self.volumes[key]
+        for volume in self.volumes.values():
+            if volume["full_name"] == key:
+                return volume
+        raise MockError(404, f"Volume '{key}' does not exist.")
+
+    def volumes_list(self, method, query, body):
+        if method == "POST":
+            full_name = f"{body['catalog_name']}.{body['schema_name']}.{body['name']}"
+            if any(v["full_name"] == full_name for v in self.volumes.values()):
+                raise MockError(409, f"Volume '{full_name}' already exists")
+            return 200, self.add_volume(dict(body))
+        volumes = [v for v in self.volumes.values()
+                   if v["catalog_name"] == query.get("catalog_name") and v["schema_name"] == query.get("schema_name")]
+        offset = int(query.get("page_token") or 0)
+        limit = self.page_limit(query.get("max_results"), 1000)
+        result = {"volumes": volumes[offset:offset + limit]}
+        if offset + limit < len(volumes):
+            result["next_page_token"] = str(offset + limit)
+        return 200, result
+
+    def volume_item(self, method, query, body, key):
+        volume = self.find_volume(key)
+        if method == "GET":
+            return 200, volume
+        if method == "DELETE":
+            del self.volumes[volume["volume_id"]]
+            return 200, {}
+        updates = {k: v for k, v in body.items() if k not in ("volume_id", "full_name")}
+        volume.update(updates)
+        volume["full_name"] = f"{volume['catalog_name']}.{volume['schema_name']}.{volume['name']}"
+        volume["updated_at"] = int(time.time() * 1000)
+        return 200, volume
+
+    def volume_grants(self, method, query, body, key):
+        grants = self.grants.setdefault(self.find_volume(key)["volume_id"], {})
+        if method == "PATCH":
+            for change in body.get("changes", []):
+                privileges = grants.setdefault(change["principal"], set())
+                privileges |= set(change.get("add", []))
+                privileges -= set(change.get("remove", []))
+        return 200, {"privilege_assignments": [
+            {"principal": principal, "privileges": sorted(privileges)}
+            for principal, privileges in grants.items() if privileges
+        ]}
+
+
+def self_signed_certificate(host):
+    # (certificate, key) files for host, valid for a day
+    directory = tempfile.mkdtemp(prefix="mock-databricks-")
+    cert_file, key_file = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    try:
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1",
+                        "-nodes", "-keyout", key_file, "-out", cert_file, "-days", "1", "-subj", "/CN=localhost",
+                        "-addext", f"subjectAltName=IP:{host},DNS:localhost"],
+                       check=True, capture_output=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise Exception(f"Could not create a certificate for the TLS mock (is openssl installed?): {e}")
+    return cert_file, key_file
+
+
+def http_date(milliseconds):
+    return formatdate(milliseconds / 1000, usegmt=True)
+
+
+def project(resource, query):
+    # SCIM attributes / excludedAttributes projection
+    if query.get("attributes"):
+        keep = set(query["attributes"].split(",")) | {"id"}
+        return {k: v for k, v in resource.items() if k in keep}
+    if query.get("excludedAttributes"):
+        drop = set(query["excludedAttributes"].split(","))
+        return {k: v for k, v in resource.items() if k not in drop}
+    return resource
+
+
+ROUTES = [
+    ("scim/<resource>", re.compile(re.escape(SCIM_PREFIX) + r"(Users|Groups|ServicePrincipals)"), {"GET", "POST"},
+     MockDatabricks.scim_list),
+    ("scim/<resource>/<id>", re.compile(re.escape(SCIM_PREFIX) + r"(Users|Groups|ServicePrincipals)/([^/]+)"),
+     {"GET", "PATCH", "PUT", "DELETE"}, MockDatabricks.scim_item),
+    ("jobs/list", re.compile(r"/api/2\.[0-2]/jobs/list"), {"GET"}, MockDatabricks.jobs_list),
+    ("jobs/get", re.compile(r"/api/2\.[0-2]/jobs/get"), {"GET"}, MockDatabricks.jobs_get),
+    ("jobs/create", re.compile(r"/api/2\.[0-2]/jobs/create"), {"POST"}, MockDatabricks.jobs_create),
+    ("jobs/update", re.compile(r"/api/2\.[0-2]/jobs/update"), {"POST"}, MockDatabricks.jobs_update),
+    ("jobs/reset", re.compile(r"/api/2\.[0-2]/jobs/reset"), {"POST"}, MockDatabricks.jobs_reset),
+    ("jobs/delete", re.compile(r"/api/2\.[0-2]/jobs/delete"), {"POST"}, MockDatabricks.jobs_delete),
+    ("jobs/run-now", re.compile(r"/api/2\.[0-2]/jobs/run-now"), {"POST"}, MockDatabricks.jobs_run_now),
+    ("jobs/runs/list", re.compile(r"/api/2\.[0-2]/jobs/runs/list"), {"GET"}, MockDatabricks.runs_list),
+    ("jobs/runs/get", re.compile(r"/api/2\.[0-2]/jobs/runs/get"), {"GET"}, MockDatabricks.runs_get),
+    ("permissions/<object>", re.compile(r"/api/2\.0/permissions/(.+)"), {"GET", "PATCH", "PUT"},
+     MockDatabricks.object_permissions),
+    ("fs/files", re.compile(r"/api/2\.0/fs/files(/.+)"), {"GET", "HEAD", "PUT", "DELETE"},
+     MockDatabricks.files_item),
+    ("fs/directories", re.compile(r"/api/2\.0/fs/directories(/.*)"), {"GET", "PUT"},
+     MockDatabricks.directory_list),
+    ("volumes", re.compile(r"/api/2\.0/volumes"), {"GET", "POST"}, MockDatabricks.volumes_list),
+    ("volumes/<id>/permissions", re.compile(r"/api/2\.0/volumes/([^/]+)/permissions"), {"GET", "PATCH"},
+     MockDatabricks.volume_grants),
+    ("volumes/<id>", re.compile(r"/api/2\.0/volumes/([^/]+)"), {"GET", "PATCH", "DELETE"},
+     MockDatabricks.volume_item),
+]
+
+
+# === HTTP SERVER ===
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # bursts of hundreds of concurrent connects must not overflow the backlog
+
+
+# === HTTP HANDLER ===
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible in the stats
+    mock = None
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this, Nagle plus delayed ACKs add ~40ms a call
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        resumed = False
+        if isinstance(self.connection, ssl.SSLSocket):
+            self.connection.do_handshake()
+            resumed = self.connection.session_reused
+        self.mock.stats.connection(resumed)
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_raw(self, status, data, headers=None, method="GET"):
+        # Files API responses; HEAD sends the headers only
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        headers = {"Content-Length": str(len(data)), **(headers or {})}
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if method != "HEAD":
+            self.wfile.write(data)
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_method(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if self.mock.maybe_throttle():
+            self.mock.stats.record("throttled", throttled=True)
+            return self.send_json(429, {"error_code": "REQUEST_LIMIT_EXCEEDED"},
+                                  {"Retry-After": str(self.mock.retry_after)})
+        route = f"{method} {url.path}"
+        self.mock.request.headers = self.headers
+        try:
+            if self.headers.get("Content-Type") == "application/octet-stream":
+                body = raw
+            else:
+                body = json.loads(raw) if raw else {}
+            route, (status, payload, *headers) = self.mock.dispatch(method, url.path, query, body)
+            route = f"{method} {route}"
+            if isinstance(payload, bytes):
+                self.send_raw(status, payload, *headers, method=method)
+            else:
+                self.send_json(status, payload, *headers)
+        except MockError as e:
+            if method == "HEAD":
+                return self.send_raw(e.status, b"", method=method)
+            self.send_json(e.status, {"error_code": "INVALID_REQUEST", "message": str(e)})
+        except (KeyError, ValueError, TypeError) as e:
+            self.send_json(400, {"error_code": "MALFORMED_REQUEST", "message": repr(e)})
+        finally:
+            self.mock.stats.record(route)
+
+    def do_HEAD(self):
+        if urlparse(self.path).path.startswith("/api/"):
+            return self.handle_method("HEAD")
+        # Connection warm-up (DatabricksClient.warm_up): headers only
+        self.mock.stats.record("HEAD /")
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        self.handle_method("GET")
+
+    def do_POST(self):
+        self.handle_method("POST")
+
+    def do_PATCH(self):
+        self.handle_method("PATCH")
+
+    def do_PUT(self):
+        self.handle_method("PUT")
+
+    def do_DELETE(self):
+        self.handle_method("DELETE")
@@ -0,0 +1,362 @@
+"""Snapshot of every job, group and volume ACL, indexed by principal.
+
+    python permissions_index.py snapshot --db permissions.db --schema main.landing --concurrency 16
+    python permissions_index.py principal data-engineers --db permissions.db
+    python permissions_index.py principal someone@example.com --effective
+    python permissions_index.py object job 123
+
+snapshot lists jobs, groups and the volumes of each --schema, then fetches the
+ACL of every object on a pool of --concurrency workers. The ACLs are stored in
+a SQLite file as integer-coded (principal, object, level) rows keyed by
+principal, so "what can X do" and "who can use Y" are answered from disk
+without API calls.
+
+No listing changes when only an ACL does: job settings, volume updated_at and
+group meta all stay the same when a grant is added. A later snapshot therefore
+refetches every ACL, unless --max-age is given, in which case it only fetches
+ACLs of objects that are new, that were marked with --stale, or that are older
+than --max-age seconds. Objects that disappeared are dropped. --full refetches
+everything, --max-age or not. The workspace is whatever create_groups.py,
+create_job.py and create_volume.py are configured for.
+"""
+import argparse
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_DB = "permissions.db"
+DEFAULT_CONCURRENCY = 16
+COMMIT_EVERY = 500  # ACLs written per transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    id          INTEGER PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    object_id   TEXT NOT NULL,
+    name        TEXT,
+    fingerprint TEXT,
+    fetched_at  REAL,
+    stale       INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (kind, object_id)
+);
+CREATE TABLE IF NOT EXISTS principals (
+    id   INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE (kind, name)
+);
+CREATE TABLE IF NOT EXISTS levels (
+    id   INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS grants (
+    principal INTEGER NOT NULL,
+    object    INTEGER NOT NULL,
+    level     INTEGER NOT NULL,
+    inherited INTEGER NOT NULL,
+    PRIMARY KEY (principal, object, level, inherited)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS grants_by_object ON grants (object);
+"""
+
+# Permissions API principal fields; Unity Catalog grants name a bare "principal"
+PRINCIPAL_FIELDS = ("user_name", "group_name", "service_principal_name")
+
+
+def acl_rows(permissions):
+    # (principal kind, principal name, level, inherited) for a permissions API
+    # ACL or a Unity Catalog privilege_assignments response
+    rows = set()
+    for entry in permissions.get("access_control_list", []):
+        field = next((f for f in PRINCIPAL_FIELDS if entry.get(f)), None)
+        if field is None:
+            continue
+        if "all_permissions" in entry:
+            for permission in entry["all_permissions"]:
+                rows.add((field, entry[field], permission["permission_level"], bool(permission.get("inherited"))))
+        else:
+            rows.add((field, entry[field], entry["permission_level"], False))
+    for entry in permissions.get("privilege_assignments", []):
+        for privilege in entry.get("privileges", []):
+            if isinstance(privilege, str):
+                rows.add(("principal", entry["principal"], privilege, False))
+            else:
+                rows.add(("principal", entry["principal"], privilege["privilege"],
+                          bool(privilege.get("inherited_from_name"))))
+    return rows
+
+
+# === SOURCES ===
+# kind -> lister yielding (object_id, name, listing fingerprint); the ACL
+# endpoint for an object comes from acl_endpoint(kind, object_id). A None
+# fingerprint means the listing cannot tell whether the ACL changed, which is
+# the case for every kind listed here: ACL and grant writes leave the job
+# settings, the volume's updated_at and the group untouched.
+def list_jobs(schemas):
+    from create_job import job_index
+
+    for job in job_index.iter_jobs():
+        yield str(job["job_id"]), job.get("settings", {}).get("name"), None
+
+
+def list_groups(schemas):
+    from create_groups import iter_groups
+
+    for group in iter_groups(attributes="id,displayName", read_ahead=True):
+        yield group["id"], group.get("displayName"), None
+
+
+def list_volumes(schemas):
+    from create_volume import volume_catalog
+
+    for schema in schemas:
+        catalog, _, schema_name = schema.partition(".")
+        for volume in volume_catalog.iter_volumes(catalog, schema_name):
+            yield volume["volume_id"], volume["full_name"], None
+
+
+LISTERS = {"job": list_jobs, "group": list_groups, "volume": list_volumes}
+
+
+def acl_endpoint(kind, object_id):
+    if kind == "job":
+        return f"permissions/jobs/{object_id}"
+    if kind == "group":
+        return f"permissions/groups/{object_id}"
+    return f"volumes/{object_id}/permissions"
+
+
+def fetch_acl(kind, object_id):
+    # The ACL response, or None when the object was deleted since it was listed
+    from create_groups import client
+
+    response = client().request("GET", acl_endpoint(kind, object_id))
+    if response.status == 404:
+        return None
+    if response.status != 200:
+        raise Exception(f"Failed to get permissions of {kind} {object_id}: "
+                        f"{response.status} - {response.data.decode()[:200]}")
+    return json.loads(response.data.decode())
+
+
+# === PERMISSIONS INDEX ===
+class PermissionsIndex:
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self._principals = {(kind, name): pid for pid, kind, name in self.db.execute("SELECT * FROM principals")}
+        self._levels = {name: lid for lid, name in self.db.execute("SELECT * FROM levels")}
+
+    # --- Interning ---
+    def _principal_id(self, kind, name):
+        pid = self._principals.get((kind, name))
+        if pid is None:
+            pid = self.db.execute("INSERT INTO principals (kind, name) VALUES (?, ?)", (kind, name)).lastrowid
+            self._principals[(kind, name)] = pid
+        return pid
+
+    def _level_id(self, name):
+        lid = self._levels.get(name)
+        if lid is None:
+            lid = self.db.execute("INSERT INTO levels (name) VALUES (?)", (name,)).lastrowid
+            self._levels[name] = lid
+        return lid
+
+    # --- Writes ---
+    def objects(self, kind):
+        # object_id -> (row id, fingerprint, fetched_at, stale)
+        return {object_id: (row, fp, fetched_at, stale) for row, object_id, fp, fetched_at, stale in self.db.execute(
+            "SELECT id, object_id, fingerprint, fetched_at, stale FROM objects WHERE kind = ?", (kind,))}
+
+    def store(self, kind, object_id, name, listing_fingerprint, permissions):
+        # Replaces the object's grants with those in an ACL response
+        self.db.execute(
+            "INSERT INTO objects (kind, object_id, name, fingerprint, fetched_at, stale) VALUES (?, ?, ?, ?, ?, 0) "
+            "ON CONFLICT (kind, object_id) DO UPDATE SET name = excluded.name, fingerprint = excluded.fingerprint, "
+            "fetched_at = excluded.fetched_at, stale = 0",
+            (kind, object_id, name, listing_fingerprint, time.time()))
+        row = self.db.execute("SELECT id FROM objects WHERE kind = ? AND object_id = ?", (kind, object_id)).fetchone()[0]
+        self.db.execute("DELETE FROM grants WHERE object = ?", (row,))
+        self.db.executemany(
+            "INSERT INTO grants (principal, object, level, inherited) VALUES (?, ?, ?, ?)",
+            [(self._principal_id(p_kind, p_name), row, self._level_id(level), int(inherited))
+             for p_kind, p_name, level, inherited in acl_rows(permissions)])
+
+    def remove(self, kind, object_id):
+        row = self.db.execute("SELECT id FROM objects WHERE kind = ? AND object_id = ?", (kind, object_id)).fetchone()
+        if row:
+            self.db.execute("DELETE FROM grants WHERE object = ?", row)
+            self.db.execute("DELETE FROM objects WHERE id = ?", row)
+
+    def mark_stale(self, kind, object_id):
+        # Refetched by the next snapshot, e.g. after writing its ACL
+        self.db.execute("UPDATE objects SET stale = 1 WHERE kind = ? AND object_id = ?", (kind, str(object_id)))
+
+    # --- Queries ---
+    def grants_for(self, name, kind=None, groups=(), inherited=True):
+        # (object kind, object id, object name, level, via) for everything a
+        # principal can do; via is the group the grant came through, or None.
+        # kind narrows the name to one principal field (user_name, group_name, ...).
+        principals = [(pid, None) for (p_kind, p_name), pid in self._principals.items()
+                      if p_name == name and (kind is None or p_kind == kind)]
+        principals += [(pid, group) for group in groups for (p_kind, p_name), pid in self._principals.items()
+                       if p_name == group and p_kind in ("group_name", "principal")]
+        results = []
+        for pid, via in principals:
+            for row in self.db.execute(
+                    "SELECT o.kind, o.object_id, o.name, l.name FROM grants g JOIN objects o ON o.id = g.object "
+                    "JOIN levels l ON l.id = g.level WHERE g.principal = ?" + ("" if inherited else
+                                                                               " AND g.inherited = 0"), (pid,)):
+                results.append((*row, via))
+        return sorted(set(results), key=lambda r: (r[0], r[2] or "", r[1], r[3], r[4] or ""))
+
+    def grants_on(self, kind, object_id):
+        # (principal kind, principal name, level, inherited) for one object
+        return sorted(self.db.execute(
+            "SELECT p.kind, p.name, l.name, g.inherited FROM grants g JOIN objects o ON o.id = g.object "
+            "JOIN principals p ON p.id = g.principal JOIN levels l ON l.id = g.level "
+            "WHERE o.kind = ? AND o.object_id = ?", (kind, str(object_id))))
+
+    def has(self, name, kind, object_id, level):
+        # Pre-flight check before a permission write: does name already hold level directly?
+        return any(p_name == name and l_name == level and not inherited
+                   for _, p_name, l_name, inherited in self.grants_on(kind, object_id))
+
+    def counts(self):
+        return {kind: count for kind, count in self.db.execute("SELECT kind, COUNT(*) FROM objects GROUP BY kind")}
+
+    def close(self):
+        self.db.close()
+
+
+# === SNAPSHOT ===
+def snapshot(index, kinds=tuple(LISTERS), schemas=(), concurrency=DEFAULT_CONCURRENCY, max_age=None, full=False):
+    # Lists every object, fetches the ACLs that need it and returns counts
+    summary = {"listed": 0, "fetched": 0, "unchanged": 0, "removed": 0, "failed": 0}
+    now = time.time()
+    todo = []
+    for kind in kinds:
+        known = index.objects(kind)
+        seen = set()
+        for object_id, name, listing_fingerprint in LISTERS[kind](schemas):
+            seen.add(object_id)
+            summary["listed"] += 1
+            current = known.get(object_id)
+            # Without a listing fingerprint only --max-age can keep an ACL
+            if (full or current is None or current[3] or current[1] != listing_fingerprint
+                    or (listing_fingerprint is None and max_age is None)
+                    or (max_age is not None and now - current[2] > max_age)):
+                todo.append((kind, object_id, name, listing_fingerprint))
+            else:
+                summary["unchanged"] += 1
+        index.db.execute("BEGIN")
+        for object_id in set(known) - seen:
+            index.remove(kind, object_id)
+            summary["removed"] += 1
+        index.db.execute("COMMIT")
+
+    def fetch(item):
+        try:
+            return item, fetch_acl(item[0], item[1]), None
+        except Exception as e:
+            return item, None, e
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        index.db.execute("BEGIN")
+        for written, ((kind, object_id, name, listing_fingerprint), permissions, error) in enumerate(
+                pool.map(fetch, todo), 1):
+            if error:
+                print(f"❌ {kind} {name or object_id}: {error}")
+                index.mark_stale(kind, object_id)
+                summary["failed"] += 1
+            elif permissions is None:
+                index.remove(kind, object_id)
+                summary["removed"] += 1
+            else:
+                index.store(kind, object_id, name, listing_fingerprint, permissions)
+                summary["fetched"] += 1
+            if written % COMMIT_EVERY == 0:
+                index.db.execute("COMMIT")
+                index.db.execute("BEGIN")
+        index.db.execute("COMMIT")
+    return summary
+
+
+# === MAIN ===
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot and query job, group and volume permissions")
+    parser.add_argument("--db", default=DEFAULT_DB, help="Index file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    take = commands.add_parser("snapshot", help="Fetch ACLs of new and changed objects into the index")
+    take.add_argument("--kinds", default=",".join(LISTERS), help=f"Comma separated: {', '.join(LISTERS)}")
+    take.add_argument("--schema", action="append", default=[], metavar="CATALOG.SCHEMA",
+                      help="Schema whose volumes are included, repeatable")
+    take.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    take.add_argument("--max-age", type=float, help="Also refetch ACLs older than this many seconds")
+    take.add_argument("--full", action="store_true", help="Refetch every ACL")
+    take.add_argument("--stale", action="append", default=[], metavar="KIND:ID",
+                      help="Refetch this object even if its listing is unchanged, repeatable")
+
+    principal = commands.add_parser("principal", help="Everything a user, group or service principal can do")
+    principal.add_argument("name")
+    principal.add_argument("--kind", choices=PRINCIPAL_FIELDS + ("principal",))
+    principal.add_argument("--effective", action="store_true",
+                           help="Include grants held through (nested) group membership")
+    principal.add_argument("--direct", action="store_true", help="Leave out inherited grants")
+
+    target = commands.add_parser("object", help="Who has which permission on an object")
+    target.add_argument("kind", choices=list(LISTERS))
+    target.add_argument("object_id")
+    args = parser.parse_args()
+
+    index = PermissionsIndex(args.db)
+    try:
+        if args.command == "snapshot":
+            kinds = [kind.strip() for kind in args.kinds.split(",") if kind.strip()]
+            unknown = set(kinds) - set(LISTERS)
+            if unknown:
+                raise Exception(f"Unknown kinds: {', '.join(sorted(unknown))}")
+            if "volume" in kinds and not args.schema:
+                print("⚠️ No --schema given, volumes are not included")
+            for stale in args.stale:
+                kind, _, object_id = stale.partition(":")
+                index.mark_stale(kind, object_id)
+            from databricks_client import configure
+
+            configure(pool_size=args.concurrency)
+            start = time.perf_counter()
+            summary = snapshot(index, kinds, args.schema, args.concurrency, args.max_age, args.full)
+            print(f"{'✅' if not summary['failed'] else '❌'} {summary['listed']} objects listed, "
+                  f"{summary['fetched']} ACLs fetched, {summary['unchanged']} unchanged, "
+                  f"{summary['removed']} removed, {summary['failed']} failed in {time.perf_counter() - start:.1f}s")
+            return 1 if summary["failed"] else 0
+
+        if args.command == "principal":
+            groups = ()
+            if args.effective:
+                from create_groups import get_effective_groups
+
+                groups = get_effective_groups(args.name)
+            grants = index.grants_for(args.name, args.kind, groups, inherited=not args.direct)
+            for kind, object_id, name, level, via in grants:
+                print(f"{kind:<7} {name or object_id:<40} {level:<20} {'via ' + via if via else ''}".rstrip())
+            print(f"{len(grants)} grants")
+        else:
+            grants = index.grants_on(args.kind, args.object_id)
+            for kind, name, level, inherited in grants:
+                print(f"{kind:<22} {name:<40} {level}{' (inherited)' if inherited else ''}")
+            print(f"{len(grants)} grants")
+        return 0
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return 1
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,272 @@
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves still go through their own temp file, just unlocked
+    fcntl = None
+
+# kind -> (SCIM resource, attribute the name is matched against)
+KINDS = {
+    "user": ("Users", "userName"),
+    "group": ("Groups", "displayName"),
+    "service_principal": ("ServicePrincipals", "displayName"),
+}
+
+DEFAULT_TTL = 3600           # seconds a resolved name -> id mapping is trusted
+DEFAULT_NEGATIVE_TTL = 300   # seconds a "does not exist" answer is trusted
+DEFAULT_MAX_ENTRIES = 50000
+DEFAULT_CHUNK_SIZE = 50      # names per SCIM "or" filter query
+LIST_PAGE_SIZE = 100
+CACHE_FILE = ".principal_cache.json"  # suggested file for persist_to()
+
+
+# === PRINCIPAL RESOLVER ===
+# Shared name -> id cache for users, groups and service principals. Entries
+# expire after a TTL, misses are remembered for a shorter negative TTL and the
+# least recently used entries are evicted past max_entries. Listings can prime
+# the cache in bulk and, once persist_to() opts in, the cache is saved to disk so
+# the next run starts warm.
+class PrincipalResolver:
+    def __init__(self, api, namespace="", ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL,
+                 max_entries=DEFAULT_MAX_ENTRIES, cache_file=None):
+        # api has the databricks_api(method, endpoint, data=None, version=...) shape;
+        # namespace (usually the workspace URL) keeps persisted entries per workspace
+        self.api = api
+        self.namespace = namespace
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.cache_file = cache_file
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (kind, key) -> (id or None, expires_at)
+        self._complete_until = {}      # kind -> time until which a full listing is authoritative
+        self._lock = threading.Lock()
+        self._loaded = not cache_file
+
+    # --- Cache primitives ---
+    def _key(self, kind, name):
+        if kind not in KINDS:
+            raise Exception(f"Unknown principal kind '{kind}'")
+        # userName is matched case-insensitively by SCIM
+        return (kind, name.lower() if kind == "user" else name)
+
+    def _get(self, kind, name):
+        if not self._loaded:
+            self.load()
+        key = self._key(kind, name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.time():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, kind, name, principal_id):
+        ttl = self.ttl if principal_id is not None else self.negative_ttl
+        key = self._key(kind, name)
+        with self._lock:
+            self._entries[key] = (principal_id, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, kind, name):
+        with self._lock:
+            self._entries.pop(self._key(kind, name), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._complete_until.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    # --- Lookups ---
+    def resolve(self, kind, name):
+        # Returns the principal id, or None when it does not exist
+        return self.resolve_many(kind, [name])[name]
+
+    def resolve_many(self, kind, names, chunk_size=DEFAULT_CHUNK_SIZE):
+        results = {}
+        missing = []
+        for name in dict.fromkeys(names):
+            hit, principal_id = self._get(kind, name)
+            if hit:
+                results[name] = principal_id
+            else:
+                missing.append(name)
+        if self._complete_until.get(kind, 0) > time.time():
+            # A full listing was primed recently: anything not in it does not exist
+            for name in missing:
+                self.put(kind, name, None)
+                results[name] = None
+            missing = []
+        resource, attribute = KINDS[kind]
+        for i in range(0, len(missing), chunk_size):
+            chunk = missing[i:i + chunk_size]
+            found = self._search(resource, attribute, chunk)
+            for name in chunk:
+                principal_id = found.get(name.lower() if kind == "user" else name)
+                self.put(kind, name, principal_id)
+                results[name] = principal_id
+        return results
+
+    def find_any(self, name, kinds=("group", "user", "service_principal")):
+        # For APIs that take a bare principal name (e.g. Unity Catalog grants)
+        for kind in kinds:
+            principal_id = self.resolve(kind, name)
+            if principal_id is not None:
+                return kind, principal_id
+        return None, None
+
+    def _search(self, resource, attribute, names):
+        quoted = [n.replace("\\", "\\\\").replace('"', '\\"') for n in names]
+        query = urlencode({
+            "filter": " or ".join(f'{attribute} eq "{n}"' for n in quoted),
+            "attributes": f"id,{attribute}",
+            "count": len(names),
+        })
+        resp = self.api("GET", f"preview/scim/v2/{resource}?{query}", version="2.0")
+        found = {}
+        for resource_obj in resp.get("Resources", []):
+            name = resource_obj[attribute]
+            found[name.lower() if resource == "Users" else name] = resource_obj["id"]
+        return found
+
+    # --- Bulk priming ---
+    def prime(self, kind, resources, complete=False):
+        # Seed the cache from already-downloaded SCIM resources (e.g. list_all_groups).
+        # complete=True means resources is the whole listing, so misses need no query.
+        attribute = KINDS[kind][1]
+        count = 0
+        for resource_obj in resources:
+            if resource_obj.get(attribute) and resource_obj.get("id"):
+                self.put(kind, resource_obj[attribute], resource_obj["id"])
+                count += 1
+        if complete:
+            self._complete_until[kind] = time.time() + self.negative_ttl
+        return count
+
+    def prime_all(self, kind, page_size=LIST_PAGE_SIZE):
+        # One projected listing instead of a filter query per name
+        resource, attribute = KINDS[kind]
+        start_index = 1
+        primed = 0
+        while True:
+            query = urlencode({"startIndex": start_index, "count": page_size, "attributes": f"id,{attribute}"})
+            resp = self.api("GET", f"preview/scim/v2/{resource}?{query}", version="2.0")
+            resources = resp.get("Resources", [])
+            primed += self.prime(kind, resources)
+            start_index += len(resources)
+            # Pages may come back shorter than page_size; totalResults says when we are done
+            expected = resp.get("totalResults")
+            reached_end = expected is None or start_index > expected
+            if not resources or (expected is not None and start_index > expected):
+                if reached_end:
+                    # Only a walk that saw every resource can answer misses without a query
+                    self._complete_until[kind] = time.time() + self.negative_ttl
+                return primed
+
+    # --- Persistence ---
+    def load(self):
+        self._loaded = True
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return 0
+        try:
+            with open(self.cache_file) as f:
+                stored = json.load(f).get(self.namespace, {})
+        except (OSError, ValueError):
+            # A corrupt or unreadable cache only costs us a cold start
+            return 0
+        now = time.time()
+        loaded = 0
+        with self._lock:
+            for kind, entries in stored.items():
+                for name, (principal_id, expires_at) in entries.items():
+                    # Entries primed or fetched this run are fresher than the file
+                    if kind in KINDS and expires_at > now and (kind, name) not in self._entries:
+                        self._entries[(kind, name)] = (principal_id, expires_at)
+                        loaded += 1
+        return loaded
+
+    def save(self):
+        if not self.cache_file:
+            return
+        if not self._loaded:
+            self.load()
+        now = time.time()
+        entries = {}
+        with self._lock:
+            for (kind, name), (principal_id, expires_at) in self._entries.items():
+                if expires_at > now:
+                    entries.setdefault(kind, {})[name] = [principal_id, expires_at]
+        # Several processes may share the file (one per workspace under fanout.py):
+        # the read-modify-write holds its lock and writes through a temp file of
+        # its own, so saves neither fail nor drop each other's namespaces
+        with _locked(f"{self.cache_file}.lock"):
+            try:
+                with open(self.cache_file) as f:
+                    stored = json.load(f)
+            except (OSError, ValueError):
+                stored = {}
+            stored[self.namespace] = entries
+            fd, tmp_file = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(os.path.abspath(self.cache_file)))
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(stored, f)
+                os.replace(tmp_file, self.cache_file)
+            except BaseException:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_file)
+                raise
+
+
+@contextlib.contextmanager
+def _locked(path):
+    # Exclusive advisory lock across processes, released when the file closes
+    with open(path, "a") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+# One resolver per workspace, shared by every script running in this process
+_resolvers = {}
+_resolvers_lock = threading.Lock()
+_cache_file = None  # set by persist_to(); nothing is read or written until then
+
+def resolver_for(namespace, api, cache_file=None):
+    with _resolvers_lock:
+        if namespace not in _resolvers:
+            _resolvers[namespace] = PrincipalResolver(api, namespace=namespace, cache_file=cache_file or _cache_file)
+        return _resolvers[namespace]
+
+def persist_to(path=CACHE_FILE):
+    # Opts this process in to the on-disk cache, for resolvers already made too
+    global _cache_file
+    with _resolvers_lock:
+        _cache_file = path
+        for resolver in _resolvers.values():
+            if not resolver.cache_file:
+                resolver.cache_file = path
+                resolver._loaded = False
+
+def save_all():
+    # A cache that cannot be written only costs the next run a cold start
+    for resolver in list(_resolvers.values()):
+        try:
+            resolver.save()
+        except OSError as e:
+            print(f"⚠️ Could not save principal cache {resolver.cache_file}: {e}")
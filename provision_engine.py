@@ -0,0 +1,411 @@
+"""Bulk provisioning of groups, jobs and volumes from a JSON or YAML manifest.
+
+Manifest layout (every section is optional; an object declared more than once
+is merged into a single declaration):
+
+    {
+      "groups": [
+        {"name": "data-engineers",
+         "members": {"users": ["manager@example.com"], "groups": ["engineering-admins"]},
+         "managers": ["engineering-admins"],
+         "workspace_access": true}
+      ],
+      "jobs": [
+        {"config": {"name": "My Databricks Job", ...},
+         "owner": "owner@example.com", "group": "data-engineers",
+         "permissions": [{"service_principal_name": "etl-bot", "permission_level": "CAN_VIEW"}]}
+      ],
+      "volumes": [
+        {"config": {"name": "my_new_volume", "catalog_name": "...", ...},
+         "grants": [{"principal": "data-engineers", "add": ["READ"]}]}
+      ]
+    }
+
+The manifest is compiled into steps (see manifest_compiler.py): every principal
+it mentions is resolved up front in batched queries, schemas holding several
+volumes are listed once, a new group is created together with its members, and
+a group's managers and all workspace access grants are each written in one call.
+
+With --state, every finished step is recorded in a local SQLite file together
+with a hash of what it applied; a rerun skips steps that already applied the
+same spec (reported as "unchanged") and so resumes where a failed run stopped.
+
+Usage: python provision_engine.py manifest.yaml [--limit scim=16 --limit jobs=8]
+                                  [--explain] [--state state.db [--fresh]]
+                                  [--trace calls.jsonl] [--metrics metrics.prom]
+                                  [--principal-cache [.principal_cache.json]]
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import create_groups
+import create_job
+import create_volume
+import databricks_client
+from instrumentation import session
+from manifest_compiler import load_manifest, merge_manifest, principal_references, stages, volume_schemas
+from principal_resolver import CACHE_FILE, persist_to, save_all
+from state_store import StateStore, spec_hash
+
+# Calls allowed in flight at once, per API family
+DEFAULT_LIMITS = {"scim": 8, "jobs": 4, "volumes": 4, "permissions": 8}
+
+
+# === PLAN ===
+class Step:
+    def __init__(self, key, endpoint, fn, requires=(), spec=None):
+        self.key = key
+        self.endpoint = endpoint
+        # fn receives the results of finished steps, keyed by step key
+        self.fn = fn
+        self.requires = list(requires)
+        # What the step applies, for the state store; None for lookups, which change nothing
+        self.spec = spec
+
+
+def ensure_group(group_name, members=None):
+    # Members that already exist ride along in the create call; for an existing
+    # group they are reconciled with one bulk membership update
+    members = members or {}
+    group = create_groups.find_group(group_name)
+    if group:
+        print(f"⚠️ Group '{group_name}' already exists (ID: {group['id']})")
+        if members.get("users") or members.get("groups"):
+            add_members(group["id"], members)
+        return group["id"]
+    user_ids = create_groups.get_user_ids(members.get("users", []))
+    group_ids = create_groups.find_group_ids(members.get("groups", []))
+    missing = [name for name in members.get("users", []) if name not in user_ids]
+    missing += [name for name in members.get("groups", []) if name not in group_ids]
+    if missing:
+        raise Exception(f"Cannot create group '{group_name}', members not found: {', '.join(missing)}")
+    group = create_groups.create_group(group_name, list(user_ids.values()) + list(group_ids.values()))
+    print(f"✅ Group '{group_name}' created (ID: {group['id']}) with {len(user_ids) + len(group_ids)} members")
+    return group["id"]
+
+
+def add_members(group_id, members):
+    outcomes = create_groups.add_members_to_group_bulk(
+        group_id,
+        user_names=members.get("users", []),
+        group_names=members.get("groups", [])
+    )
+    problems = [f"{name} ({outcome})" for name, outcome in outcomes.items()
+                if outcome not in ("added", "already_member")]
+    if problems:
+        raise Exception(f"Could not add members to group {group_id}: {', '.join(problems)}")
+    return outcomes
+
+
+def upsert_job(job_config, dry_run=False):
+    job_id = create_job.create_or_update_job(job_config, dry_run=dry_run)
+    if job_id is None and not dry_run:
+        raise Exception(f"Failed to create or update job '{job_config['name']}'")
+    return job_id
+
+
+def set_job_permissions(job_id, owner, group_name, dry_run=False, extra_acl=()):
+    if not create_job.set_job_permissions(job_id, owner, group_name, dry_run=dry_run, extra_acl=extra_acl):
+        raise Exception(f"Failed to set permissions on job {job_id}")
+
+
+def upsert_volume(volume_config):
+    volume_id = create_volume.create_or_update_volume(volume_config)
+    if volume_id is None:
+        raise Exception(f"Failed to create or update volume '{volume_config['name']}'")
+    return volume_id
+
+
+def grant_volume_permissions(volume_id, changes):
+    if not create_volume.update_permissions(volume_id, changes):
+        raise Exception(f"Failed to update permissions on volume {volume_id}")
+
+
+def prefetch_principals(references):
+    # Resolve every name the manifest mentions up front, in one chunked filter
+    # query per kind, so the steps below are served from the resolver cache
+    resolvers = {id(r): r for r in (create_groups.principals(), create_job.principals(),
+                                     create_volume.principals())}
+    for resolver in resolvers.values():
+        resolver.resolve_many("user", references["user"])
+        resolver.resolve_many("service_principal", references["service_principal"])
+        found = resolver.resolve_many("group", references["group"] | references["any"])
+        # Bare grant principals are tried as groups, then users, then service principals
+        remaining = [name for name in references["any"] if found[name] is None]
+        for kind in ("user", "service_principal"):
+            if remaining:
+                found = resolver.resolve_many(kind, remaining)
+                remaining = [name for name in remaining if found[name] is None]
+    return sum(len(names) for names in references.values())
+
+
+def build_steps(manifest, dry_run=False):
+    # Compile the manifest into steps: duplicate declarations are merged, lookups
+    # are batched into up-front steps and writes to one object share one step
+    manifest = merge_manifest(manifest)
+    steps = {}
+
+    def add(key, endpoint, fn, requires=(), spec=None):
+        # Keys double as dedupe: an object declared twice is only provisioned once
+        if key not in steps:
+            steps[key] = Step(key, endpoint, fn, requires, spec)
+        return key
+
+    managed_groups = {group["name"] for group in manifest["groups"]}
+
+    def depends_on_group(principal):
+        # Only groups created by this manifest have to wait; anything else already exists
+        return [f"group:{principal}"] if principal in managed_groups else []
+
+    references = principal_references(manifest)
+    lookups = []
+    if any(references.values()):
+        lookups.append(add("lookup:principals", "scim", lambda r: prefetch_principals(references)))
+    schema_lookups = {}
+    for (catalog, schema), count in volume_schemas(manifest).items():
+        if count >= create_volume.volume_catalog.list_after:
+            # One listing serves every volume lookup in the schema
+            schema_lookups[(catalog, schema)] = add(
+                f"lookup:volumes:{catalog}.{schema}", "volumes",
+                lambda r, catalog=catalog, schema=schema: len(create_volume.volume_catalog.list_schema(catalog, schema)))
+
+    for group in manifest["groups"]:
+        name = group["name"]
+        members = group["members"]
+        # Groups this manifest creates can only be added once they exist
+        ready = {"users": members["users"], "groups": [g for g in members["groups"] if g not in managed_groups]}
+        pending = [g for g in members["groups"] if g in managed_groups]
+        target = add(f"group:{name}", "scim", lambda r, name=name, ready=ready: ensure_group(name, ready),
+                     requires=lookups, spec=ready)
+        if pending:
+            add(f"members:{name}", "scim",
+                lambda r, target=target, pending=pending: add_members(r[target], {"groups": pending}),
+                requires=[target] + [f"group:{g}" for g in pending], spec=pending)
+        if group["managers"]:
+            add(f"managers:{name}", "permissions",
+                lambda r, target=target, managers=group["managers"]: create_groups.set_group_managers(
+                    r[target], managers),
+                requires=[target] + [dep for m in group["managers"] for dep in depends_on_group(m)],
+                spec=group["managers"])
+    workspace_groups = [group["name"] for group in manifest["groups"] if group["workspace_access"]]
+    if workspace_groups:
+        add("workspace", "permissions", lambda r: create_groups.add_groups_to_workspace(workspace_groups),
+            requires=[f"group:{name}" for name in workspace_groups], spec=workspace_groups)
+
+    for job in manifest["jobs"]:
+        config = job["config"]
+        target = add(f"job:{config['name']}", "jobs", lambda r, config=config: upsert_job(config, dry_run),
+                     spec=config)
+        if job["owner"] and job["group"]:
+            acl_groups = [job["group"]] + [e["group_name"] for e in job["permissions"] if e.get("group_name")]
+            add(f"job-acl:{config['name']}", "permissions",
+                lambda r, target=target, job=job: set_job_permissions(
+                    r[target], job["owner"], job["group"], dry_run, job["permissions"]),
+                requires=[target] + lookups + [dep for g in acl_groups for dep in depends_on_group(g)],
+                spec={"owner": job["owner"], "group": job["group"], "permissions": job["permissions"]})
+
+    for volume in manifest["volumes"]:
+        config = volume["config"]
+        full_name = f"{config['catalog_name']}.{config['schema_name']}.{config['name']}"
+        schema_lookup = schema_lookups.get((config["catalog_name"], config["schema_name"]))
+        target = add(f"volume:{full_name}", "volumes", lambda r, config=config: upsert_volume(config),
+                     requires=[schema_lookup] if schema_lookup else [], spec=config)
+        grants = volume["grants"]
+        if grants:
+            requires = [target] + lookups
+            for grant in grants:
+                requires += depends_on_group(grant["principal"])
+            add(f"volume-acl:{full_name}", "permissions",
+                lambda r, target=target, grants=grants: grant_volume_permissions(r[target], grants),
+                requires=requires, spec=grants)
+
+    return steps
+
+
+def check_steps(steps):
+    # An unknown dependency or a cycle would otherwise leave tasks waiting forever
+    state = {}
+
+    def visit(key, path):
+        if state.get(key) == "done":
+            return
+        if state.get(key) == "active":
+            raise Exception(f"Dependency cycle: {' -> '.join(path + [key])}")
+        if key not in steps:
+            raise Exception(f"Unknown dependency '{key}' required by '{path[-1]}'")
+        state[key] = "active"
+        for dep in steps[key].requires:
+            visit(dep, path + [key])
+        state[key] = "done"
+
+    for key in steps:
+        visit(key, [])
+
+
+# === RESUMING ===
+# Steps finished by an earlier run with the same spec and the same inputs are
+# not run again; their stored results stand in for them.
+SUCCEEDED = ("ok", "unchanged")
+
+
+def step_hash(steps, step, results):
+    inputs = {dep: results.get(dep) for dep in step.requires if steps[dep].spec is not None}
+    return spec_hash(step.key, step.spec, inputs)
+
+
+def resume_from(steps, store):
+    # {key: stored result} for every step a rerun can skip, decided without calling the API
+    done = {}
+    for wave in stages(steps):
+        for key in wave:
+            step = steps[key]
+            if step.spec is None:
+                continue
+            if any(dep not in done for dep in step.requires if steps[dep].spec is not None):
+                continue
+            found, result = store.completed(key, step_hash(steps, step, done))
+            if found:
+                done[key] = result
+    # A lookup only matters to steps that still have to run
+    for key, step in steps.items():
+        if step.spec is None and all(other.key in done for other in steps.values() if key in other.requires):
+            done[key] = None
+    return done
+
+
+# === EXECUTION ===
+async def run_steps(steps, limits=None, done=None, store=None, resume=True):
+    # done: results of steps to skip (see resume_from); store: StateStore recording each
+    # finished step, and with resume, also consulted once a step's inputs are known
+    limits = {**DEFAULT_LIMITS, **(limits or {})}
+    check_steps(steps)
+    semaphores = {endpoint: asyncio.Semaphore(limit) for endpoint, limit in limits.items()}
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=sum(limits.values())))
+
+    results = {}
+    outcomes = {}
+    tasks = {}
+    done = done or {}
+
+    async def run(step):
+        for dep in step.requires:
+            await tasks[dep]
+        if step.key in done:
+            results[step.key] = done[step.key]
+            outcomes[step.key] = {"status": "unchanged", "error": None, "seconds": 0.0}
+            return
+        failed = [dep for dep in step.requires if outcomes[dep]["status"] not in SUCCEEDED]
+        if failed:
+            outcomes[step.key] = {"status": "skipped", "error": f"dependency '{failed[0]}' did not succeed", "seconds": 0.0}
+            return
+        if store and resume and step.spec is not None:
+            # A dependency reran but handed over the same result (e.g. an updated job keeps its id)
+            found, result = store.completed(step.key, step_hash(steps, step, results))
+            if found:
+                results[step.key] = result
+                outcomes[step.key] = {"status": "unchanged", "error": None, "seconds": 0.0}
+                return
+        async with semaphores[step.endpoint]:
+            start = time.perf_counter()
+            try:
+                results[step.key] = await asyncio.to_thread(step.fn, results)
+                outcomes[step.key] = {"status": "ok", "error": None, "seconds": time.perf_counter() - start}
+            except Exception as e:
+                outcomes[step.key] = {"status": "failed", "error": str(e), "seconds": time.perf_counter() - start}
+        if store and step.spec is not None:
+            # Committed right away, so a crash later in the run keeps this step
+            store.record(step.key, step_hash(steps, step, results), outcomes[step.key]["status"],
+                         results.get(step.key), outcomes[step.key]["error"])
+
+    for key, step in steps.items():
+        tasks[key] = asyncio.ensure_future(run(step))
+    await asyncio.gather(*tasks.values())
+    return outcomes
+
+
+def provision(manifest, limits=None, rate_limit=None, dry_run=False, state=None, fresh=False):
+    # state: path of a StateStore file; fresh=True reruns every step but still records them
+    limits = {**DEFAULT_LIMITS, **(limits or {})}
+    # Every script talks through the shared client, so one pool sized to the total concurrency
+    databricks_client.configure(pool_size=sum(limits.values()), rate_limit=rate_limit)
+    if dry_run:
+        # Only job settings and job ACLs have a plan mode; leave everything else out
+        manifest = {"jobs": manifest.get("jobs", [])}
+    steps = build_steps(manifest, dry_run)
+    store = StateStore(state, create_groups.DATABRICKS_INSTANCE) if state and not dry_run else None
+    try:
+        done = resume_from(steps, store) if store and not fresh else {}
+        return asyncio.run(run_steps(steps, limits, done, store, resume=not fresh))
+    finally:
+        save_all()
+        if store:
+            store.close()
+
+
+def print_plan(steps):
+    # The compiled plan, wave by wave, without calling the API
+    check_steps(steps)
+    for number, wave in enumerate(stages(steps), 1):
+        kinds = {}
+        for key in wave:
+            kind = key.split(":", 1)[0]
+            kinds[kind] = kinds.get(kind, 0) + 1
+        print(f"🧭 Stage {number}: " + ", ".join(f"{count} {kind}" for kind, count in kinds.items()))
+        for key in wave:
+            print(f"   {key}")
+    print(f"📋 {len(steps)} steps")
+
+
+def print_report(outcomes, elapsed):
+    counts = {}
+    for key, outcome in outcomes.items():
+        counts[outcome["status"]] = counts.get(outcome["status"], 0) + 1
+        if outcome["status"] not in SUCCEEDED:
+            print(f"❌ {key}: {outcome['status']} - {outcome['error']}")
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"📋 {len(outcomes)} steps in {elapsed:.1f}s ({summary})")
+
+
+def parse_limits(values):
+    limits = {}
+    for value in values or []:
+        endpoint, _, limit = value.partition("=")
+        limits[endpoint] = int(limit)
+    return limits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Provision groups, jobs and volumes from a manifest")
+    parser.add_argument("manifest")
+    parser.add_argument("--limit", action="append", metavar="ENDPOINT=N",
+                        help="Max concurrent calls for scim, jobs, volumes or permissions")
+    parser.add_argument("--rate-limit", type=float, help="Max requests per second per workspace")
+    parser.add_argument("--plan", action="store_true",
+                        help="Print job and job permission diffs without applying anything")
+    parser.add_argument("--explain", action="store_true",
+                        help="Print the compiled steps, stage by stage, and exit without calling the API")
+    parser.add_argument("--state", help="SQLite state file: skip steps a previous run already applied")
+    parser.add_argument("--fresh", action="store_true", help="With --state, rerun every step anyway")
+    parser.add_argument("--trace", help="Append one JSON line per API call to this file")
+    parser.add_argument("--metrics", help="Write Prometheus text-format API metrics to this file")
+    parser.add_argument("--principal-cache", nargs="?", const=CACHE_FILE, metavar="FILE",
+                        help="Keep resolved principal ids in this file so the next run starts warm")
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.manifest)
+    if args.explain:
+        print_plan(build_steps(manifest))
+        return 0
+    if args.principal_cache:
+        persist_to(args.principal_cache)
+    start = time.perf_counter()
+    with session(args.trace, args.metrics):
+        outcomes = provision(manifest, parse_limits(args.limit), args.rate_limit, args.plan, args.state, args.fresh)
+    print_report(outcomes, time.perf_counter() - start)
+    return 0 if all(o["status"] in SUCCEEDED for o in outcomes.values()) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,72 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS steps (
+    workspace  TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    spec_hash  TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    result     TEXT,
+    error      TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (workspace, key)
+)
+"""
+
+
+def spec_hash(key, spec, inputs=None):
+    # Content hash of what a step applies plus the results it was given (e.g. the
+    # group id a grant targets), so a changed spec or a recreated parent reruns it
+    payload = json.dumps([key, spec, inputs or {}], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# === STATE STORE ===
+# Local SQLite record of every provisioning step: the hash of the spec it last
+# applied, its status and its result (usually the remote object id). Each step
+# is committed as it finishes, so a run that dies halfway resumes from there.
+class StateStore:
+    def __init__(self, path, workspace):
+        self.path = path
+        self.workspace = workspace
+        # timeout: fan-out workers share the file and briefly wait on each other's writes
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(SCHEMA)
+        self._rows = {
+            key: (stored_hash, status, json.loads(result) if result is not None else None)
+            for key, stored_hash, status, result in self.db.execute(
+                "SELECT key, spec_hash, status, result FROM steps WHERE workspace = ?", (workspace,))
+        }
+
+    def completed(self, key, expected_hash):
+        # (True, result) when the step already applied exactly this spec
+        row = self._rows.get(key)
+        if row and row[0] == expected_hash and row[1] == "ok":
+            return True, row[2]
+        return False, None
+
+    def record(self, key, hash_value, status, result=None, error=None):
+        encoded = json.dumps(result, default=str) if result is not None else None
+        self.db.execute(
+            "INSERT OR REPLACE INTO steps (workspace, key, spec_hash, status, result, error, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.workspace, key, hash_value, status, encoded, error, time.time()))
+        self._rows[key] = (hash_value, status, json.loads(encoded) if encoded is not None else None)
+
+    def forget(self, key=None):
+        if key is None:
+            self.db.execute("DELETE FROM steps WHERE workspace = ?", (self.workspace,))
+            self._rows.clear()
+        else:
+            self.db.execute("DELETE FROM steps WHERE workspace = ? AND key = ?", (self.workspace, key))
+            self._rows.pop(key, None)
+
+    def rows(self):
+        return {key: {"status": status, "result": result} for key, (_, status, result) in self._rows.items()}
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,80 @@
+import io
+import os
+import sys
+import unittest
+import unittest.mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_job
+from acl_reconciler import acl_request, index_grants, plan_changes, plan_desired, uc_patch
+from mock_databricks import MockDatabricks
+
+OWNER = "owner@example.com"
+GROUP = "data-engineers"
+
+
+class AclPlanTest(unittest.TestCase):
+    def test_plan_desired(self):
+        current = {("user_name", OWNER): {"IS_OWNER"}, ("group_name", "old-team"): {"CAN_VIEW"}}
+        desired = {("user_name", OWNER): {"IS_OWNER"}, ("group_name", GROUP): {"CAN_MANAGE_RUN"}}
+        self.assertEqual(plan_desired(current, desired), {("group_name", GROUP): ({"CAN_MANAGE_RUN"}, set())})
+        self.assertEqual(plan_desired(current, desired, prune=True)[("group_name", "old-team")],
+                         (set(), {"CAN_VIEW"}))
+        self.assertEqual(plan_desired(desired, desired, prune=True), {})
+
+    def test_inherited_grants_are_ignored(self):
+        acl = [{"group_name": "admins", "all_permissions": [{"permission_level": "CAN_MANAGE", "inherited": True}]},
+               {"user_name": OWNER, "all_permissions": [{"permission_level": "IS_OWNER", "inherited": False}]}]
+        self.assertEqual(index_grants(acl), {("user_name", OWNER): {"IS_OWNER"}})
+
+    def test_additions_patch_and_removals_put(self):
+        desired_acl = [{"user_name": OWNER, "permission_level": "IS_OWNER"}]
+        self.assertEqual(acl_request({}, desired_acl), (None, None))
+        method, payload = acl_request({("user_name", OWNER): ({"IS_OWNER"}, set())}, desired_acl)
+        self.assertEqual((method, payload), ("PATCH", {"access_control_list": desired_acl}))
+        method, payload = acl_request({("group_name", GROUP): (set(), {"CAN_VIEW"})}, desired_acl)
+        self.assertEqual((method, payload), ("PUT", {"access_control_list": desired_acl}))
+
+    def test_unity_catalog_changes(self):
+        plan = plan_changes({GROUP: {"READ_VOLUME"}}, [{"principal": GROUP, "add": ["READ_VOLUME", "WRITE_VOLUME"]},
+                                                        {"principal": "analysts", "remove": ["READ_VOLUME"]}])
+        self.assertEqual(uc_patch(plan), {"changes": [{"principal": GROUP, "add": ["WRITE_VOLUME"]}]})
+
+
+# set_job_permissions against the mock: only the calls the plan needs are made
+class JobPermissionsTest(unittest.TestCase):
+    def setUp(self):
+        self.mock = MockDatabricks()
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        self.mock.add_user(OWNER)
+        self.mock.add_group(GROUP)
+        self.mock.add_group("old-team")
+        self.job_id = self.mock.add_job({"name": "acl-job"})
+        self.host = create_job.workspace_url, create_job.token
+        create_job.workspace_url, create_job.token = self.mock.url, "test-token"
+        self.addCleanup(self.restore)
+
+    def restore(self):
+        create_job.workspace_url, create_job.token = self.host
+
+    def set_permissions(self):
+        self.mock.stats.reset()
+        with unittest.mock.patch("sys.stdout", io.StringIO()):
+            self.assertTrue(create_job.set_job_permissions(self.job_id, OWNER, GROUP))
+        routes = self.mock.stats.by_route
+        return sorted(route.split(" ")[0] for route in routes if route.endswith(" permissions/<object>"))
+
+    def test_patch_then_nothing_then_put(self):
+        self.assertEqual(self.set_permissions(), ["GET", "PATCH"])
+        self.assertEqual(self.set_permissions(), ["GET"])
+        create_job.client().api("PATCH", f"permissions/jobs/{self.job_id}", {
+            "access_control_list": [{"group_name": "old-team", "permission_level": "CAN_VIEW"}]})
+        self.assertEqual(self.set_permissions(), ["GET", "PUT"])
+        acl = index_grants(create_job.client().api("GET", f"permissions/jobs/{self.job_id}"))
+        self.assertEqual(acl, {("user_name", OWNER): {"IS_OWNER"}, ("group_name", GROUP): {"CAN_MANAGE_RUN"}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import unittest.mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_groups
+import directory_sync
+from mock_databricks import MockDatabricks
+
+
+# A sync through capped pages converges: the second run plans nothing
+class DirectorySyncTest(unittest.TestCase):
+    def setUp(self):
+        self.mock = MockDatabricks(page_size=10)
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        self.mock.seed(users=30, groups=5, members_per_group=3)
+        self.host = create_groups.DATABRICKS_INSTANCE, create_groups.TOKEN
+        create_groups.DATABRICKS_INSTANCE, create_groups.TOKEN = self.mock.url, "test-token"
+        self.addCleanup(self.restore)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.export = os.path.join(directory, "export.jsonl")
+        with open(self.export, "w") as f:
+            for i in range(25):
+                f.write(json.dumps({"type": "user", "userName": f"user{i}@example.com",
+                                    "groups": [f"group-{i % 5}", "new-team"]}) + "\n")
+            f.write(json.dumps({"type": "user", "userName": "new@example.com", "groups": ["new-team"]}) + "\n")
+
+    def restore(self):
+        create_groups.DATABRICKS_INSTANCE, create_groups.TOKEN = self.host
+
+    def sync(self):
+        output = io.StringIO()
+        with unittest.mock.patch.object(sys, "argv", ["directory_sync.py", self.export, "--concurrency", "4"]), \
+                unittest.mock.patch("sys.stdout", output):
+            self.assertEqual(directory_sync.main(), 0)
+        return output.getvalue()
+
+    def members(self, name):
+        group = next(g for g in self.mock.groups.values() if g["displayName"] == name)
+        return {self.mock.users[m["value"]]["userName"] for m in group["members"]}
+
+    def test_sync_converges(self):
+        output = self.sync()
+        self.assertIn("1 create group, 1 create user, 5 deactivate", output)
+        self.assertEqual(self.members("new-team"), {f"user{i}@example.com" for i in range(25)} | {"new@example.com"})
+        self.assertEqual(self.members("group-0"), {f"user{i}@example.com" for i in range(0, 25, 5)})
+        self.assertEqual(sorted(u["userName"] for u in self.mock.users.values() if not u["active"]),
+                         sorted(f"user{i}@example.com" for i in range(25, 30)))
+        self.assertIn("0 create group, 0 create user, 0 deactivate, 0 reactivate, 0 add member, 0 remove member",
+                      self.sync())
+
+
+if __name__ == "__main__":
+    unittest.main()
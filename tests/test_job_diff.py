@@ -0,0 +1,73 @@
+import copy
+import io
+import os
+import sys
+import unittest
+import unittest.mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_job
+from job_diff import diff_settings, fetch_job
+from job_index import settings_from_config
+from mock_databricks import MockDatabricks
+
+
+# Planning a job against the workspace it was just written to has nothing to do
+class JobDiffTest(unittest.TestCase):
+    def setUp(self):
+        self.mock = MockDatabricks()
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        self.host = create_job.workspace_url, create_job.token
+        create_job.workspace_url, create_job.token = self.mock.url, "test-token"
+        create_job.job_index.clear()
+        self.addCleanup(self.restore)
+        self.config = copy.deepcopy(create_job.job_config)
+
+    def restore(self):
+        create_job.workspace_url, create_job.token = self.host
+        create_job.job_index.clear()
+
+    def upsert(self, config):
+        with unittest.mock.patch("sys.stdout", io.StringIO()):
+            return create_job.create_or_update_job(config)
+
+    def plan(self, job_id, config):
+        return diff_settings(fetch_job(create_job.databricks_api, job_id), settings_from_config(config))
+
+    def test_same_settings_plan_nothing(self):
+        job_id = self.upsert(self.config)
+        self.assertFalse(self.plan(job_id, self.config))
+        self.assertFalse(self.plan(job_id, self.config))
+        self.mock.stats.reset()
+        self.assertEqual(self.upsert(self.config), job_id)
+        self.assertEqual(self.mock.stats.by_route["POST jobs/update"], 0)
+        self.assertEqual(self.mock.stats.by_route["POST jobs/create"], 0)
+
+    def test_server_defaults_and_order_are_not_changes(self):
+        job_id = self.upsert(self.config)
+        settings = self.mock.jobs[job_id]["settings"]
+        settings["max_concurrent_runs"] = 1
+        settings["parameters"] = list(reversed(settings["parameters"]))
+        self.assertFalse(self.plan(job_id, self.config))
+
+    def test_changed_task_is_the_only_update(self):
+        job_id = self.upsert(self.config)
+        changed = copy.deepcopy(self.config)
+        changed["tasks"][0]["notebook_task"]["notebook_path"] = "/path/to/another/notebook"
+        diff = self.plan(job_id, changed)
+        self.assertEqual(list(diff.new_settings), ["tasks"])
+        self.assertEqual(diff.fields_to_remove, [])
+        self.upsert(changed)
+        self.assertFalse(self.plan(job_id, changed))
+
+    def test_dropped_task_is_removed(self):
+        self.config["tasks"].append({"task_key": "extra", "notebook_task": {"notebook_path": "/Jobs/extra"}})
+        job_id = self.upsert(self.config)
+        self.config["tasks"].pop()
+        self.assertEqual(self.plan(job_id, self.config).fields_to_remove, ["tasks/extra"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_job
+from job_index import JobIndex
+from mock_databricks import MockDatabricks
+
+
+def job_settings(name, notebook):
+    return {"name": name, "tasks": [{"task_key": "main", "notebook_task": {"notebook_path": notebook}}]}
+
+
+# The import pool upserts into the index from many threads at once
+class JobIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.mock = MockDatabricks(page_size=10)
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        self.mock.seed(jobs=35)
+        self.host = create_job.workspace_url, create_job.token
+        create_job.workspace_url, create_job.token = self.mock.url, "test-token"
+        self.addCleanup(self.restore)
+        self.index = JobIndex(create_job.databricks_api)
+
+    def restore(self):
+        create_job.workspace_url, create_job.token = self.host
+
+    def test_lists_every_page(self):
+        self.assertEqual(len(self.index.ensure_loaded()), 35)
+        self.assertIsNotNone(self.index.job_id_by_name("job-34"))
+
+    def test_concurrent_upserts(self):
+        self.index.ensure_loaded()
+        # Switch threads as often as possible so unlocked updates would interleave
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+
+        def churn(worker):
+            for i in range(200):
+                job_id = 100000 + worker * 200 + i
+                self.index.upsert(job_id, job_settings(f"shared-{i % 5}", f"/Jobs/{worker}/{i}"))
+                self.index.upsert(job_id, {"name": f"renamed-{worker}"})
+                if i % 2:
+                    self.index.remove(job_id)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(churn, range(8)))
+        self.assertEqual(len(self.index), 35 + 8 * 100)
+        for worker in range(8):
+            job_id = self.index.job_id_by_name(f"renamed-{worker}")
+            self.assertIn(job_id, self.index)
+            self.assertEqual(self.index.settings(job_id)["name"], f"renamed-{worker}")
+        self.assertIsNone(self.index.job_id_by_name("shared-0"))
+        self.assertEqual(self.index.job_id_by_notebook("/Jobs/3/0"), 100000 + 3 * 200)
+
+    def test_concurrent_upserts_of_the_same_jobs(self):
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+        self.index.ensure_loaded()
+        job_ids = sorted(self.mock.jobs)
+
+        def churn(worker):
+            for i in range(300):
+                self.index.upsert(job_ids[i % len(job_ids)], {"name": f"name-{(worker + i) % 3}"})
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(churn, range(8)))
+        # Every job is filed once, under the name its settings have now
+        for job_id in job_ids:
+            name = self.index.settings(job_id)["name"]
+            filed = [n for n, ids in self.index._by_name.items() for listed in ids if listed == job_id]
+            self.assertEqual(filed, [name])
+
+
+if __name__ == "__main__":
+    unittest.main()
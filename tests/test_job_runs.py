@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_job
+import job_runs
+from mock_databricks import MockDatabricks
+
+
+# A workspace with a long run history: tracking a handful of new runs must not
+# page through all of it
+class RunTrackingTest(unittest.TestCase):
+    def setUp(self):
+        self.mock = MockDatabricks(run_duration=0.0)
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        self.mock.seed(jobs=2)
+        self.job_ids = sorted(self.mock.jobs)
+        hour_ago = int(time.time() * 1000) - 3600000
+        for _ in range(400):
+            run_id = self.mock.add_run(self.job_ids[1])
+            self.mock.runs[run_id]["start_time"] = hour_ago
+        self.host = create_job.workspace_url, create_job.token
+        create_job.workspace_url, create_job.token = self.mock.url, "test-token"
+        self.addCleanup(self.restore)
+
+    def restore(self):
+        create_job.workspace_url, create_job.token = self.host
+
+    def test_trigger_sends_idempotency_tokens(self):
+        results = job_runs.trigger_runs([(self.job_ids[0], None), (self.job_ids[0], {"env": "prod"})])
+        tokens = [self.mock.runs[run_id]["idempotency_token"] for _, run_id, _ in results]
+        self.assertTrue(all(tokens))
+        self.assertEqual(len(set(tokens)), 2)
+
+    def test_retried_trigger_starts_one_run(self):
+        first = job_runs.run_now(self.job_ids[0], idempotency_token="retry-me")
+        self.assertEqual(job_runs.run_now(self.job_ids[0], idempotency_token="retry-me"), first)
+
+    def test_listing_starts_at_trigger_time(self):
+        triggered_at = int(time.time() * 1000)
+        run_ids = [run_id for _, run_id, _ in job_runs.trigger_runs([(job_id, None) for job_id in self.job_ids])]
+        tracker = job_runs.RunTracker(run_ids, started_after=triggered_at)
+        tracker.poll()
+        self.assertTrue(tracker.done())
+        self.assertLessEqual(tracker.requests, 2)
+
+    def test_page_cap_falls_back_to_runs_get(self):
+        # The oldest run in the workspace, last in every listing
+        run_id = self.mock.add_run(self.job_ids[0])
+        self.mock.runs[run_id]["start_time"] = int(time.time() * 1000) - 7200000
+        tracker = job_runs.RunTracker([run_id])
+        tracker.poll()
+        self.assertTrue(tracker.done())
+        self.assertLessEqual(tracker.requests, 1 + job_runs.MAX_LIST_PAGES + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
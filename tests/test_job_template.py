@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_job
+from job_diff import diff_settings, fetch_job
+from job_template import JobTemplate, expand
+from mock_databricks import MockDatabricks
+
+SPEC = {
+    "name": "etl-{{ env }}-{{team}}",
+    "max_concurrent_runs": "{{runs}}",
+    "tasks": [{"task_key": "main", "notebook_task": {"notebook_path": "/Jobs/{{team}}/etl",
+                                                     "base_parameters": "{{params}}"}}],
+    "tags": {"strict": "{{strict}}", "label": "strict={{strict}}"},
+}
+
+
+class JobTemplateTest(unittest.TestCase):
+    def setUp(self):
+        self.template = JobTemplate(SPEC)
+
+    def test_render(self):
+        params = {"env": "prod", "team": "a\"b", "runs": 3, "params": {"date": "2025-08-04"}, "strict": True}
+        self.assertEqual(self.template.parameters, ["env", "params", "runs", "strict", "team"])
+        self.assertEqual(self.template.render(params), {
+            "name": "etl-prod-a\"b",
+            "max_concurrent_runs": 3,
+            "tasks": [{"task_key": "main", "notebook_task": {"notebook_path": "/Jobs/a\"b/etl",
+                                                             "base_parameters": {"date": "2025-08-04"}}}],
+            "tags": {"strict": True, "label": "strict=True"},
+        })
+
+    def test_missing_parameter(self):
+        with self.assertRaisesRegex(Exception, "'runs'"):
+            self.template.render({"env": "dev", "team": "a", "params": {}, "strict": False})
+
+    def test_render_many_keeps_equal_values_of_different_types_apart(self):
+        # True == 1 == 1.0, but each must come out as itself from the shared cache
+        variants = expand({"env": "dev", "team": "a", "params": {}}, runs=[1, 1.0, True], strict=[True, 1])
+        rendered = [json.loads(text) for text in self.template.render_many(variants)]
+        self.assertEqual(rendered, [self.template.render(params) for params in variants])
+        self.assertEqual([(type(r["max_concurrent_runs"]), type(r["tags"]["strict"])) for r in rendered],
+                         [(int, bool), (int, int), (float, bool), (float, int), (bool, bool), (bool, int)])
+        self.assertEqual([r["tags"]["label"] for r in rendered[:2]], ["strict=True", "strict=1"])
+
+
+# A rendered variant is created as is and reads back without a diff
+class RenderedJobTest(unittest.TestCase):
+    def setUp(self):
+        self.mock = MockDatabricks()
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        self.host = create_job.workspace_url, create_job.token
+        create_job.workspace_url, create_job.token = self.mock.url, "test-token"
+        self.addCleanup(self.restore)
+
+    def restore(self):
+        create_job.workspace_url, create_job.token = self.host
+
+    def test_create_rendered_variants(self):
+        template = JobTemplate(SPEC)
+        variants = expand({"runs": 2, "params": {"date": "2025-08-04"}, "strict": False},
+                          env=["dev", "prod"], team=["finance", "sales"])
+        for params in variants:
+            settings = template.render(params)
+            job_id = create_job.databricks_api("POST", "jobs/create", settings)["job_id"]
+            self.assertFalse(diff_settings(fetch_job(create_job.databricks_api, job_id), settings))
+        names = sorted(job["settings"]["name"] for job in self.mock.jobs.values())
+        self.assertEqual(names, ["etl-dev-finance", "etl-dev-sales", "etl-prod-finance", "etl-prod-sales"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import unittest.mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_job
+import job_transfer
+from mock_databricks import MockDatabricks
+
+
+def job_settings(name, notebook):
+    return {"name": name, "tasks": [{"task_key": "main", "notebook_task": {"notebook_path": notebook}}]}
+
+
+# Job names are not unique, so a restore has to keep every job of a shared name
+class JobTransferTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.snapshot = os.path.join(directory, "jobs.ndjson.gz")
+        self.host = create_job.workspace_url, create_job.token
+        self.addCleanup(self.restore)
+        self.source = self.workspace()
+        for name, notebook in (("etl", "/Jobs/etl-eu"), ("etl", "/Jobs/etl-us"), ("report", "/Jobs/report")):
+            self.source.add_job(job_settings(name, notebook))
+
+    def restore(self):
+        create_job.workspace_url, create_job.token = self.host
+        create_job.job_index.clear()
+
+    def workspace(self):
+        mock = MockDatabricks()
+        mock.start()
+        self.addCleanup(mock.stop)
+        return mock
+
+    def use(self, mock):
+        create_job.workspace_url, create_job.token = mock.url, "test-token"
+        create_job.job_index.clear()
+
+    def notebooks(self, mock):
+        return sorted((job["settings"]["name"], job["settings"]["tasks"][0]["notebook_task"]["notebook_path"])
+                      for job in mock.jobs.values())
+
+    def transfer(self, target):
+        self.use(self.source)
+        self.assertEqual(job_transfer.export_jobs(self.snapshot), 3)
+        self.use(target)
+        with io.StringIO() as out, unittest.mock.patch("sys.stdout", out):
+            return job_transfer.import_jobs(self.snapshot, concurrency=2), out.getvalue()
+
+    def test_import_keeps_jobs_sharing_a_name(self):
+        target = self.workspace()
+        (imported, failed), output = self.transfer(target)
+        self.assertEqual((imported, failed), (3, 0))
+        self.assertEqual(self.notebooks(target), self.notebooks(self.source))
+        self.assertIn("1 jobs shared a name", output)
+
+    def test_restore_matches_exported_job_ids(self):
+        (imported, failed), output = self.transfer(self.source)
+        self.assertEqual((imported, failed), (3, 0))
+        self.assertEqual(len(self.source.jobs), 3)
+        self.assertNotIn("shared a name", output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_groups
+from membership_graph import MembershipGraph
+from mock_databricks import MockDatabricks
+
+
+# analysts -> engineers -> platform -> analysts is a nesting cycle; ana is in analysts
+class MembershipGraphTest(unittest.TestCase):
+    def setUp(self):
+        self.mock = MockDatabricks(page_size=2)
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        self.ana = self.mock.add_user("ana@example.com")["id"]
+        self.ids = {name: self.mock.add_group(name)["id"] for name in ("analysts", "engineers", "platform", "other")}
+        for group, member in (("analysts", "engineers"), ("engineers", "platform"), ("platform", "analysts")):
+            self.mock.groups[self.ids[group]]["members"].append({"value": self.ids[member]})
+        self.mock.groups[self.ids["analysts"]]["members"].append({"value": self.ana})
+        self.host = create_groups.DATABRICKS_INSTANCE, create_groups.TOKEN
+        create_groups.DATABRICKS_INSTANCE, create_groups.TOKEN = self.mock.url, "test-token"
+        self.addCleanup(self.restore)
+        self.graph = MembershipGraph(lambda: create_groups.iter_groups(attributes="id,displayName,members"))
+
+    def restore(self):
+        create_groups.DATABRICKS_INSTANCE, create_groups.TOKEN = self.host
+
+    def test_cycles(self):
+        cycles = self.graph.cycles()
+        self.assertEqual(len(cycles), 1)
+        self.assertEqual(sorted(cycles[0]), sorted(self.ids[name] for name in ("analysts", "engineers", "platform")))
+        self.graph.remove_member(self.ids["platform"], self.ids["analysts"])
+        self.assertEqual(self.graph.cycles(), [])
+
+    def test_transitive_queries(self):
+        cycle = {self.ids[name] for name in ("analysts", "engineers", "platform")}
+        self.assertEqual(self.graph.groups_of(self.ana), cycle)
+        self.assertEqual(self.graph.members_of(self.ids["platform"]), {self.ana})
+        self.assertEqual(self.graph.path(self.ana, self.ids["platform"]),
+                         [self.ana, self.ids["analysts"], self.ids["platform"]])
+        self.assertFalse(self.graph.is_member(self.ana, self.ids["other"]))
+
+    def test_concurrent_updates_and_walks(self):
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+        self.graph.ensure_loaded()
+        other = self.ids["other"]
+
+        def churn(worker):
+            for i in range(300):
+                member = f"user-{worker}-{i % 10}"
+                self.graph.apply_patch(other, {"Operations": [
+                    {"op": "add", "path": "members", "value": [{"value": member}]}]})
+                self.graph.groups_of(member)
+                self.graph.members_of(self.ids["analysts"])
+                if i % 10 == 9:
+                    self.graph.apply_patch(other, {"Operations": [
+                        {"op": "remove", "path": f'members[value eq "{member}"]'}]})
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(churn, range(8)))
+        expected = {f"user-{worker}-{i}" for worker in range(8) for i in range(9)}
+        self.assertEqual(self.graph.direct_members(other), expected)
+        for member in expected:
+            self.assertEqual(self.graph.groups_of(member), {other})
+        self.assertEqual(self.graph.groups_of("user-0-9"), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
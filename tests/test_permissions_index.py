@@ -0,0 +1,72 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_groups
+import create_job
+import create_volume
+import permissions_index
+from mock_databricks import MockDatabricks
+
+
+# Grants change without touching the job settings or the volume, so a second
+# snapshot has to pick them up from the ACLs themselves
+class PermissionsSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.mock = MockDatabricks(page_size=50)
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        self.mock.seed(groups=3, jobs=2, volumes=2, catalog="main", schema="landing")
+        self.hosts = (create_groups.DATABRICKS_INSTANCE, create_groups.TOKEN, create_job.workspace_url,
+                      create_job.token, create_volume.workspace_url, create_volume.token)
+        create_groups.DATABRICKS_INSTANCE, create_groups.TOKEN = self.mock.url, "test-token"
+        create_job.workspace_url, create_job.token = self.mock.url, "test-token"
+        create_volume.workspace_url, create_volume.token = self.mock.url, "test-token"
+        self.addCleanup(self.restore)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.index = permissions_index.PermissionsIndex(os.path.join(directory, "permissions.db"))
+        self.addCleanup(self.index.close)
+
+    def restore(self):
+        (create_groups.DATABRICKS_INSTANCE, create_groups.TOKEN, create_job.workspace_url,
+         create_job.token, create_volume.workspace_url, create_volume.token) = self.hosts
+
+    def snapshot(self, **options):
+        return permissions_index.snapshot(self.index, schemas=["main.landing"], concurrency=4, **options)
+
+    def grant_job(self, job_id, user_name, level):
+        create_groups.client().api("PATCH", f"permissions/jobs/{job_id}", {
+            "access_control_list": [{"user_name": user_name, "permission_level": level}]})
+
+    def grant_volume(self, volume_id, principal, privilege):
+        create_groups.client().api("PATCH", f"volumes/{volume_id}/permissions", {
+            "changes": [{"principal": principal, "add": [privilege]}]})
+
+    def test_grant_changes_are_picked_up(self):
+        job_id = next(iter(self.mock.jobs))
+        volume_id = next(iter(self.mock.volumes))
+        self.grant_job(job_id, "ana@example.com", "CAN_VIEW")
+        self.assertEqual(self.snapshot()["listed"], 7)
+        self.assertTrue(self.index.has("ana@example.com", "job", job_id, "CAN_VIEW"))
+
+        self.grant_job(job_id, "ana@example.com", "CAN_MANAGE")
+        self.grant_volume(volume_id, "ana@example.com", "READ_VOLUME")
+        summary = self.snapshot()
+        self.assertEqual(summary["fetched"], 7)
+        self.assertTrue(self.index.has("ana@example.com", "job", job_id, "CAN_MANAGE"))
+        self.assertIn("READ_VOLUME", [level for _, _, level, _ in self.index.grants_on("volume", volume_id)])
+
+    def test_max_age_keeps_recent_acls(self):
+        self.snapshot()
+        summary = self.snapshot(max_age=3600)
+        self.assertEqual((summary["fetched"], summary["unchanged"]), (0, 7))
+        self.assertEqual(self.snapshot(max_age=3600, full=True)["fetched"], 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import principal_resolver
+
+
+def save_repeatedly(cache_file, namespace, times):
+    # One process of a fan-out: its own workspace, the shared cache file
+    resolver = principal_resolver.PrincipalResolver(None, namespace=namespace, cache_file=cache_file)
+    resolver.prime("group", [{"displayName": f"{namespace}-group", "id": namespace}])
+    for _ in range(times):
+        resolver.save()
+
+
+class PrincipalCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.cache_file = os.path.join(directory, "cache.json")
+
+    def test_persistence_is_opt_in(self):
+        self.assertIsNone(principal_resolver.resolver_for("https://opt-in.example.com", None).cache_file)
+
+    def test_concurrent_saves_keep_every_namespace(self):
+        context = multiprocessing.get_context("spawn")
+        namespaces = [f"workspace-{i}" for i in range(6)]
+        processes = [context.Process(target=save_repeatedly, args=(self.cache_file, namespace, 50))
+                     for namespace in namespaces]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual([process.exitcode for process in processes], [0] * len(processes))
+        with open(self.cache_file) as f:
+            self.assertEqual(sorted(json.load(f)), namespaces)
+        self.assertEqual([name for name in os.listdir(os.path.dirname(self.cache_file)) if name.endswith(".tmp")], [])
+
+    def test_warm_start(self):
+        save_repeatedly(self.cache_file, "workspace", 1)
+        resolver = principal_resolver.PrincipalResolver(None, namespace="workspace", cache_file=self.cache_file)
+        self.assertEqual(resolver.resolve("group", "workspace-group"), "workspace")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import sys
+import unittest
+import unittest.mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_groups
+import directory_sync
+import principal_resolver
+from mock_databricks import MockDatabricks
+
+
+# The mock caps every page at 50 items, below the 100 the listings ask for
+class ScimPagingTest(unittest.TestCase):
+    def setUp(self):
+        self.mock = MockDatabricks(page_size=50)
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        self.mock.seed(users=120, groups=230)
+        self.host = create_groups.DATABRICKS_INSTANCE, create_groups.TOKEN
+        create_groups.DATABRICKS_INSTANCE, create_groups.TOKEN = self.mock.url, "test-token"
+        self.addCleanup(self.restore)
+
+    def restore(self):
+        create_groups.DATABRICKS_INSTANCE, create_groups.TOKEN = self.host
+
+    def test_iter_groups_pages_past_short_pages(self):
+        names = {group["displayName"] for group in create_groups.iter_groups(attributes="id,displayName")}
+        self.assertEqual(names, {f"group-{i}" for i in range(230)})
+
+    def test_iter_groups_read_ahead(self):
+        groups = list(create_groups.iter_groups(attributes="id,displayName", read_ahead=True))
+        self.assertEqual(len(groups), 230)
+
+    def test_iter_users(self):
+        self.assertEqual(len(list(create_groups.iter_users(attributes="id,userName"))), 120)
+
+    def test_prime_all_sees_every_page(self):
+        resolver = principal_resolver.PrincipalResolver(create_groups.databricks_api)
+        self.assertEqual(resolver.prime_all("group"), 230)
+        self.assertIsNotNone(resolver.resolve("group", "group-200"))
+        self.assertIsNone(resolver.resolve("group", "no-such-group"))
+
+    def test_prime_groups(self):
+        self.assertEqual(create_groups.prime_groups(), 230)
+        self.assertIsNone(create_groups.principals().resolve("group", "no-such-group"))
+
+    def test_prime_groups_after_a_short_listing(self):
+        # A listing cut off by an empty page is not complete, so misses still query
+        fetch_page = create_groups._fetch_page
+
+        def first_page_only(resource, start_index, *args):
+            resources, total = fetch_page(resource, start_index, *args)
+            return (resources if start_index == 1 else []), total
+
+        with unittest.mock.patch.object(create_groups, "_fetch_page", first_page_only):
+            self.assertEqual(create_groups.prime_groups(), 50)
+        self.assertIsNotNone(create_groups.principals().resolve("group", "group-200"))
+
+    def test_totals_reported(self):
+        totals = {}
+        groups = list(create_groups.iter_groups(attributes="id", read_ahead=True, totals=totals))
+        users = list(create_groups.iter_users(attributes="id", totals=totals))
+        self.assertEqual(totals, {"Groups": len(groups), "Users": len(users)})
+
+    def test_load_workspace_lists_every_page(self):
+        entities = directory_sync.ExternalSorter(directory_sync.entity_key, run_size=40)
+        edges = directory_sync.ExternalSorter(directory_sync.edge_key, run_size=40)
+        self.addCleanup(entities.close)
+        self.addCleanup(edges.close)
+        group_ids = directory_sync.load_workspace(entities, edges, 40, None)
+        self.assertEqual(len(group_ids), 230)
+        self.assertEqual(sum(1 for _ in entities), 350)
+
+    def test_partial_listing_refused(self):
+        with self.assertRaises(Exception):
+            directory_sync.check_listing({"Users": 100, "Groups": 230}, {"Users": 120, "Groups": 230})
+        directory_sync.check_listing({"Users": 120, "Groups": 230}, {"Users": 120})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import copy
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import unittest.mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_groups
+import create_job
+import create_job_2
+import create_volume
+import fanout
+import provision_engine
+from mock_databricks import MockDatabricks
+from state_store import StateStore, spec_hash
+
+MANIFEST = {
+    "groups": [{"name": "data-engineers", "members": {"users": ["ana@example.com"]}, "managers": ["admins"]}],
+    "jobs": [{"config": {"name": "etl", "tasks": [{"task_key": "main",
+                                                     "notebook_task": {"notebook_path": "/Jobs/etl"}}]},
+              "owner": "ana@example.com", "group": "data-engineers"}],
+}
+
+
+class StateStoreTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "state.db")
+
+    def test_completed_needs_the_same_hash_and_ok(self):
+        store = StateStore(self.path, "https://one.example.com")
+        self.addCleanup(store.close)
+        store.record("job:etl", spec_hash("job:etl", {"name": "etl"}), "ok", 123)
+        store.record("group:x", spec_hash("group:x", {}), "failed", error="boom")
+        self.assertEqual(store.completed("job:etl", spec_hash("job:etl", {"name": "etl"})), (True, 123))
+        self.assertEqual(store.completed("job:etl", spec_hash("job:etl", {"name": "etl2"}))[0], False)
+        self.assertEqual(store.completed("group:x", spec_hash("group:x", {}))[0], False)
+
+    def test_workspaces_are_kept_apart_and_reloaded(self):
+        first = StateStore(self.path, "https://one.example.com")
+        first.record("job:etl", "hash", "ok", 1)
+        first.close()
+        second = StateStore(self.path, "https://two.example.com")
+        self.addCleanup(second.close)
+        self.assertEqual(second.rows(), {})
+        reopened = StateStore(self.path, "https://one.example.com")
+        self.addCleanup(reopened.close)
+        self.assertEqual(reopened.rows(), {"job:etl": {"status": "ok", "result": 1}})
+        reopened.forget("job:etl")
+        self.assertEqual(reopened.rows(), {})
+
+
+# A rerun with --state skips every step that already applied the same spec
+class ResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.mock = MockDatabricks()
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        self.mock.add_user("ana@example.com")
+        self.mock.add_group("admins")
+        self.hosts = (create_groups.DATABRICKS_INSTANCE, create_groups.TOKEN, create_job.workspace_url,
+                      create_job.token, create_job_2.DATABRICKS_HOST, create_job_2.TOKEN,
+                      create_volume.workspace_url, create_volume.token)
+        fanout.configure_workspace(self.mock.url, "test-token")
+        self.addCleanup(self.restore)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.state = os.path.join(directory, "state.db")
+
+    def restore(self):
+        (create_groups.DATABRICKS_INSTANCE, create_groups.TOKEN, create_job.workspace_url,
+         create_job.token, create_job_2.DATABRICKS_HOST, create_job_2.TOKEN,
+         create_volume.workspace_url, create_volume.token) = self.hosts
+        create_job.job_index.clear()
+        create_groups.membership.clear()
+
+    def provision(self, manifest):
+        self.mock.stats.reset()
+        with unittest.mock.patch("sys.stdout", io.StringIO()):
+            outcomes = provision_engine.provision(manifest, state=self.state)
+        return {key: outcome["status"] for key, outcome in outcomes.items()}
+
+    def writes(self):
+        return sum(count for route, count in self.mock.stats.by_route.items() if not route.startswith("GET "))
+
+    def test_rerun_skips_finished_steps(self):
+        self.assertEqual(set(self.provision(MANIFEST).values()), {"ok"})
+        self.assertEqual(set(self.provision(MANIFEST).values()), {"unchanged"})
+        self.assertEqual(self.writes(), 0)
+
+    def test_resume_from_decides_without_the_api(self):
+        self.provision(MANIFEST)
+        steps = provision_engine.build_steps(MANIFEST)
+        store = StateStore(self.state, self.mock.url)
+        self.addCleanup(store.close)
+        self.mock.stats.reset()
+        self.assertEqual(set(provision_engine.resume_from(steps, store)), set(steps))
+        self.assertEqual(self.mock.stats.total, 0)
+        store.forget("job:etl")
+        done = provision_engine.resume_from(steps, store)
+        self.assertNotIn("job:etl", done)
+        self.assertNotIn("job-acl:etl", done)
+        self.assertIn("group:data-engineers", done)
+
+    def test_changed_spec_reruns_only_its_steps(self):
+        self.provision(MANIFEST)
+        changed = copy.deepcopy(MANIFEST)
+        changed["jobs"][0]["config"]["tasks"][0]["notebook_task"]["notebook_path"] = "/Jobs/etl-v2"
+        outcomes = self.provision(changed)
+        self.assertEqual(outcomes["job:etl"], "ok")
+        self.assertEqual(outcomes["group:data-engineers"], "unchanged")
+        self.assertEqual(outcomes["managers:data-engineers"], "unchanged")
+
+
+if __name__ == "__main__":
+    unittest.main()
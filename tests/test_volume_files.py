@@ -0,0 +1,91 @@
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import unittest.mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_volume
+import volume_files
+from mock_databricks import MockDatabricks
+
+REMOTE_DIR = "/Volumes/main/landing/raw"
+CHUNK = 1024
+
+
+# Ranges already in <file>.part (as logged in <file>.part.jsonl) are not downloaded again
+class DownloadResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.mock = MockDatabricks()
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        self.data = os.urandom(10 * CHUNK + 100)
+        self.mock.files[f"{REMOTE_DIR}/nested/big.bin"] = {"data": self.data, "last_modified": 1754300000000}
+        self.mock.files[f"{REMOTE_DIR}/small.txt"] = {"data": b"hello", "last_modified": 1754300000000}
+        self.host = create_volume.workspace_url, create_volume.token
+        create_volume.workspace_url, create_volume.token = self.mock.url, "test-token"
+        self.addCleanup(self.restore)
+        chunk_size = unittest.mock.patch.object(volume_files, "CHUNK_SIZE", CHUNK)
+        chunk_size.start()
+        self.addCleanup(chunk_size.stop)
+        self.local_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.local_dir)
+        self.dest = os.path.join(self.local_dir, "nested", "big.bin")
+
+    def restore(self):
+        create_volume.workspace_url, create_volume.token = self.host
+
+    def download(self):
+        self.mock.stats.reset()
+        with unittest.mock.patch("sys.stdout", io.StringIO()):
+            return volume_files.download_dir(REMOTE_DIR, self.local_dir, parallel=4)
+
+    def file_gets(self):
+        return self.mock.stats.by_route["GET fs/files"]
+
+    def interrupt_after(self, offset):
+        download_range = volume_files.download_range
+
+        def failing(remote_path, partial, range_offset):
+            if remote_path.endswith("big.bin") and range_offset >= offset:
+                raise Exception("connection reset")
+            return download_range(remote_path, partial, range_offset)
+
+        return unittest.mock.patch.object(volume_files, "download_range", failing)
+
+    def test_resume_from_part_log(self):
+        with self.interrupt_after(6 * CHUNK):
+            progress = self.download()
+        self.assertEqual(progress.failed, 1)
+        self.assertFalse(os.path.exists(self.dest))
+        with open(self.dest + ".part.jsonl") as f:
+            logged = sorted(int(line) for line in f.read().splitlines()[1:])
+        self.assertEqual(logged, [offset * CHUNK for offset in range(6)])
+
+        progress = self.download()
+        self.assertEqual(progress.failed, 0)
+        self.assertEqual(self.file_gets(), 5)  # ranges 6..10 only; small.txt is in the manifest
+        with open(self.dest, "rb") as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertFalse(os.path.exists(self.dest + ".part"))
+        self.assertFalse(os.path.exists(self.dest + ".part.jsonl"))
+
+        self.download()
+        self.assertEqual(self.file_gets(), 0)
+
+    def test_changed_remote_file_starts_over(self):
+        with self.interrupt_after(6 * CHUNK):
+            self.download()
+        self.data = os.urandom(len(self.data))
+        self.mock.files[f"{REMOTE_DIR}/nested/big.bin"] = {"data": self.data, "last_modified": 1754400000000}
+        self.download()
+        self.assertEqual(self.file_gets(), 11)
+        with open(self.dest, "rb") as f:
+            self.assertEqual(f.read(), self.data)
+
+
+if __name__ == "__main__":
+    unittest.main()
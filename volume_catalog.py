@@ -0,0 +1,103 @@
+import json
+import threading
+import time
+
+PAGE_SIZE = 1000        # max_results per volumes listing page
+LISTING_TTL = 300       # seconds a schema listing is trusted
+LIST_AFTER = 2          # lookups in one schema before listing it beats direct GETs
+
+
+# === VOLUME CATALOG ===
+# Volume lookups by catalog.schema.name. A single lookup goes straight to
+# GET volumes/<full name>; once a schema is looked up repeatedly its volumes
+# are listed once (following next_page_token) and served from memory. Creates
+# and updates are written through so the listing stays valid without relisting.
+class VolumeCatalog:
+    def __init__(self, request, endpoint="volumes", page_size=PAGE_SIZE, ttl=LISTING_TTL, list_after=LIST_AFTER):
+        # request has the DatabricksClient.request(method, endpoint, data=None, params=None) shape
+        self.request = request
+        self.endpoint = endpoint
+        self.page_size = page_size
+        self.ttl = ttl
+        self.list_after = list_after
+        self._schemas = {}   # (catalog, schema) -> (expires_at, {name: volume})
+        self._lookups = {}   # (catalog, schema) -> lookups served by direct GET so far
+        self._listing_locks = {}
+        self._lock = threading.Lock()
+
+    # --- Remote calls ---
+    def iter_volumes(self, catalog, schema):
+        params = {"catalog_name": catalog, "schema_name": schema, "max_results": self.page_size}
+        while True:
+            response = self.request("GET", self.endpoint, params=params)
+            if response.status != 200:
+                raise Exception(f"Failed to list volumes in {catalog}.{schema}: "
+                                f"{response.status} {response.data.decode('utf-8')}")
+            page = json.loads(response.data.decode("utf-8"))
+            yield from page.get("volumes", [])
+            if not page.get("next_page_token"):
+                return
+            params["page_token"] = page["next_page_token"]
+
+    def get(self, full_name):
+        response = self.request("GET", f"{self.endpoint}/{full_name}")
+        if response.status == 404:
+            return None
+        if response.status != 200:
+            raise Exception(f"Failed to get volume {full_name}: {response.status} {response.data.decode('utf-8')}")
+        return json.loads(response.data.decode("utf-8"))
+
+    # --- Lookups ---
+    def list_schema(self, catalog, schema):
+        volumes = {volume["name"]: volume for volume in self.iter_volumes(catalog, schema)}
+        with self._lock:
+            self._schemas[(catalog, schema)] = (time.monotonic() + self.ttl, volumes)
+        return volumes
+
+    def _cached(self, key):
+        cached = self._schemas.get(key)
+        return cached[1] if cached and cached[0] > time.monotonic() else None
+
+    def lookup(self, catalog, schema, name):
+        key = (catalog, schema)
+        with self._lock:
+            volumes = self._cached(key)
+            if volumes is not None:
+                return volumes.get(name)
+            lookups = self._lookups.get(key, 0)
+            self._lookups[key] = lookups + 1
+            listing_lock = self._listing_locks.setdefault(key, threading.Lock())
+        if lookups + 1 < self.list_after:
+            return self.get(f"{catalog}.{schema}.{name}")
+        # Concurrent lookups in the same schema wait for one listing instead of each starting one
+        with listing_lock:
+            with self._lock:
+                volumes = self._cached(key)
+            if volumes is None:
+                volumes = self.list_schema(catalog, schema)
+        return volumes.get(name)
+
+    def volume_id(self, catalog, schema, name):
+        volume = self.lookup(catalog, schema, name)
+        return volume["volume_id"] if volume else None
+
+    # --- Keeping listings current ---
+    def record(self, volume):
+        # Fold a created/updated volume into its schema listing, if we hold one
+        key = (volume["catalog_name"], volume["schema_name"])
+        with self._lock:
+            cached = self._schemas.get(key)
+            if cached:
+                for name, existing in list(cached[1].items()):
+                    if existing.get("volume_id") == volume.get("volume_id") and name != volume["name"]:
+                        del cached[1][name]  # renamed
+                cached[1][volume["name"]] = volume
+
+    def invalidate(self, catalog, schema):
+        with self._lock:
+            self._schemas.pop((catalog, schema), None)
+
+    def clear(self):
+        with self._lock:
+            self._schemas.clear()
+            self._lookups.clear()
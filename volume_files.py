@@ -0,0 +1,415 @@
+"""Copy files between a local directory and a volume through the Files API.
+
+    python volume_files.py upload ./reference /Volumes/main/landing/raw --parallel 8
+    python volume_files.py download /Volumes/main/landing/raw ./reference-copy
+
+Uploads send each file memory-mapped (no copy in memory, whatever its size).
+Downloads fetch fixed-size byte ranges into a <file>.part that is renamed when
+complete. Both run on a pool of --parallel workers, and downloads split large
+files into ranges across the pool.
+
+A manifest of what was transferred (size, mtime and sha256 per file) is kept as
+JSON lines in the local directory. A rerun skips files that are unchanged on
+both sides and only hashes files whose size or mtime moved. An interrupted
+download resumes from the ranges already on disk, as long as the remote file
+has not changed since. Uploads resume per file only: the Files API takes a file
+in one PUT, so files finished before the interruption are skipped and a file
+that was cut off is sent again from its first byte.
+The workspace is whatever create_volume.py is configured for.
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote
+
+import create_volume
+
+MANIFEST_NAME = ".volume_files.jsonl"
+CHUNK_SIZE = 16 * 1024 * 1024           # bytes per download range and per hashing step
+MAX_UPLOAD_SIZE = 5 * 1024 * 1024 * 1024  # largest file the Files API takes in one PUT
+DEFAULT_PARALLEL = 8
+PROGRESS_EVERY = 2.0
+
+
+# === FILES API ===
+def files_endpoint(remote_path):
+    return "fs/files" + quote(remote_path)
+
+def directories_endpoint(remote_path):
+    return "fs/directories" + quote(remote_path.rstrip("/") + "/")
+
+def check(response, action, remote_path):
+    if response.status not in (200, 201, 204, 206):
+        raise Exception(f"Failed to {action} {remote_path}: {response.status} - {response.data.decode()[:200]}")
+    return response
+
+
+def list_remote(remote_dir):
+    # relative path -> (size, last_modified ms) for every file under remote_dir;
+    # an empty dict when the directory does not exist yet
+    files = {}
+    pending = [remote_dir.rstrip("/")]
+    while pending:
+        directory = pending.pop()
+        page_token = None
+        while True:
+            params = {"page_token": page_token} if page_token else None
+            response = create_volume.client().request("GET", directories_endpoint(directory), params=params)
+            if response.status == 404:
+                break
+            data = json.loads(check(response, "list", directory).data.decode())
+            for entry in data.get("contents", []):
+                if entry.get("is_directory"):
+                    pending.append(entry["path"].rstrip("/"))
+                else:
+                    relative = entry["path"][len(remote_dir.rstrip("/")) + 1:]
+                    files[relative] = (entry.get("file_size", 0), entry.get("last_modified"))
+            page_token = data.get("next_page_token")
+            if not page_token:
+                break
+    return files
+
+
+def list_local(local_dir):
+    # relative path (with /) -> os.stat_result, skipping our own bookkeeping files
+    files = {}
+    for root, _, names in os.walk(local_dir):
+        for name in names:
+            if name == MANIFEST_NAME or name.endswith((".part", ".part.jsonl")):
+                continue
+            path = os.path.join(root, name)
+            files[os.path.relpath(path, local_dir).replace(os.sep, "/")] = os.stat(path)
+    return files
+
+
+# === MANIFEST ===
+# Append-only JSON lines, the last line for a path wins. Appends are cheap and a
+# crash loses at most the line being written.
+class Manifest:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by a crash
+                    self.entries[entry["remote"]] = entry
+        self._file = open(path, "a")
+
+    def get(self, remote_path):
+        return self.entries.get(remote_path)
+
+    def record(self, remote_path, **fields):
+        entry = {"remote": remote_path, **fields}
+        with self._lock:
+            self.entries[remote_path] = entry
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def file_digest(path, size):
+    digest = hashlib.sha256()
+    if size:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            view = memoryview(data)
+            try:
+                for offset in range(0, size, CHUNK_SIZE):
+                    digest.update(view[offset:offset + CHUNK_SIZE])
+            finally:
+                view.release()
+    return digest.hexdigest()
+
+
+class Progress:
+    def __init__(self, label, total_files, out=None):
+        self.label = label
+        self.total_files = total_files
+        self.out = out or sys.stdout
+        self.files = self.skipped = self.failed = self.bytes = 0
+        self.start = self._last = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, files=0, skipped=0, failed=0, size=0):
+        with self._lock:
+            self.files += files
+            self.skipped += skipped
+            self.failed += failed
+            self.bytes += size
+            now = time.perf_counter()
+            if now - self._last >= PROGRESS_EVERY:
+                self._last = now
+                self.report()
+
+    def report(self, icon="⏳"):
+        elapsed = time.perf_counter() - self.start
+        rate = self.bytes / elapsed / 1024 / 1024 if elapsed else 0.0
+        failed = f", {self.failed} failed" if self.failed else ""
+        print(f"{icon} {self.label}: {self.files}/{self.total_files} files ({self.skipped} unchanged{failed}), "
+              f"{self.bytes / 1024 / 1024:.1f} MB at {rate:.1f} MB/s, {elapsed:.1f}s", file=self.out, flush=True)
+
+
+def run_bounded(pool, tasks, limit, on_done):
+    # Submits (key, fn, args) tasks keeping at most limit in flight; on_done(key, result, error)
+    pending = {}
+
+    def collect(futures):
+        for future in futures:
+            key = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                on_done(key, None, e)
+            else:
+                on_done(key, result, None)
+
+    for key, fn, args in tasks:
+        pending[pool.submit(fn, *args)] = key
+        if len(pending) >= limit:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    collect(list(pending))
+
+
+# === UPLOAD ===
+def upload_file(local_path, remote_path, size):
+    if size > MAX_UPLOAD_SIZE:
+        raise Exception(f"{local_path} is larger than the 5 GiB a single Files API upload accepts")
+    headers = {"Content-Type": "application/octet-stream"}
+    endpoint = files_endpoint(remote_path)
+    params = {"overwrite": "true"}
+    if not size:
+        return check(create_volume.client().request("PUT", endpoint, params=params, body=b"", headers=headers),
+                     "upload", remote_path)
+    # Sent as one buffer over the mapping (a memoryview, since urllib3 would stream
+    # anything with a read() chunked): the kernel pages the file in as it goes out,
+    # and a retried request simply sends it again
+    with open(local_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data, \
+            memoryview(data) as view:
+        return check(create_volume.client().request("PUT", endpoint, params=params, body=view, headers=headers),
+                     "upload", remote_path)
+
+
+def plan_upload(local_dir, remote_dir, manifest):
+    # (relative path, size, sha256 or None) of every file that has to go up
+    remote = list_remote(remote_dir)
+    uploads, unchanged = [], 0
+    for relative, stat in sorted(list_local(local_dir).items()):
+        remote_path = f"{remote_dir.rstrip('/')}/{relative}"
+        entry = manifest.get(remote_path)
+        present = remote.get(relative, (None, None))[0] == stat.st_size
+        if entry and present and entry["size"] == stat.st_size:
+            if entry["mtime"] == stat.st_mtime_ns:
+                unchanged += 1
+                continue
+            # Touched but maybe not changed: the content hash decides
+            digest = file_digest(os.path.join(local_dir, relative), stat.st_size)
+            if digest == entry["sha256"]:
+                manifest.record(remote_path, size=stat.st_size, mtime=stat.st_mtime_ns, sha256=digest,
+                                last_modified=remote[relative][1])
+                unchanged += 1
+                continue
+        uploads.append((relative, stat))
+    return uploads, unchanged
+
+
+def upload_dir(local_dir, remote_dir, parallel=DEFAULT_PARALLEL):
+    manifest = Manifest(os.path.join(local_dir, MANIFEST_NAME))
+    try:
+        uploads, unchanged = plan_upload(local_dir, remote_dir, manifest)
+        progress = Progress("uploaded", len(uploads) + unchanged)
+        progress.add(files=unchanged, skipped=unchanged)
+
+        def upload(relative, stat):
+            local_path = os.path.join(local_dir, relative)
+            remote_path = f"{remote_dir.rstrip('/')}/{relative}"
+            digest = file_digest(local_path, stat.st_size)
+            upload_file(local_path, remote_path, stat.st_size)
+            manifest.record(remote_path, size=stat.st_size, mtime=stat.st_mtime_ns, sha256=digest)
+
+        def done(relative, _, error):
+            if error:
+                print(f"❌ {relative}: {error}", flush=True)
+                progress.add(failed=1)
+            else:
+                progress.add(files=1, size=os.path.getsize(os.path.join(local_dir, relative)))
+
+        with ThreadPoolExecutor(max_workers=parallel) as pool:
+            run_bounded(pool, ((relative, upload, (relative, stat)) for relative, stat in uploads),
+                        parallel * 2, done)
+        progress.report("✅" if not progress.failed else "❌")
+        return progress
+    finally:
+        manifest.close()
+
+
+# === DOWNLOAD ===
+def last_modified_ms(response):
+    value = response.headers.get("Last-Modified")
+    try:
+        return int(parsedate_to_datetime(value).timestamp() * 1000) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+class PartialFile:
+    # A download in progress: <dest>.part preallocated to the full size, plus a
+    # <dest>.part.jsonl log of the ranges already written. The log starts with
+    # the remote size and last_modified, so a changed remote file starts over.
+    def __init__(self, dest, size, last_modified):
+        self.dest = dest
+        self.part = dest + ".part"
+        self.log_path = dest + ".part.jsonl"
+        self.size = size
+        self.done = set()
+        header = {"size": size, "last_modified": last_modified}
+        if os.path.exists(self.part) and os.path.exists(self.log_path):
+            with open(self.log_path) as f:
+                lines = f.read().splitlines()
+            if lines and json.loads(lines[0]) == header:
+                self.done = {int(line) for line in lines[1:] if line.strip().isdigit()}
+        if not self.done:
+            os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+            with open(self.part, "wb") as f:
+                f.truncate(size)
+            with open(self.log_path, "w") as f:
+                f.write(json.dumps(header) + "\n")
+        self.remaining = {offset for offset in range(0, size, CHUNK_SIZE)} - self.done
+        self._fd = os.open(self.part, os.O_WRONLY)
+        self._log = open(self.log_path, "a")
+        self._lock = threading.Lock()
+
+    def write(self, offset, data):
+        os.pwrite(self._fd, data, offset)
+        with self._lock:
+            self.remaining.discard(offset)
+            self._log.write(f"{offset}\n")
+            self._log.flush()
+            return not self.remaining
+
+    def finish(self):
+        os.fsync(self._fd)
+        self.close()
+        os.replace(self.part, self.dest)
+        os.remove(self.log_path)
+
+    def close(self):
+        os.close(self._fd)
+        self._log.close()
+
+
+def download_range(remote_path, partial, offset):
+    end = min(offset + CHUNK_SIZE, partial.size) - 1
+    response = check(create_volume.client().request("GET", files_endpoint(remote_path),
+                                                    headers={"Range": f"bytes={offset}-{end}"}),
+                     "download", remote_path)
+    data = response.data
+    if response.status == 200:
+        # Server ignored the range: take our slice of the whole file
+        data = data[offset:end + 1]
+    if len(data) != end - offset + 1:
+        raise Exception(f"Short read for {remote_path} at {offset}: {len(data)} of {end - offset + 1} bytes")
+    return partial.write(offset, data)
+
+
+def download_dir(remote_dir, local_dir, parallel=DEFAULT_PARALLEL):
+    os.makedirs(local_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(local_dir, MANIFEST_NAME))
+    remote = list_remote(remote_dir)
+    progress = Progress("downloaded", len(remote))
+    partials = {}
+    failed = set()
+
+    def finish(relative):
+        partial = partials.pop(relative)
+        partial.finish()
+        manifest.record(f"{remote_dir.rstrip('/')}/{relative}", size=partial.size,
+                        mtime=os.stat(partial.dest).st_mtime_ns, sha256=None, last_modified=remote[relative][1])
+        progress.add(files=1)
+
+    def done(key, last, error):
+        # last: this range was the file's final one to land on disk
+        relative, offset = key
+        if relative in failed:
+            return
+        if error:
+            # Ranges of this file still in flight finish on their own; its .part is kept to resume from
+            print(f"❌ {relative}: {error}", flush=True)
+            failed.add(relative)
+            progress.add(failed=1)
+            return
+        progress.add(size=min(CHUNK_SIZE, remote[relative][0] - offset))
+        if last:
+            finish(relative)
+
+    try:
+        tasks = []
+        for relative, (size, last_modified) in sorted(remote.items()):
+            remote_path = f"{remote_dir.rstrip('/')}/{relative}"
+            dest = os.path.join(local_dir, *relative.split("/"))
+            entry = manifest.get(remote_path)
+            if (entry and entry.get("last_modified") == last_modified and os.path.exists(dest)
+                    and os.path.getsize(dest) == size):
+                progress.add(files=1, skipped=1)
+                continue
+            partials[relative] = PartialFile(dest, size, last_modified)
+            if not partials[relative].remaining:
+                finish(relative)  # empty, or every range was already on disk
+                continue
+            tasks.extend(((relative, offset), download_range, (remote_path, partials[relative], offset))
+                         for offset in sorted(partials[relative].remaining))
+
+        with ThreadPoolExecutor(max_workers=parallel) as pool:
+            run_bounded(pool, tasks, parallel * 2, done)
+        progress.report("✅" if not progress.failed else "❌")
+        return progress
+    finally:
+        for partial in partials.values():
+            partial.close()
+        manifest.close()
+
+
+# === MAIN ===
+def main():
+    parser = argparse.ArgumentParser(description="Copy files between a local directory and a volume")
+    commands = parser.add_subparsers(dest="command", required=True)
+    upload = commands.add_parser("upload", help="Upload a local directory into a volume path")
+    upload.add_argument("local_dir")
+    upload.add_argument("remote_dir", help="/Volumes/<catalog>/<schema>/<volume>[/path]")
+    download = commands.add_parser("download", help="Download a volume path into a local directory")
+    download.add_argument("remote_dir", help="/Volumes/<catalog>/<schema>/<volume>[/path]")
+    download.add_argument("local_dir")
+    for command in (upload, download):
+        command.add_argument("--parallel", type=int, default=DEFAULT_PARALLEL, help="Files or ranges in flight")
+    args = parser.parse_args()
+
+    try:
+        if not args.remote_dir.startswith("/Volumes/"):
+            raise Exception(f"Expected a /Volumes/<catalog>/<schema>/<volume> path, got '{args.remote_dir}'")
+        if args.command == "upload":
+            if not os.path.isdir(args.local_dir):
+                raise Exception(f"{args.local_dir} is not a directory")
+            progress = upload_dir(args.local_dir, args.remote_dir, args.parallel)
+        else:
+            progress = download_dir(args.remote_dir, args.local_dir, args.parallel)
+        return 1 if progress.failed else 0
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())